@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connect signal receivers that keep in-memory indexes, caches,
+        # event streams and the recommendation change log up to date, and
+        # register system checks
+        from api import authentication, cache, checks  # noqa: F401
+        from api.services import autocomplete, events, geo, matching, recommendations, schedules, search  # noqa: F401
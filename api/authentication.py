@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from api.cache import is_process_local
+from api.signals import bulk_updated
+
+User = get_user_model()
+
+# User columns kept in the cache: what authentication and permission checks
+# read. The rest, the password hash and personal details included, stay in
+# the database and load on access.
+CACHED_USER_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+
+def _user_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def _user_cache():
+    """
+    The cache for token users, or None when AUTH_USER_CACHE_ALIAS is
+    process-local: a ban saved by one worker could not evict the copies the
+    others hold, so those would keep accepting the user until the TTL.
+    """
+    alias = getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')
+    return None if is_process_local(alias) else caches[alias]
+
+
+def _cached_fields():
+    # In model order, as Model.from_db expects
+    wanted = {*CACHED_USER_FIELDS, api_settings.USER_ID_FIELD}
+    return [field.attname for field in User._meta.concrete_fields if field.attname in wanted]
+
+
+def revoke_claim(user):
+    """The value a token's REVOKE_TOKEN_CLAIM must carry for ``user``."""
+    claim = getattr(user, '_revoke_claim', None)
+    return claim if claim is not None else get_md5_hash_password(user.password)
+
+
+def get_cached_user(user_id):
+    """
+    Return the user for a token user id, or None. A user from the cache
+    carries only CACHED_USER_FIELDS (and the token revocation claim when
+    CHECK_REVOKE_TOKEN is set); other columns load from the database.
+    """
+    cache = _user_cache()
+    key = _user_key(user_id)
+    entry = cache.get(key) if cache is not None else None
+    fields = _cached_fields()
+    if entry is not None:
+        values, claim = entry
+        user = User.from_db(User.objects.db, fields, values)
+        user._revoke_claim = claim
+        return user
+    user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+    if user is not None and cache is not None:
+        claim = revoke_claim(user) if api_settings.CHECK_REVOKE_TOKEN else None
+        values = [getattr(user, field) for field in fields]
+        cache.set(key, (values, claim), timeout=getattr(settings, 'AUTH_USER_CACHE_TTL', 60))
+    return user
+
+
+def invalidate_cached_user(user_id):
+    cache = _user_cache()
+    if cache is not None:
+        cache.delete(_user_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from a short-TTL cache
+    instead of querying on every request. Entries are dropped as soon as the
+    user is saved or deleted.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != revoke_claim(user):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+def _invalidate(user_id):
+    # Drop now, and again on commit in case a concurrent request re-cached
+    # the row before the transaction finished
+    invalidate_cached_user(user_id)
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+
+def invalidate_user(sender, instance, **kwargs):
+    _invalidate(getattr(instance, api_settings.USER_ID_FIELD))
+
+
+post_save.connect(invalidate_user, sender=User, dispatch_uid='auth-user-cache-save')
+post_delete.connect(invalidate_user, sender=User, dispatch_uid='auth-user-cache-delete')
+
+
+def invalidate_bulk_updated_users(sender, ids, **kwargs):
+    cache = _user_cache()
+    if cache is None or sender is not User:
+        return
+    cache.delete_many([_user_key(user_id) for user_id in ids])
+
+
+bulk_updated.connect(invalidate_bulk_updated_users, dispatch_uid='auth-user-cache-bulk-update')
@@ -0,0 +1,141 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from rest_framework.response import Response
+
+from api.models import Profile, Skill, UserSkill, Feedback
+from api.signals import bulk_updated
+
+# Models whose changes invalidate cached responses, by tag name
+TAGGED_MODELS = {
+    'user': User,
+    'profile': Profile,
+    'skill': Skill,
+    'userskill': UserSkill,
+    'feedback': Feedback,
+}
+
+
+# Settings naming caches that every worker process must share
+SHARED_CACHE_SETTINGS = (
+    'RESPONSE_CACHE_ALIAS',
+    'AUTH_USER_CACHE_ALIAS',
+    'REPLICA_PIN_CACHE_ALIAS',
+    'EVENT_TICKET_CACHE_ALIAS',
+)
+# Settings naming caches whose counters must not lose concurrent increments
+ATOMIC_CACHE_SETTINGS = (
+    'INDEX_VERSION_CACHE_ALIAS',
+)
+
+
+def is_process_local(alias):
+    """Whether the cache alias lives in this process only, unseen by other workers."""
+    return isinstance(caches[alias], LocMemCache)
+
+
+def has_atomic_incr(alias):
+    """Whether ``incr`` on the cache alias is atomic; the file and database backends read and write separately."""
+    return not isinstance(caches[alias], (FileBasedCache, DatabaseCache))
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _tag_key(tag):
+    return f'tag-version:{tag}'
+
+
+def tag_versions(tags):
+    """
+    Return the current version of each tag.
+
+    Missing versions (never set, or evicted) are seeded from the clock so a
+    reseeded tag never matches a version stored in an older entry's key.
+    """
+    cache = _cache()
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate_tags(*tags):
+    """Bump tag versions so every entry keyed on them becomes unreachable."""
+    cache = _cache()
+    for tag in tags:
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            cache.set(_tag_key(tag), time.time_ns(), timeout=None)
+
+
+class CachedListMixin:
+    """
+    Caches the serialized body of a DRF list view.
+
+    Keys combine the view, the sorted query string, the current versions of
+    ``cache_tags`` and, when ``cache_per_user`` is set, the requesting user.
+    Saving or deleting any tagged model bumps its version, which orphans
+    the old entries. Redis with ``allkeys-lru`` evicts them least recently
+    used first; the file cache lets them expire after ``cache_timeout`` or
+    culls them at random once full.
+    """
+    cache_tags = ()
+    cache_per_user = False
+    cache_timeout = 300
+
+    def get_cache_key(self, request):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        scope = request.user.pk if self.cache_per_user else ''
+        versions = '.'.join(str(version) for version in tag_versions(self.cache_tags))
+        digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+        return f'response:{type(self).__name__}:{scope}:{digest}:{versions}'
+
+    def list(self, request, *args, **kwargs):
+        cache = _cache()
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=self.cache_timeout)
+        return response
+
+
+def _connect(tag, model):
+    def invalidate(sender, **kwargs):
+        # Bump now so other requests stop reading the old entry, and again on
+        # commit so nothing cached from pre-commit data in between survives
+        invalidate_tags(tag)
+        transaction.on_commit(lambda: invalidate_tags(tag))
+
+    post_save.connect(invalidate, sender=model, weak=False, dispatch_uid=f'response-cache-{tag}-save')
+    post_delete.connect(invalidate, sender=model, weak=False, dispatch_uid=f'response-cache-{tag}-delete')
+
+
+for _tag, _model in TAGGED_MODELS.items():
+    _connect(_tag, _model)
+
+
+def _invalidate_bulk_update(sender, **kwargs):
+    for tag, model in TAGGED_MODELS.items():
+        if model is sender:
+            invalidate_tags(tag)
+
+
+bulk_updated.connect(_invalidate_bulk_update, dispatch_uid='response-cache-bulk-update')
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from api.cache import ATOMIC_CACHE_SETTINGS, SHARED_CACHE_SETTINGS, has_atomic_incr, is_process_local
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """Warn about shared-state caches that each worker process would keep to itself."""
+    warnings = []
+    for setting in SHARED_CACHE_SETTINGS:
+        alias = getattr(settings, setting, 'default')
+        if alias in settings.CACHES and is_process_local(alias):
+            warnings.append(Warning(
+                f"{setting} points at the process-local cache '{alias}'.",
+                hint='Use a cache every worker shares (Redis via CACHE_URL, or the file-based '
+                     "'shared' alias); otherwise writes handled by one worker leave the others stale.",
+                id='api.W001',
+            ))
+    return warnings
+
+
+@register(Tags.caches)
+def check_atomic_caches(app_configs, **kwargs):
+    """Error on counters kept in a cache whose increments can be lost."""
+    errors = []
+    for setting in ATOMIC_CACHE_SETTINGS:
+        alias = getattr(settings, setting, 'default')
+        if alias in settings.CACHES and not has_atomic_incr(alias):
+            errors.append(Error(
+                f"{setting} points at '{alias}', whose increments are not atomic.",
+                hint='Two workers bumping together can both write the same version and each miss the '
+                     "other's change. Use Redis via CACHE_URL, or the process-local 'default' with one worker.",
+                id='api.E001',
+            ))
+    return errors
+
+
+@register(Tags.caches, deploy=True)
+def check_index_versions_shared(app_configs, **kwargs):
+    """Warn on deploy checks when index versions are seen by one worker only."""
+    alias = getattr(settings, 'INDEX_VERSION_CACHE_ALIAS', 'default')
+    if alias in settings.CACHES and is_process_local(alias):
+        return [Warning(
+            f"INDEX_VERSION_CACHE_ALIAS points at the process-local cache '{alias}'.",
+            hint='Fine for a single worker. With several, set CACHE_URL, or writes handled by one worker '
+                 "reach the others' in-memory indexes only after INDEX_MAX_AGE.",
+            id='api.W002',
+        )]
+    return []
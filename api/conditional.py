@@ -0,0 +1,52 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag / Last-Modified validators to a DRF GET endpoint.
+
+    Validators come from one aggregate query (row count and the latest
+    ``last_modified_field``) over the view's filtered queryset, so a matching
+    ``If-None-Match`` gets a 304 without the
+    payload ever being serialized. ``related_validators`` adds aggregates
+    over joined rows whose changes leave ``last_modified_field`` alone.
+    """
+    last_modified_field = 'updated_at'
+    related_validators = {}
+
+    def get_validator_state(self):
+        """Return (state, last_modified) where state is any value that changes with the payload."""
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        state = queryset.aggregate(
+            count=Count('pk'), last_modified=Max(self.last_modified_field), **self.related_validators
+        )
+        related = tuple(state[name] for name in self.related_validators)
+        return (state['count'], state['last_modified'], *related), state['last_modified']
+
+    def get_validators(self, request):
+        state, last_modified = self.get_validator_state()
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        raw = f'{type(self).__name__}:{request.user.pk}:{query}:{state}'
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        return etag, timestamp
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        # Only the ETag decides: deleting a row lowers the count without moving
+        # max(updated_at), which If-Modified-Since alone would miss
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Let clients keep the body but revalidate on every poll
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
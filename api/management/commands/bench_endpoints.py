@@ -0,0 +1,312 @@
+import json
+import logging
+import math
+import os
+import platform
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import urls as api_urls
+from api.cache import TAGGED_MODELS, invalidate_tags
+from api.management.commands.seed_synthetic import ADMIN_USERNAME, PASSWORD, PREFIX, SCALES
+from api.models import Feedback, Skill, SwapRequest, UserSkill
+from api.query_budget import QueryRecorder
+
+# Routes that cannot be timed as a request/response pair
+SKIPPED_ROUTES = {'events': "server-sent event stream"}
+PERCENTILES = (50, 90, 99)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every API route against a database filled by seed_synthetic and "
+        "record latency percentiles and query counts. Results are compared with "
+        "the JSON baseline for the same scale; --save-baseline replaces it. "
+        "Writes run in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', help="Baseline name (default: derived from the number of synthetic users).")
+        parser.add_argument('--baseline-dir', default=str(settings.BASE_DIR / 'benchmarks'))
+        parser.add_argument('--save-baseline', action='store_true', help="Write this run as the new baseline.")
+        parser.add_argument('--iterations', type=int, default=30, help="Timed requests per route at most.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per route first.")
+        parser.add_argument('--time-budget', type=float, default=5.0,
+                            help="Seconds per route after which iterations stop (at least one always runs).")
+        parser.add_argument('--warm-cache', action='store_true',
+                            help="Keep cached responses between requests instead of invalidating them.")
+        parser.add_argument('--route', action='append', default=[],
+                            help="Only run scenarios for this url name; repeatable.")
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help="Median slowdown ratio against the baseline that counts as a regression.")
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help="Ignore slowdowns smaller than this many milliseconds.")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username__startswith=PREFIX).exclude(username=ADMIN_USERNAME).count()
+        if not users:
+            raise CommandError("No synthetic data in this database; run seed_synthetic first.")
+        scale = options['scale'] or next((name for name, size in SCALES.items() if size == users), str(users))
+        self.options = options
+        self.setup_fixtures()
+
+        scenarios = self.scenarios()
+        self.report_coverage(scenarios)
+        if options['route']:
+            scenarios = [scenario for scenario in scenarios if scenario[1] in options['route']]
+
+        # Rates are for real clients; every route is hit hundreds of times here
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        budget_logger = logging.getLogger('api.query_budget')
+        level = budget_logger.level
+        budget_logger.setLevel(logging.ERROR)
+        try:
+            # Test clients send Host: testserver, which ALLOWED_HOSTS must accept whatever DEBUG is
+            with override_settings(REST_FRAMEWORK=rest_framework,
+                                   ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = {scenario[0]: self.run(*scenario) for scenario in scenarios}
+        finally:
+            budget_logger.setLevel(level)
+
+        path = os.path.join(options['baseline_dir'], f'{scale}.json')
+        regressions = self.compare(path, results)
+        if options['save_baseline']:
+            self.save(path, scale, users, results)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+    def setup_fixtures(self):
+        """Pick the users, skills and swaps the scenarios act on; seed_synthetic guarantees they exist."""
+        self.member = User.objects.get(username=f'{PREFIX}0')
+        self.admin = User.objects.get(username=ADMIN_USERNAME)
+        self.clients = {'member': self.client_for(self.member), 'admin': self.client_for(self.admin), None: APIClient()}
+        self.refresh = str(RefreshToken.for_user(self.member))
+
+        self.popular_skills = list(Skill.objects.filter(is_approved=True).order_by('id').values_list('name', flat=True)[:2])
+        self.user_skill = UserSkill.objects.filter(user=self.member).order_by('id').first()
+        offered = UserSkill.objects.filter(user=self.member, skill_type='offered').order_by('id').first()
+        partners = SwapRequest.objects.filter(requester=self.member).values_list('recipient_id', flat=True)
+        partner_skill = (UserSkill.objects.filter(user__username__startswith=PREFIX, skill_type='offered')
+                         .exclude(user=self.member).exclude(user__in=partners).order_by('id').first())
+        self.new_swap = {'recipient': partner_skill.user_id, 'requester_skill': offered.id,
+                         'recipient_skill': partner_skill.id, 'message': 'Benchmark swap'}
+        self.pending_swap = SwapRequest.objects.filter(
+            recipient=self.member, requester__username=f'{PREFIX}1', status='pending').values_list('id', flat=True).first()
+        self.completed_swap = SwapRequest.objects.filter(
+            recipient=self.member, status='completed').exclude(
+            id__in=Feedback.objects.filter(from_user=self.member).values('swap_request')).values_list('id', flat=True).first()
+        self.pending_skill = Skill.objects.filter(is_approved=False).order_by('id').values_list('id', flat=True).first()
+        self.target_user = User.objects.get(username=f'{PREFIX}5').id
+        self.some_users = list(User.objects.filter(username__startswith=PREFIX).exclude(
+            username=ADMIN_USERNAME).order_by('id').values_list('id', flat=True)[10:60])
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def scenarios(self):
+        """(label, url name, method, path, body, client) for every route worth timing."""
+        skills = ','.join(self.popular_skills)
+        return [
+            ('register', 'register', 'post', '/api/register/', {
+                'username': 'bench-new-user', 'email': 'bench-new-user@example.com', 'password': 'Bench-pass-123',
+                'password2': 'Bench-pass-123', 'first_name': 'Bench', 'last_name': 'User'}, None),
+            ('login', 'login', 'post', '/api/login/', {'username': self.member.username, 'password': PASSWORD}, None),
+            ('token refresh', 'token_refresh', 'post', '/api/token/refresh/', {'refresh': self.refresh}, None),
+            ('profile', 'profile', 'get', '/api/profile/', None, 'member'),
+            ('profile update', 'profile', 'patch', '/api/profile/', {'bio': 'Benchmarking', 'location': 'Pune'}, 'member'),
+            ('skills', 'skills', 'get', '/api/skills/', None, 'member'),
+            ('autocomplete broad', 'skill-autocomplete', 'get', '/api/skills/autocomplete/?prefix=s', None, 'member'),
+            ('autocomplete narrow', 'skill-autocomplete', 'get', '/api/skills/autocomplete/?prefix=synthetic skill 12',
+             None, 'member'),
+            ('user skills', 'user-skills', 'get', '/api/user-skills/', None, 'member'),
+            ('user skill add', 'user-skills', 'post', '/api/user-skills/',
+             {'skill_name': 'benchmark skill', 'skill_type': 'wanted', 'proficiency_level': 3}, 'member'),
+            ('user skill bulk add', 'user-skill-bulk', 'post', '/api/user-skills/bulk/', [
+                {'skill_name': f'benchmark skill {i}', 'skill_type': 'wanted', 'proficiency_level': 2} for i in range(10)
+            ], 'member'),
+            ('user skill', 'user-skill-detail', 'get', f'/api/user-skills/{self.user_skill.id}/', None, 'member'),
+            ('user skill delete', 'user-skill-detail', 'delete', f'/api/user-skills/{self.user_skill.id}/', None, 'member'),
+            ('search by name', 'user-search', 'get', '/api/users/search/?q=synthetic skill 1', None, 'member'),
+            ('search by skills', 'user-search', 'get', f'/api/users/search/?skills={skills}&match=any', None, 'member'),
+            ('search near', 'user-search', 'get', f'/api/users/search/?skills={skills}&match=any&near=Pune&radius_km=200',
+             None, 'member'),
+            ('search near only', 'user-search', 'get', '/api/users/search/?near=Mumbai&radius_km=50', None, 'member'),
+            ('search by availability', 'user-search', 'get', '/api/users/search/?sort=availability&min_overlap=60',
+             None, 'member'),
+            ('top rated', 'top-rated-users', 'get', '/api/users/top-rated/', None, 'member'),
+            ('matches', 'matches', 'get', '/api/matches/', None, 'member'),
+            ('matches by availability', 'matches', 'get', '/api/matches/?sort=availability', None, 'member'),
+            ('recommendations', 'recommendations', 'get', '/api/recommendations/', None, 'member'),
+            ('swaps', 'swaps', 'get', '/api/swaps/', None, 'member'),
+            ('swap create', 'swaps', 'post', '/api/swaps/', self.new_swap, 'member'),
+            ('swap counts', 'swap-counts', 'get', '/api/swaps/counts/', None, 'member'),
+            ('swap', 'swap-detail', 'get', f'/api/swaps/{self.pending_swap}/', None, 'member'),
+            ('swap accept', 'swap-detail', 'patch', f'/api/swaps/{self.pending_swap}/', {'status': 'accepted'}, 'member'),
+            ('feedback create', 'feedback-create', 'post', '/api/feedback/',
+             {'swap_request': self.completed_swap, 'rating': 5, 'comment': 'Benchmark'}, 'member'),
+            ('feedback received', 'feedback-list', 'get', '/api/feedback/received/', None, 'member'),
+            ('event ticket', 'event-ticket', 'post', '/api/events/ticket/', {}, 'member'),
+            ('export users', 'admin-export', 'get', '/api/admin/export/?type=users', None, 'admin'),
+            ('export swaps ndjson', 'admin-export', 'get', '/api/admin/export/?type=swaps&file_format=ndjson', None, 'admin'),
+            ('admin skills', 'skill-list', 'get', '/api/admin/skills/', None, 'admin'),
+            ('admin skill', 'skill-detail', 'get', f'/api/admin/skills/{self.pending_skill}/', None, 'admin'),
+            ('admin skill approve', 'skill-approve', 'post', f'/api/admin/skills/{self.pending_skill}/approve/', {}, 'admin'),
+            ('admin skill reject', 'skill-reject', 'post', f'/api/admin/skills/{self.pending_skill}/reject/', {}, 'admin'),
+            ('admin skills bulk approve', 'skill-bulk-approve', 'post', '/api/admin/skills/bulk-approve/',
+             {'filter': {'is_approved': False}}, 'admin'),
+            ('admin skills bulk reject', 'skill-bulk-reject', 'post', '/api/admin/skills/bulk-reject/',
+             {'ids': [self.pending_skill]}, 'admin'),
+            ('admin users', 'user-list', 'get', '/api/admin/users/', None, 'admin'),
+            ('admin user', 'user-detail', 'get', f'/api/admin/users/{self.target_user}/', None, 'admin'),
+            ('admin user ban', 'user-ban', 'post', f'/api/admin/users/{self.target_user}/ban/', {}, 'admin'),
+            ('admin user activate', 'user-activate', 'post', f'/api/admin/users/{self.target_user}/activate/', {}, 'admin'),
+            ('admin users bulk ban', 'user-bulk-ban', 'post', '/api/admin/users/bulk-ban/', {'ids': self.some_users}, 'admin'),
+            ('admin users bulk activate', 'user-bulk-activate', 'post', '/api/admin/users/bulk-activate/',
+             {'ids': self.some_users}, 'admin'),
+            ('admin swaps', 'swaprequest-list', 'get', '/api/admin/swaps/?limit=50', None, 'admin'),
+            ('admin swaps pending', 'swaprequest-list', 'get', '/api/admin/swaps/?status=pending&limit=50', None, 'admin'),
+            ('admin swap', 'swaprequest-detail', 'get', f'/api/admin/swaps/{self.pending_swap}/', None, 'admin'),
+            ('api root', 'api-root', 'get', '/api/', None, 'member'),
+        ]
+
+    def report_coverage(self, scenarios):
+        covered = {scenario[1] for scenario in scenarios}
+        missing = sorted(route_names(api_urls.urlpatterns) - covered - set(SKIPPED_ROUTES))
+        for name in missing:
+            self.stdout.write(self.style.WARNING(f"No benchmark scenario for route '{name}'."))
+        for name, reason in SKIPPED_ROUTES.items():
+            self.stdout.write(f"Skipping route '{name}': {reason}.")
+
+    def run(self, label, route, method, path, body, client):
+        client = self.clients[client]
+        send = getattr(client, method)
+        kwargs = {'format': 'json'} if body is not None else {}
+        timings = []
+        queries = statuses = None
+        warmup = self.options['warmup']
+        deadline = None
+
+        for i in range(warmup + max(self.options['iterations'], 1)):
+            if not self.options['warm_cache']:
+                invalidate_tags(*TAGGED_MODELS)
+            recorder = QueryRecorder(capture_stacks=False)
+            with self.isolated(method), recorder.record():
+                start = time.perf_counter()
+                response = send(path, body, **kwargs)
+                if response.streaming:
+                    size = sum(len(chunk) for chunk in response.streaming_content)
+                else:
+                    size = len(response.content)
+                elapsed = time.perf_counter() - start
+            if i < warmup:
+                continue
+            if deadline is None:
+                deadline = start + self.options['time_budget']
+            timings.append(elapsed)
+            queries, statuses = recorder.count, response.status_code
+            if time.perf_counter() > deadline:
+                break
+
+        result = summarize(timings)
+        result.update(route=route, method=method.upper(), path=path, status=statuses, queries=queries, bytes=size)
+        style = self.style.SUCCESS if statuses < 400 else self.style.ERROR
+        self.stdout.write(
+            f"{label:<26} {style(str(statuses))}  p50 {result['p50_ms']:8.2f} ms  p90 {result['p90_ms']:8.2f} ms  "
+            f"p99 {result['p99_ms']:8.2f} ms  {queries:3d} queries  {size / 1024:9.1f} KiB  n={result['samples']}"
+        )
+        return result
+
+    def isolated(self, method):
+        """Writes run in a transaction that is rolled back, so every iteration sees the same data."""
+        return nullcontext() if method.upper() in SAFE_METHODS else rolled_back()
+
+    def compare(self, path, results):
+        """Print and return the scenarios that got slower or issue more queries than the baseline."""
+        if not os.path.exists(path):
+            self.stdout.write(f"No baseline at {path}; nothing to compare.")
+            return []
+        with open(path) as f:
+            baseline = json.load(f)['results']
+
+        regressions = []
+        for label, result in results.items():
+            before = baseline.get(label)
+            if before is None:
+                continue
+            problems = []
+            delta = result['p50_ms'] - before['p50_ms']
+            if before['p50_ms'] and result['p50_ms'] / before['p50_ms'] > self.options['threshold'] \
+                    and delta > self.options['min_delta_ms']:
+                problems.append(f"p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms")
+            if result['queries'] > before['queries']:
+                problems.append(f"queries {before['queries']} -> {result['queries']}")
+            if problems:
+                regressions.append(label)
+                self.stdout.write(self.style.ERROR(f"REGRESSION {label}: {'; '.join(problems)}"))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {path}."))
+        return regressions
+
+    def save(self, path, scale, users, results):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        document = {
+            'scale': scale,
+            'users': users,
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'warm_cache': self.options['warm_cache'],
+            'results': results,
+        }
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+        self.stdout.write(f"Baseline written to {path}.")
+
+
+@contextmanager
+def rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def route_names(patterns):
+    """Names of every route under ``patterns``, including included routers."""
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    summary = {f'p{pct}_ms': round(percentile(ordered, pct) * 1000, 3) for pct in PERCENTILES}
+    summary.update(
+        max_ms=round(ordered[-1] * 1000, 3),
+        mean_ms=round(sum(ordered) / len(ordered) * 1000, 3),
+        samples=len(ordered),
+    )
+    return summary
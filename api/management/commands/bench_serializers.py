@@ -0,0 +1,109 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.models import Profile, Skill, SwapRequest, UserSkill
+from api.projection import Projection
+from api.renderers import FastJSONRenderer
+from api.serializers.skill_serializers import SkillSerializer, UserSkillSerializer
+from api.serializers.swap_serializers import SwapRequestSerializer
+from api.serializers.user_serializers import UserSearchSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ModelSerializer + JSONRenderer against the projected fast path "
+        "on synthetic rows. Data is created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="Users to create; skills and swaps scale with it.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per case; the best run is reported.")
+
+    def handle(self, *args, **options):
+        # Photo URLs are built from the request's Host: testserver, which
+        # ALLOWED_HOSTS must accept whatever DEBUG is
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), transaction.atomic():
+            self.seed(options['rows'])
+            request = APIRequestFactory().get('/api/users/search/')
+            failures = [name for name, *case in self.cases(request) if not self.run(name, *case, options['repeat'])]
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"Fast path output differs for: {', '.join(failures)}")
+
+    def seed(self, rows):
+        prefix = f'bench{time.time_ns()}'
+        users = User.objects.bulk_create(
+            User(username=f'{prefix}-{i}', first_name=f'Fïrst {i}', last_name='Last') for i in range(rows)
+        )
+        Profile.objects.bulk_create(
+            Profile(
+                user=user, location='Pune' if i % 3 else None, availability='weekends',
+                profile_photo='profile_photos/p.jpg' if i % 2 else '',
+                photo_variants={'128': {'jpeg': 'thumbs/p.jpg', 'webp': 'thumbs/p.webp'}} if i % 4 == 1 else {},
+            )
+            for i, user in enumerate(users)
+        )
+        skills = Skill.objects.bulk_create(Skill(name=f'{prefix}-skill-{i}') for i in range(max(rows // 10, 4)))
+        user_skills = UserSkill.objects.bulk_create(
+            UserSkill(
+                user=user, skill=skills[(i + k) % len(skills)],
+                skill_type='offered' if k % 2 else 'wanted', proficiency_level=k + 1,
+            )
+            for i, user in enumerate(users) for k in range(4)
+        )
+        SwapRequest.objects.bulk_create(
+            SwapRequest(
+                requester=users[i], recipient=users[(i + 1) % rows],
+                requester_skill=user_skills[i * 4], recipient_skill=user_skills[((i + 1) % rows) * 4 + 1] if i % 5 else None,
+                status=SwapRequest.STATUS_CHOICES[i % 4][0],
+                message=None if i % 7 == 0 else f'Swap\u2028#{i}',
+            )
+            for i in range(rows)
+        )
+        self.ids = [user.id for user in users]
+
+    def cases(self, request):
+        users = User.objects.filter(id__in=self.ids).order_by('id')
+        yield ('skills', SkillSerializer, Skill.objects.order_by('id'), {})
+        yield ('user skills', UserSkillSerializer,
+               UserSkill.objects.filter(user__in=users).select_related('skill').order_by('id'), {})
+        yield ('swap requests', SwapRequestSerializer,
+               SwapRequest.objects.filter(requester__in=users).with_names().order_by('-created_at', '-id'), {})
+        yield ('user search', UserSearchSerializer,
+               users.select_related('profile', 'rating').prefetch_related(
+                   Prefetch('user_skills', queryset=UserSkill.objects.select_related('skill').order_by('id'))
+               ), {'request': request})
+
+    def run(self, name, serializer_class, queryset, context, repeat):
+        def serialized():
+            return JSONRenderer().render(serializer_class(queryset.all(), many=True, context=context).data)
+
+        def projected():
+            return FastJSONRenderer().render(Projection(serializer_class, context=context).data(queryset.all()))
+
+        slow, slow_body = self.best(serialized, repeat)
+        fast, fast_body = self.best(projected, repeat)
+        same = slow_body == fast_body
+        self.stdout.write(
+            f"{name:<14} {len(slow_body) / 1024:9.1f} KiB  serializer {slow * 1000:8.1f} ms  "
+            f"projected {fast * 1000:8.1f} ms  x{slow / fast:5.1f}  "
+            + (self.style.SUCCESS('identical') if same else self.style.ERROR('DIFFERENT'))
+        )
+        return same
+
+    def best(self, func, repeat):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            body = func()
+            timings.append(time.perf_counter() - start)
+        return min(timings), body
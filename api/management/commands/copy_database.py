@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+
+import dj_database_url
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.constants import OnConflict
+
+from api.services.indexes import invalidate_indexes
+
+# Rows that `migrate` creates on the target; they are replaced by the source's
+# so foreign keys to them keep pointing at the same ids
+REPLACEABLE_TABLES = {'django_content_type', 'auth_permission'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy every table from one database to another, e.g. SQLite to PostgreSQL. "
+        "Tables are copied in dependency order, in primary key order, in chunks. "
+        "Rows are written with multi-row INSERTs, so no model save() or signal "
+        "runs. A per-table checkpoint file makes an interrupted copy resumable. "
+        "Sequences are reset afterwards, and row counts and checksums are compared. "
+        "Run `migrate` on the target first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=f"sqlite:///{settings.BASE_DIR / 'db.sqlite3'}",
+                            help="Database URL or alias to read from (default: the local SQLite file).")
+        parser.add_argument('--target', default='default',
+                            help="Database URL or alias to write to (default: the 'default' alias).")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--checkpoint', default='copy_database.checkpoint.json',
+                            help="File recording per-table progress.")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint file.")
+        parser.add_argument('--verify-only', action='store_true', help="Only compare counts and checksums.")
+
+    def handle(self, *args, **options):
+        source = self.connect('copy_source', options['source'])
+        target = self.connect('copy_target', options['target'])
+        if connections[source].settings_dict == connections[target].settings_dict:
+            raise CommandError("Source and target are the same database.")
+
+        models = self.ordered_models(source, target)
+        if not options['verify_only']:
+            checkpoint = self.load_checkpoint(options['checkpoint'], options['restart'])
+            self.clear_replaceable(target, models, checkpoint)
+            for model in models:
+                self.copy_table(model, source, target, options['chunk_size'], checkpoint, options['checkpoint'])
+            self.reset_sequences(target, models)
+            # Rows were copied without model signals; workers serving the target must reload
+            invalidate_indexes()
+
+        mismatched = [model._meta.db_table for model in models if not self.verify_table(model, source, target)]
+        if mismatched:
+            raise CommandError(f"Verification failed for: {', '.join(mismatched)}")
+        self.stdout.write(self.style.SUCCESS(f"Copied and verified {len(models)} tables."))
+
+    def connect(self, alias, value):
+        """Register a database URL under ``alias``; configured aliases are used as they are."""
+        if value in settings.DATABASES:
+            return value
+        # configure_settings fills in the defaults Django expects; it insists on a 'default' entry
+        config = connections.configure_settings({
+            DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+            alias: dj_database_url.parse(value),
+        })
+        connections.settings[alias] = config[alias]
+        return alias
+
+    def ordered_models(self, source, target):
+        """Concrete models with tables on both sides, parents before children."""
+        models = dependency_order(apps.get_models(include_auto_created=True))
+        source_tables = set(connections[source].introspection.table_names())
+        target_tables = set(connections[target].introspection.table_names())
+        ordered = []
+        for model in models:
+            opts = model._meta
+            if opts.proxy or not opts.managed:
+                continue
+            if opts.db_table not in target_tables:
+                raise CommandError(f"Table {opts.db_table} is missing on the target; run migrate there first.")
+            if opts.db_table not in source_tables:
+                self.stdout.write(self.style.WARNING(f"Skipping {opts.db_table}: not in the source database."))
+                continue
+            ordered.append(model)
+        return ordered
+
+    def load_checkpoint(self, path, restart):
+        if restart or not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_checkpoint(self, path, checkpoint):
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(tmp, path)
+
+    def clear_replaceable(self, target, models, checkpoint):
+        """Empty the migrate-created tables that have not been copied yet, children first."""
+        connection = connections[target]
+        with transaction.atomic(using=target), connection.cursor() as cursor:
+            for model in reversed(models):
+                table = model._meta.db_table
+                if table in REPLACEABLE_TABLES and table not in checkpoint:
+                    cursor.execute(f'DELETE FROM {connection.ops.quote_name(table)}')
+
+    def copy_table(self, model, source, target, chunk_size, checkpoint, checkpoint_path):
+        opts = model._meta
+        table = opts.db_table
+        state = checkpoint.get(table)
+        if state and state.get('done'):
+            self.stdout.write(f"{table}: already copied ({state['rows']} rows)")
+            return
+
+        if state is None:
+            if model._base_manager.using(target).exists():
+                raise CommandError(f"{table} already has rows on the target and no checkpoint; refusing to overwrite.")
+            state = checkpoint[table] = {'rows': 0, 'last_pk': None, 'done': False}
+            self.save_checkpoint(checkpoint_path, checkpoint)
+
+        last_pk = state.get('last_pk')
+        fields = opts.concrete_fields
+        attnames = [field.attname for field in fields]
+        rows = model._base_manager.using(source).order_by('pk').values_list(*attnames)
+        pk_index = attnames.index(opts.pk.attname)
+
+        while True:
+            chunk = list((rows.filter(pk__gt=last_pk) if last_pk is not None else rows)[:chunk_size])
+            if not chunk:
+                break
+            with transaction.atomic(using=target):
+                self.insert_rows(target, table, fields, chunk)
+            last_pk = state['last_pk'] = chunk[-1][pk_index]
+            state['rows'] += len(chunk)
+            self.save_checkpoint(checkpoint_path, checkpoint)
+            self.stdout.write(f"{table}: {state['rows']} rows")
+
+        state['done'] = True
+        self.save_checkpoint(checkpoint_path, checkpoint)
+
+    def insert_rows(self, target, table, fields, rows):
+        connection = connections[target]
+        qn = connection.ops.quote_name
+        columns = ', '.join(qn(field.column) for field in fields)
+        max_params = connection.features.max_query_params
+        batch_size = max(1, max_params // len(fields)) if max_params else len(rows)
+        # A chunk re-sent after a crash before its checkpoint was written is skipped
+        insert = connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)
+        suffix = connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                # get_db_prep_save converts values without pre_save(), so
+                # auto_now timestamps keep their source values
+                params = [
+                    field.get_db_prep_save(value, connection)
+                    for row in batch for field, value in zip(fields, row)
+                ]
+                values = connection.ops.bulk_insert_sql(fields, [['%s'] * len(fields)] * len(batch))
+                cursor.execute(f'{insert} {qn(table)} ({columns}) {values} {suffix}', params)
+
+    def reset_sequences(self, target, models):
+        connection = connections[target]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with transaction.atomic(using=target), connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def verify_table(self, model, source, target):
+        source_count, source_sum = self.checksum(model, source)
+        target_count, target_sum = self.checksum(model, target)
+        ok = source_count == target_count and source_sum == target_sum
+        status = self.style.SUCCESS('ok') if ok else self.style.ERROR('MISMATCH')
+        self.stdout.write(f"{model._meta.db_table}: {source_count} / {target_count} rows, checksum {status}")
+        return ok
+
+    def checksum(self, model, alias):
+        """
+        Row count and the sum of every row's SHA-256. The sum does not depend
+        on row order, which differs between backends for text keys.
+        """
+        attnames = [field.attname for field in model._meta.concrete_fields]
+        total = count = 0
+        rows = model._base_manager.using(alias).values_list(*attnames)
+        for row in rows.iterator(chunk_size=5000):
+            # Sorted keys so jsonb's key reordering does not count as a difference
+            encoded = json.dumps(row, sort_keys=True, default=str).encode()
+            total += int.from_bytes(hashlib.sha256(encoded).digest(), 'big')
+            count += 1
+        return count, f'{total % (1 << 256):064x}'
+
+
+def dependency_order(models):
+    """Order models so each comes after the models its foreign keys point to."""
+    models = list(models)
+    pending = {
+        model: {field.related_model for field in model._meta.concrete_fields
+                if field.is_relation and field.related_model is not model and field.related_model in models}
+        for model in models
+    }
+    ordered = []
+    while pending:
+        ready = [model for model, deps in pending.items() if not deps - set(ordered)]
+        if not ready:
+            # A cycle through nullable keys; break it at the first model
+            ready = [next(iter(pending))]
+        for model in ready:
+            ordered.append(model)
+            del pending[model]
+    return ordered
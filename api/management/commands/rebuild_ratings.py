@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from api.cache import invalidate_tags
+from api.models import Feedback, UserRating
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized UserRating table from Feedback."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        totals = (
+            Feedback.objects.order_by()
+            .values('to_user')
+            .annotate(
+                rating_count=Count('id'),
+                rating_sum=Sum('rating'),
+                **{f'count_{i}': Count('id', filter=Q(rating=i)) for i in range(1, 6)}
+            )
+        )
+
+        with transaction.atomic():
+            UserRating.objects.all().delete()
+            batch = []
+            created = 0
+            for row in totals.iterator(chunk_size=options['batch_size']):
+                user_id = row.pop('to_user')
+                batch.append(UserRating(
+                    user_id=user_id,
+                    average=row['rating_sum'] / row['rating_count'],
+                    **row
+                ))
+                if len(batch) >= options['batch_size']:
+                    UserRating.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            UserRating.objects.bulk_create(batch)
+            created += len(batch)
+        # Cached responses showing ratings are keyed on the feedback tag
+        invalidate_tags('feedback')
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings for {created} users."))
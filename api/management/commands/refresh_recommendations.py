@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.services.recommendations import refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh skill similarities and precomputed partner recommendations. "
+        "Only the users and skill columns affected by changes recorded since the "
+        "last run are loaded and recomputed, unless --full is given. Run --full "
+        "after bulk loads, which record no changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recompute every column and user.")
+        parser.add_argument('--max-age', type=int,
+                            help="Also recompute users whose partners are older than this many seconds "
+                                 "(default: RECOMMENDATION_MAX_AGE).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counts = refresh_recommendations(
+            full=options['full'], max_age=options['max_age'],
+            batch_size=options['batch_size'], log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {counts['columns']} skill columns and {counts['users']} users' recommendations."
+        ))
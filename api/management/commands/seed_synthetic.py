@@ -0,0 +1,174 @@
+import random
+import time
+from array import array
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Feedback, Profile, Skill, SwapCounter, SwapRequest, UserSkill
+from api.services.availability import preset_slots
+from api.services.geocoding import geocode
+from api.services.indexes import invalidate_indexes
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+PREFIX = 'synthetic-'
+PASSWORD = 'synthetic'
+ADMIN_USERNAME = f'{PREFIX}admin'
+
+CITIES = ['Pune', 'Mumbai', 'Bengaluru', 'Delhi', 'Chennai', 'Hyderabad', 'Kolkata', 'Ahmedabad', None]
+AVAILABILITY = ['Weekends', 'Weekday evenings', 'Mornings', 'Flexible', None]
+# status, cumulative share of swaps
+STATUSES = [('pending', 0.40), ('accepted', 0.60), ('rejected', 0.75), ('completed', 1.0)]
+COUNTER_FIELDS = [f'{direction}_{status}' for direction in ('sent', 'received') for status, _ in STATUSES]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic users, skills, user skills, swaps and feedback with bulk inserts. "
+        "Use a dedicated database; bench_endpoints runs against the result."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='1k')
+        parser.add_argument('--users', type=int, help="Exact number of users; overrides --scale.")
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError("Synthetic data already exists in this database.")
+        total = options['users'] or SCALES[options['scale']]
+        if total < 4:
+            raise CommandError("Seed at least 4 users.")
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.password = make_password(PASSWORD)
+        started = time.monotonic()
+
+        skill_ids = self.seed_skills(max(50, min(total // 20, 50_000)))
+        user_ids, offered = self.seed_users(total, skill_ids)
+        completed = self.seed_swaps(user_ids, offered)
+        self.seed_feedback(completed)
+        call_command('rebuild_ratings', batch_size=self.batch_size, stdout=self.stdout)
+        # bulk_create sends no signals for the running workers' indexes to follow
+        invalidate_indexes()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {total} users in {time.monotonic() - started:.1f}s."
+        ))
+
+    def pick_skill(self, count):
+        # Squaring skews picks towards low indexes, so a few skills are popular
+        return int(count * self.rng.random() ** 2)
+
+    def seed_skills(self, count):
+        skills = Skill.objects.bulk_create(
+            [Skill(name=f'synthetic skill {i}', is_approved=i % 50 != 49) for i in range(count)],
+            batch_size=self.batch_size,
+        )
+        self.stdout.write(f"skills: {count}")
+        return [skill.id for skill in skills]
+
+    def seed_users(self, total, skill_ids):
+        """Users with profiles and four skills each; returns user ids and two offered skill ids per user."""
+        user_ids = array('q')
+        offered = array('q')
+        for start in range(0, total, self.batch_size):
+            count = min(self.batch_size, total - start)
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'{PREFIX}{i}', email=f'{PREFIX}{i}@example.com', password=self.password,
+                         first_name=f'First{i}', last_name=f'Last{i % 997}')
+                    for i in range(start, start + count)
+                ])
+                if start == 0:
+                    users.append(User.objects.create_superuser(ADMIN_USERNAME, f'{ADMIN_USERNAME}@example.com', PASSWORD))
+                profiles = []
+                for user in users:
+                    if user.username == ADMIN_USERNAME:
+                        continue
+                    location = self.rng.choice(CITIES)
+                    # bulk_create skips Profile.save(), which normally geocodes the location
+                    # and fills in the slots of an availability preset
+                    latitude, longitude = geocode(location) or (None, None)
+                    availability = self.rng.choice(AVAILABILITY)
+                    if user.username == f'{PREFIX}0':
+                        # bench_endpoints searches by this member's availability
+                        availability = AVAILABILITY[0]
+                    profiles.append(Profile(user=user, location=location, latitude=latitude, longitude=longitude,
+                                            availability=availability, availability_slots=preset_slots(availability) or [],
+                                            is_public=self.rng.random() < 0.9))
+                Profile.objects.bulk_create(profiles)
+                user_skills = []
+                for user in users[:count]:
+                    picked = set()
+                    while len(picked) < 4:
+                        picked.add(skill_ids[self.pick_skill(len(skill_ids))])
+                    for n, skill_id in enumerate(picked):
+                        user_skills.append(UserSkill(
+                            user=user, skill_id=skill_id, skill_type='offered' if n < 2 else 'wanted',
+                            proficiency_level=self.rng.randint(1, 5),
+                        ))
+                user_skills = UserSkill.objects.bulk_create(user_skills)
+            user_ids.extend(user.id for user in users[:count])
+            offered.extend(user_skill.id for user_skill in user_skills if user_skill.skill_type == 'offered')
+            self.stdout.write(f"users: {start + count}")
+        return user_ids, offered
+
+    def status(self):
+        roll = self.rng.random()
+        return next(status for status, share in STATUSES if roll < share)
+
+    def seed_swaps(self, user_ids, offered):
+        """One swap sent per user, plus inbox counters; returns the completed swaps."""
+        total = len(user_ids)
+        # Eight counters per user, flat, so 1M users stay around 64 MB
+        counters = array('q', bytes(8 * len(COUNTER_FIELDS) * total))
+        half = len(COUNTER_FIELDS) // 2
+        completed = []
+        for start in range(0, total, self.batch_size):
+            swaps = []
+            for i in range(start, min(start + self.batch_size, total)):
+                # User 0 gets a pending and a completed swap from users 1 and 2,
+                # so benchmarks have something to accept and review
+                if i in (1, 2):
+                    j, status = 0, ('pending' if i == 1 else 'completed')
+                else:
+                    j = self.rng.randrange(total - 1)
+                    j += j >= i
+                    status = self.status()
+                swaps.append(SwapRequest(
+                    requester_id=user_ids[i], recipient_id=user_ids[j],
+                    requester_skill_id=offered[2 * i + self.rng.randrange(2)],
+                    recipient_skill_id=offered[2 * j + self.rng.randrange(2)],
+                    status=status, message=f'Swap offer {i}',
+                ))
+                index = [status for status, _ in STATUSES].index(status)
+                counters[i * len(COUNTER_FIELDS) + index] += 1
+                counters[j * len(COUNTER_FIELDS) + half + index] += 1
+            with transaction.atomic():
+                swaps = SwapRequest.objects.bulk_create(swaps)
+            completed.extend((swap.id, swap.requester_id, swap.recipient_id) for swap in swaps if swap.status == 'completed')
+            self.stdout.write(f"swaps: {start + len(swaps)}")
+
+        width = len(COUNTER_FIELDS)
+        for start in range(0, total, self.batch_size):
+            SwapCounter.objects.bulk_create([
+                SwapCounter(user_id=user_ids[i], **dict(zip(COUNTER_FIELDS, counters[i * width:(i + 1) * width])))
+                for i in range(start, min(start + self.batch_size, total))
+            ])
+        return completed
+
+    def seed_feedback(self, completed):
+        """Requesters review three in four completed swaps; user 0 has not reviewed theirs."""
+        rows = [swap for swap in completed if self.rng.random() < 0.75]
+        for start in range(0, len(rows), self.batch_size):
+            Feedback.objects.bulk_create([
+                Feedback(swap_request_id=swap_id, from_user_id=requester_id, to_user_id=recipient_id,
+                         rating=min(5, 1 + int(5 * self.rng.random() ** 0.5)), comment='Synthetic review')
+                for swap_id, requester_id, recipient_id in rows[start:start + self.batch_size]
+            ])
+        self.stdout.write(f"feedback: {len(rows)}")
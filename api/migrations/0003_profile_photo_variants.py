@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_skill_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
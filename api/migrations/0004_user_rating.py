@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_user_ratings(apps, schema_editor):
+    Feedback = apps.get_model('api', 'Feedback')
+    UserRating = apps.get_model('api', 'UserRating')
+    db_alias = schema_editor.connection.alias
+    totals = (
+        Feedback.objects.using(db_alias).order_by()
+        .values('to_user')
+        .annotate(
+            rating_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'count_{i}': Count('id', filter=Q(rating=i)) for i in range(1, 6)}
+        )
+    )
+    UserRating.objects.using(db_alias).bulk_create(
+        (
+            UserRating(user_id=row.pop('to_user'), average=row['rating_sum'] / row['rating_count'], **row)
+            for row in totals
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_profile_photo_variants'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRating',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('average', models.FloatField(default=0.0)),
+                ('count_1', models.PositiveIntegerField(default=0)),
+                ('count_2', models.PositiveIntegerField(default=0)),
+                ('count_3', models.PositiveIntegerField(default=0)),
+                ('count_4', models.PositiveIntegerField(default=0)),
+                ('count_5', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-average', '-rating_count'], name='userrating_top_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_user_ratings, migrations.RunPython.noop),
+    ]
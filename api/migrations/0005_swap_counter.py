@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_swap_counters(apps, schema_editor):
+    SwapRequest = apps.get_model('api', 'SwapRequest')
+    SwapCounter = apps.get_model('api', 'SwapCounter')
+    db_alias = schema_editor.connection.alias
+    counters = {}
+    for direction, user_field in (('sent', 'requester'), ('received', 'recipient')):
+        rows = SwapRequest.objects.using(db_alias).order_by().values(user_field, 'status').annotate(total=Count('id'))
+        for row in rows:
+            counter = counters.setdefault(row[user_field], SwapCounter(user_id=row[user_field]))
+            setattr(counter, f"{direction}_{row['status']}", row['total'])
+    SwapCounter.objects.using(db_alias).bulk_create(counters.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_user_rating'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwapCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='swap_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('sent_pending', models.IntegerField(default=0)),
+                ('sent_accepted', models.IntegerField(default=0)),
+                ('sent_rejected', models.IntegerField(default=0)),
+                ('sent_completed', models.IntegerField(default=0)),
+                ('received_pending', models.IntegerField(default=0)),
+                ('received_accepted', models.IntegerField(default=0)),
+                ('received_rejected', models.IntegerField(default=0)),
+                ('received_completed', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_swap_counters, migrations.RunPython.noop),
+    ]
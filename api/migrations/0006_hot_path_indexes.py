@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:24
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def reject_duplicate_pending_swaps(apps, schema_editor):
+    """Keep the oldest of any duplicate pending swaps so the unique constraint can be added."""
+    SwapRequest = apps.get_model('api', 'SwapRequest')
+    SwapCounter = apps.get_model('api', 'SwapCounter')
+    db_alias = schema_editor.connection.alias
+    key = ('requester', 'recipient', 'requester_skill', 'recipient_skill')
+    duplicates = (
+        SwapRequest.objects.using(db_alias).filter(status='pending').order_by()
+        .values(*key).annotate(total=Count('id')).filter(total__gt=1)
+    )
+    for group in duplicates:
+        group.pop('total')
+        extras = SwapRequest.objects.using(db_alias).filter(status='pending', **group).order_by('created_at', 'id')[1:]
+        for swap in extras:
+            SwapRequest.objects.using(db_alias).filter(pk=swap.pk).update(status='rejected')
+            SwapCounter.objects.using(db_alias).filter(user_id=swap.requester_id).update(
+                sent_pending=F('sent_pending') - 1, sent_rejected=F('sent_rejected') + 1)
+            SwapCounter.objects.using(db_alias).filter(user_id=swap.recipient_id).update(
+                received_pending=F('received_pending') - 1, received_rejected=F('received_rejected') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_swap_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(reject_duplicate_pending_swaps, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['to_user', '-created_at'], name='feedback_to_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='swaprequest',
+            index=models.Index(fields=['requester', 'status', '-created_at'], name='swap_requester_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='swaprequest',
+            index=models.Index(fields=['recipient', 'status', '-created_at'], name='swap_recipient_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userskill',
+            index=models.Index(fields=['skill', 'skill_type', 'user', 'proficiency_level'], name='userskill_skill_type_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='swaprequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('requester', 'recipient', 'requester_skill', 'recipient_skill'), name='unique_pending_swap'),
+        ),
+    ]
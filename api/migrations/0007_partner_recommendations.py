@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_hot_path_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartnerRecommendation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='partner_recommendations', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('partners', models.JSONField(default=list)),
+                ('signature', models.BigIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['computed_at'], name='partner_rec_computed_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SkillNeighbours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skill_type', models.CharField(choices=[('offered', 'Offered'), ('wanted', 'Wanted')], max_length=10)),
+                ('neighbours', models.JSONField(default=list)),
+                ('signature', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.skill')),
+            ],
+            options={
+                'unique_together': {('skill', 'skill_type')},
+            },
+        ),
+    ]
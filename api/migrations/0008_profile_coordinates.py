@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:50
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+from api.services.geocoding import geocode
+
+
+def geocode_profiles(apps, schema_editor):
+    Profile = apps.get_model('api', 'Profile')
+    db_alias = schema_editor.connection.alias
+    by_location = defaultdict(list)
+    rows = Profile.objects.using(db_alias).exclude(location__isnull=True).exclude(location='').values_list('id', 'location')
+    for pk, location in rows.iterator(chunk_size=5000):
+        by_location[location].append(pk)
+    for location, ids in by_location.items():
+        point = geocode(location)
+        if point is None:
+            continue
+        for start in range(0, len(ids), 1000):
+            Profile.objects.using(db_alias).filter(id__in=ids[start:start + 1000]).update(latitude=point[0], longitude=point[1])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_partner_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(geocode_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:54
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# The profile form's availability choices as of this migration, as
+# (days, start hour, end hour); a copy, so later changes to the live table
+# do not change what this migration writes
+MINUTES_PER_DAY = 24 * 60
+WEEKDAYS = range(5)
+WEEKEND = range(5, 7)
+EVERY_DAY = range(7)
+PRESETS = {
+    'weekdays': (WEEKDAYS, 9, 18),
+    'weekends': (WEEKEND, 9, 21),
+    'mornings': (EVERY_DAY, 6, 12),
+    'afternoons': (EVERY_DAY, 12, 17),
+    'evenings': (EVERY_DAY, 17, 22),
+    'weekday evenings': (WEEKDAYS, 17, 22),
+    'weekend mornings': (WEEKEND, 6, 12),
+    'flexible': (EVERY_DAY, 8, 22),
+}
+
+
+def preset_slots(text):
+    # One interval per day, within the day and in day order: already normalized
+    preset = PRESETS.get(' '.join((text or '').casefold().split()))
+    if preset is None:
+        return None
+    days, start, end = preset
+    return [[day * MINUTES_PER_DAY + start * 60, day * MINUTES_PER_DAY + end * 60] for day in days]
+
+
+def fill_availability_slots(apps, schema_editor):
+    Profile = apps.get_model('api', 'Profile')
+    db_alias = schema_editor.connection.alias
+    by_text = defaultdict(list)
+    rows = Profile.objects.using(db_alias).exclude(availability__isnull=True).exclude(availability='').values_list('id', 'availability')
+    for pk, text in rows.iterator(chunk_size=5000):
+        by_text[text].append(pk)
+    for text, ids in by_text.items():
+        slots = preset_slots(text)
+        if slots is None:
+            continue
+        for start in range(0, len(ids), 1000):
+            Profile.objects.using(db_alias).filter(id__in=ids[start:start + 1000]).update(availability_slots=slots)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_profile_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='availability_slots',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(fill_availability_slots, migrations.RunPython.noop),
+    ]
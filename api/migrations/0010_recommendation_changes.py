@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:37
+
+from django.db import migrations, models
+
+
+def clear_skill_neighbours(apps, schema_editor):
+    """Stored columns have no norms or holders yet; with none left, the next refresh is a full one."""
+    SkillNeighbours = apps.get_model('api', 'SkillNeighbours')
+    SkillNeighbours.objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_profile_availability_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('skill_id', models.BigIntegerField(null=True)),
+                ('skill_type', models.CharField(blank=True, max_length=10)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='partnerrecommendation',
+            name='signature',
+        ),
+        migrations.RemoveField(
+            model_name='skillneighbours',
+            name='signature',
+        ),
+        migrations.AddField(
+            model_name='skillneighbours',
+            name='holders',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='skillneighbours',
+            name='norm',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(clear_skill_neighbours, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,114 @@
-from django.db import models
+from copy import deepcopy
+from django.db import models, IntegrityError, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models import Case, Exists, F, FloatField, When
+from django.db.models.functions import Cast
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.fields.files import FieldFile
 from django.dispatch import receiver
+from django.utils import timezone
+from api.services.availability import preset_slots
+from api.services.geocoding import geocode
+from api.signals import swap_status_changed
 
-class Profile(models.Model):
+class DirtyFieldsMixin:
+    """
+    Tracks the column values an instance was loaded with. Saving a loaded
+    instance without ``update_fields`` writes only the changed columns (plus
+    ``auto_now`` ones), and skips the UPDATE when nothing changed.
+    """
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._snapshot()
+        return instance
+    
+    def _snapshot(self):
+        values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                if isinstance(value, FieldFile):
+                    value = value.name
+                elif isinstance(value, (dict, list)):
+                    value = deepcopy(value)
+                values[field.attname] = value
+        return values
+    
+    def get_dirty_fields(self):
+        """Names of fields changed since loading, or None for an instance that was not loaded."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            value = self.__dict__[field.attname]
+            if field.attname not in loaded:
+                dirty.append(field.name)
+            elif isinstance(value, FieldFile):
+                if not value._committed or value.name != loaded[field.attname]:
+                    dirty.append(field.name)
+            elif value != loaded[field.attname]:
+                dirty.append(field.name)
+        return dirty
+    
+    def save(self, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                if not dirty:
+                    return
+                auto_now = [field.name for field in self._meta.concrete_fields
+                            if getattr(field, 'auto_now', False) and field.name not in dirty]
+                kwargs['update_fields'] = dirty + auto_now
+        super().save(**kwargs)
+        self._loaded_values = self._snapshot()
+
+class Profile(DirtyFieldsMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     location = models.CharField(max_length=100, blank=True, null=True)
     profile_photo = models.ImageField(upload_to='profile_photos/', blank=True, null=True)
+    # Thumbnail storage names by size and format, e.g. {"128": {"jpeg": ..., "webp": ...}}
+    photo_variants = models.JSONField(default=dict, blank=True)
     availability = models.CharField(max_length=255, blank=True, null=True)
+    # Recurring weekly intervals as [[start, end], ...] minutes from Monday 00:00,
+    # normalized by api.services.availability.normalize_slots
+    availability_slots = models.JSONField(default=list, blank=True)
+    # Geocoded from location against the bundled gazetteer on save
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
     is_public = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            changed = set(update_fields)
+        else:
+            dirty = self.get_dirty_fields()
+            if dirty is None:
+                # New instance: slots given explicitly take precedence over the text
+                changed = {'location'} if self.availability_slots else {'location', 'availability'}
+            else:
+                changed = set(dirty)
+        extra = []
+        if 'location' in changed:
+            self.latitude, self.longitude = geocode(self.location) or (None, None)
+            extra += ['latitude', 'longitude']
+        # Picking one of the form's choices fills in its slots unless slots were given too
+        if 'availability' in changed and 'availability_slots' not in changed:
+            slots = preset_slots(self.availability)
+            if slots is not None:
+                self.availability_slots = slots
+                extra.append('availability_slots')
+        if update_fields is not None and extra:
+            kwargs['update_fields'] = [*update_fields, *extra]
+        super().save(**kwargs)
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
@@ -21,14 +118,11 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
-
 class Skill(models.Model):
     name = models.CharField(max_length=100, unique=True)
     is_approved = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -47,10 +141,34 @@ class UserSkill(models.Model):
 
     class Meta:
         unique_together = ('user', 'skill', 'skill_type')
+        indexes = [
+            # Covers skill searches: who has (skill, skill_type), at what level
+            models.Index(fields=['skill', 'skill_type', 'user', 'proficiency_level'], name='userskill_skill_type_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.skill.name} ({self.skill_type})"
 
+class SwapRequestQuerySet(models.QuerySet):
+    def involving(self, user, role='all'):
+        """Swaps the user sent, received, or either (one WHERE clause, not a UNION)."""
+        if role == 'sent':
+            return self.filter(requester=user)
+        if role == 'received':
+            return self.filter(recipient=user)
+        return self.filter(models.Q(requester=user) | models.Q(recipient=user))
+
+    def with_names(self):
+        """Join the usernames and skill names SwapRequestSerializer shows, and only those columns."""
+        return self.select_related(
+            'requester', 'recipient', 'requester_skill__skill', 'recipient_skill__skill'
+        ).only(
+            'id', 'requester', 'recipient', 'requester_skill', 'recipient_skill',
+            'status', 'message', 'created_at', 'updated_at',
+            'requester__username', 'recipient__username',
+            'requester_skill__skill__name', 'recipient_skill__skill__name',
+        )
+
 class SwapRequest(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -68,6 +186,30 @@ class SwapRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SwapRequestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Swap lists filter by participant (and status) newest first
+            models.Index(fields=['requester', 'status', '-created_at'], name='swap_requester_status_idx'),
+            models.Index(fields=['recipient', 'status', '-created_at'], name='swap_recipient_status_idx'),
+        ]
+        constraints = [
+            # One pending request per requester/recipient/skill pair
+            models.UniqueConstraint(
+                fields=['requester', 'recipient', 'requester_skill', 'recipient_skill'],
+                condition=models.Q(status='pending'),
+                name='unique_pending_swap',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so status changes can be detected on save
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     def __str__(self):
         return f"Swap Request from {self.requester.username} to {self.recipient.username} - {self.status}"
 
@@ -83,6 +225,194 @@ class Feedback(models.Model):
 
     class Meta:
         unique_together = ('swap_request', 'from_user')
+        indexes = [
+            models.Index(fields=['to_user', '-created_at'], name='feedback_to_user_idx'),
+        ]
 
     def __str__(self):
         return f"Feedback from {self.from_user.username} to {self.to_user.username} - {self.rating}/5"
+
+class UserRatingManager(models.Manager):
+    def apply(self, user_id, rating, delta=1):
+        """
+        Add (delta=1) or remove (delta=-1) one rating for a user with a single
+        UPDATE, creating the row the first time the user is rated.
+        """
+        new_count = F('rating_count') + delta
+        new_sum = F('rating_sum') + rating * delta
+        values = {
+            'rating_count': new_count,
+            'rating_sum': new_sum,
+            f'count_{rating}': F(f'count_{rating}') + delta,
+            # SET expressions read the old column values, so recompute from them
+            'average': Case(
+                When(rating_count__lte=-delta, then=0.0),
+                default=Cast(new_sum, FloatField()) / Cast(new_count, FloatField()),
+                output_field=FloatField(),
+            ),
+        }
+        if self.filter(user_id=user_id).update(**values) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, rating_count=1, rating_sum=rating,
+                            average=float(rating), **{f'count_{rating}': 1})
+        except IntegrityError:
+            # Another request created the row first
+            self.filter(user_id=user_id).update(**values)
+
+class UserRating(models.Model):
+    """Denormalized rating totals per user, kept in step with Feedback."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='rating')
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    average = models.FloatField(default=0.0)
+    count_1 = models.PositiveIntegerField(default=0)
+    count_2 = models.PositiveIntegerField(default=0)
+    count_3 = models.PositiveIntegerField(default=0)
+    count_4 = models.PositiveIntegerField(default=0)
+    count_5 = models.PositiveIntegerField(default=0)
+
+    objects = UserRatingManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-average', '-rating_count'], name='userrating_top_idx'),
+        ]
+
+    @property
+    def histogram(self):
+        return {i: getattr(self, f'count_{i}') for i in range(1, 6)}
+
+    def __str__(self):
+        return f"{self.user.username} - {self.average:.2f} ({self.rating_count})"
+
+@receiver(post_save, sender=Feedback)
+def add_feedback_rating(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserRating.objects.apply(instance.to_user_id, instance.rating)
+
+@receiver(post_delete, sender=Feedback)
+def remove_feedback_rating(sender, instance, **kwargs):
+    UserRating.objects.apply(instance.to_user_id, instance.rating, delta=-1)
+
+class SwapCounterManager(models.Manager):
+    def adjust(self, user_id, **deltas):
+        """
+        Apply counter deltas for a user with one UPDATE. The row is created
+        only for a positive delta: a decrement with no row left to update
+        comes from a delete cascading from the user, whose row is gone or
+        about to be.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        values = {field: F(field) + delta for field, delta in deltas.items()}
+        if self.filter(user_id=user_id).update(**values) or max(deltas.values()) < 0:
+            return
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, **{field: max(delta, 0) for field, delta in deltas.items()})
+        except IntegrityError:
+            self.filter(user_id=user_id).update(**values)
+
+class SwapCounter(models.Model):
+    """Per-user swap request counts by direction and status, for notification badges."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='swap_counter')
+    sent_pending = models.IntegerField(default=0)
+    sent_accepted = models.IntegerField(default=0)
+    sent_rejected = models.IntegerField(default=0)
+    sent_completed = models.IntegerField(default=0)
+    received_pending = models.IntegerField(default=0)
+    received_accepted = models.IntegerField(default=0)
+    received_rejected = models.IntegerField(default=0)
+    received_completed = models.IntegerField(default=0)
+
+    objects = SwapCounterManager()
+
+    def __str__(self):
+        return f"{self.user.username}'s swap counters"
+
+def _adjust_swap_counters(swap, status, delta, skip=None):
+    if swap.requester_id != skip:
+        SwapCounter.objects.adjust(swap.requester_id, **{f'sent_{status}': delta})
+    if swap.recipient_id != skip:
+        SwapCounter.objects.adjust(swap.recipient_id, **{f'received_{status}': delta})
+
+@receiver(post_save, sender=SwapRequest)
+def count_swap_request(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if previous != instance.status:
+        if previous is not None:
+            _adjust_swap_counters(instance, previous, -1)
+        _adjust_swap_counters(instance, instance.status, 1)
+        swap_status_changed.send(sender=sender, instance=instance, previous=previous, created=created)
+
+@receiver(post_delete, sender=SwapRequest)
+def uncount_swap_request(sender, instance, origin=None, **kwargs):
+    status = getattr(instance, '_loaded_status', None) or instance.status
+    # The counters of a user being deleted go with them
+    deleted_user = origin.pk if isinstance(origin, User) else None
+    _adjust_swap_counters(instance, status, -1, skip=deleted_user)
+
+@receiver(pre_save, sender=User)
+def touch_swaps_on_rename(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Swap lists show usernames, and their ETags follow the swaps' updated_at.
+    # Logins save last_login alone and skip this.
+    if raw or instance._state.adding or (update_fields is not None and 'username' not in update_fields):
+        return
+    renamed = User.objects.filter(pk=instance.pk).exclude(username=instance.username)
+    SwapRequest.objects.involving(instance).filter(Exists(renamed)).update(updated_at=timezone.now())
+
+class SkillNeighbours(models.Model):
+    """
+    The most similar columns of the user x skill matrix to one (skill,
+    skill_type) column, written by refresh_recommendations.
+    """
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='+')
+    skill_type = models.CharField(max_length=10, choices=UserSkill.SKILL_TYPE_CHOICES)
+    # [[skill_id, skill_type, similarity], ...], most similar first
+    neighbours = models.JSONField(default=list)
+    # The column's Euclidean norm and heaviest [[user_id, weight], ...], so a
+    # refresh can score against the column without loading it
+    norm = models.FloatField(default=0)
+    holders = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('skill', 'skill_type')
+
+    def __str__(self):
+        return f"Neighbours of skill {self.skill_id} ({self.skill_type})"
+
+class PartnerRecommendation(models.Model):
+    """Precomputed "people you may want to swap with" for one user."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='partner_recommendations')
+    # [{"user_id", "score", "offers": [[skill_id, level], ...], "wants": [...]}, ...], best first
+    partners = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['computed_at'], name='partner_rec_computed_idx'),
+        ]
+
+    def __str__(self):
+        return f"Recommendations for {self.user.username}"
+
+class RecommendationChange(models.Model):
+    """
+    A user whose skills or completed swaps changed since the last
+    refresh_recommendations run. ``skill_id``/``skill_type`` name a column the
+    user left, which their remaining skills no longer show. Plain ids rather
+    than foreign keys, so deleting the user or skill keeps the record.
+    """
+    user_id = models.BigIntegerField()
+    skill_id = models.BigIntegerField(null=True)
+    skill_type = models.CharField(max_length=10, blank=True)
+
+    def __str__(self):
+        return f"Recommendation change for user {self.user_id}"
@@ -0,0 +1,170 @@
+from collections import defaultdict
+from functools import lru_cache
+
+from django.db.models import QuerySet
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+
+class NotProjectable(Exception):
+    """Raised for serializer fields that cannot be read from a values() row."""
+
+
+class Projection:
+    """
+    Read-only stand-in for ``Serializer(queryset, many=True).data``.
+
+    The declared serializer fields are compiled once into ``values_list``
+    lookups plus the matching field's ``to_representation``, so each row is
+    built as a plain dict without instantiating models or serializers. The
+    output has the same keys, order and formats as the serializer.
+
+    Supported fields: model and ``source``-dotted fields, primary key related
+    fields, nested ``many=True`` serializers over a reverse foreign key, and
+    method fields the serializer declares in ``projected_fields`` (mapping the
+    field name to its lookups; ``project_<name>(*values)`` builds the value).
+
+    A dotted source that crosses a null foreign key behaves as in DRF: the
+    field's default, ``None`` if it allows null, otherwise the key is left out.
+    """
+
+    def __init__(self, serializer_class, context=None):
+        self.serializer_class = serializer_class
+        self.serializer = serializer_class(context=context or {})
+        self.lookups = []
+        self.columns = []
+        self.nested = []
+
+        model = serializer_class.Meta.model
+        projected = getattr(serializer_class, 'projected_fields', {})
+        for name, field in self.serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in projected:
+                start = len(self.lookups)
+                self.lookups.extend(projected[name])
+                method = getattr(self.serializer, f'project_{name}')
+                self.columns.append((name, slice(start, len(self.lookups)), method, ()))
+            elif isinstance(field, serializers.ListSerializer):
+                relation = model._meta.get_field(field.source)
+                if not relation.one_to_many:
+                    raise NotProjectable(f'{serializer_class.__name__}.{name}')
+                child = get_projection(type(field.child))
+                self.nested.append((name, relation.field.name, child))
+                self.columns.append((name, None, None, ()))
+            elif isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+                raise NotProjectable(f'{serializer_class.__name__}.{name}')
+            else:
+                to_representation = None if isinstance(field, PrimaryKeyRelatedField) else field.to_representation
+                guards = tuple(self._lookup(path) for path in _nullable_relations(model, field))
+                self.columns.append((name, self._lookup(field.source.replace('.', '__')), to_representation, guards))
+
+        # Nested lists are grouped by the parent primary key
+        self.pk_index = self._lookup('pk') if self.nested else None
+
+    def _lookup(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        return self.lookups.index(lookup)
+
+    def rows(self, queryset):
+        """Return a lazy values_list queryset; it can be sliced or paginated."""
+        return queryset.values_list(*self.lookups)
+
+    def to_dicts(self, rows):
+        rows = list(rows)
+        children = {
+            name: child.grouped(fk, [row[self.pk_index] for row in rows])
+            for name, fk, child in self.nested
+        }
+        data = []
+        for row in rows:
+            item = {}
+            for name, index, to_representation, guards in self.columns:
+                if index is None:
+                    item[name] = children[name].get(row[self.pk_index], [])
+                elif isinstance(index, slice):
+                    item[name] = to_representation(*row[index])
+                elif guards and any(row[guard] is None for guard in guards):
+                    field = self.serializer.fields[name]
+                    if field.default is not empty:
+                        item[name] = field.to_representation(field.get_default())
+                    elif field.allow_null:
+                        item[name] = None
+                else:
+                    value = row[index]
+                    item[name] = value if value is None or to_representation is None else to_representation(value)
+            data.append(item)
+        return data
+
+    def grouped(self, fk, parent_ids):
+        """Project the child rows of ``parent_ids``, grouped by parent and ordered by pk."""
+        if not parent_ids:
+            return {}
+        model = self.serializer_class.Meta.model
+        rows = model._default_manager.filter(**{f'{fk}__in': parent_ids}).order_by('pk')
+        rows = list(rows.values_list(fk, *self.lookups))
+        groups = defaultdict(list)
+        for parent_id, item in zip((row[0] for row in rows), self.to_dicts(row[1:] for row in rows)):
+            groups[parent_id].append(item)
+        return groups
+
+    def data(self, queryset):
+        return self.to_dicts(self.rows(queryset))
+
+
+def _nullable_relations(model, field):
+    """Lookups of the nullable forward relations a dotted source passes through."""
+    paths = []
+    attrs = field.source.split('.')
+    for depth, attr in enumerate(attrs[:-1], 1):
+        relation = model._meta.get_field(attr)
+        if relation.concrete and relation.null:
+            paths.append('__'.join(attrs[:depth]))
+        model = relation.related_model
+    return paths
+
+
+@lru_cache(maxsize=None)
+def get_projection(serializer_class):
+    """Compiled projection for serializers that do not read the request context."""
+    return Projection(serializer_class)
+
+
+class ProjectedListMixin:
+    """
+    Serves GET list responses through a Projection of the view's serializer
+    instead of instantiating a serializer per row. Querysets that are not
+    projectable (plain lists, or serializers with unsupported fields) fall back
+    to the regular list.
+    """
+    projected_list = True
+
+    def get_projection(self):
+        serializer_class = self.get_serializer_class()
+        if getattr(serializer_class, 'projected_fields', None):
+            # Method fields may build absolute URLs from the request
+            return Projection(serializer_class, context=self.get_serializer_context())
+        return get_projection(serializer_class)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if not self.projected_list or not isinstance(queryset, QuerySet):
+            return self._list_serialized(queryset)
+        try:
+            projection = self.get_projection()
+        except NotProjectable:
+            return self._list_serialized(queryset)
+
+        page = self.paginate_queryset(projection.rows(queryset))
+        if page is not None:
+            return self.get_paginated_response(projection.to_dicts(page))
+        return Response(projection.data(queryset))
+
+    def _list_serialized(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
@@ -0,0 +1,206 @@
+import logging
+import re
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+# Collapse literal lists so "IN (%s, %s)" and "IN (%s)" share one shape
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+_paused = ContextVar('query_budget_paused', default=False)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_shape(sql):
+    """Normalise a SQL statement so repeated queries with different params match."""
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _NUMBER_RE.sub('N', sql)
+
+
+def _project_stack(innermost=4):
+    """Format the project frames of the current stack plus the innermost library frames."""
+    base_dir = str(settings.BASE_DIR)
+    frames = traceback.extract_stack()[:-3]
+    project = [
+        frame for frame in frames[:-innermost]
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+    ]
+    return ''.join(traceback.format_list(project + frames[-innermost:]))
+
+
+@contextmanager
+def unrecorded():
+    """Leave the queries run inside out of every active recorder, e.g. an index load."""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+class QueryRecorder:
+    """
+    Records every SQL statement executed on all connections while active.
+
+    Formatting a stack costs more than most queries, so one is kept only
+    for the queries a report shows: those past ``budget`` and the first
+    query of a shape once it repeats often enough to look like N+1.
+    """
+
+    def __init__(self, capture_stacks=True, budget=None):
+        self.capture_stacks = capture_stacks
+        self.budget = budget
+        self.threshold = getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 3)
+        self.queries = []
+        self._shapes = defaultdict(list)
+
+    def __call__(self, execute, sql, params, many, context):
+        if _paused.get():
+            return execute(sql, params, many, context)
+        query = [sql, '']
+        seen = self._shapes[query_shape(sql)]
+        seen.append(query)
+        if self.capture_stacks:
+            if self.budget is not None and len(self.queries) >= self.budget:
+                query[1] = _project_stack()
+            elif len(seen) == self.threshold:
+                # Stack of the query that tipped the shape over, reported for all of it
+                seen[0][1] = _project_stack()
+        self.queries.append(query)
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def record(self):
+        with _wrap_all_connections(self):
+            yield self
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated_shapes(self, threshold=None):
+        """Return {shape: [stacks]} for query shapes run at least ``threshold`` times."""
+        if threshold is None:
+            threshold = self.threshold
+        return {
+            shape: [stack for sql, stack in queries]
+            for shape, queries in self._shapes.items() if len(queries) >= threshold
+        }
+
+    def report(self, label, budget=None):
+        lines = [f"{label}: {self.count} queries" + (f" (budget {budget})" if budget is not None else "")]
+        if budget is not None and self.count > budget:
+            sql, stack = self.queries[budget]
+            lines.append(f"First query over budget: {sql}")
+            if stack:
+                lines.append(stack.rstrip())
+        for shape, stacks in self.repeated_shapes().items():
+            lines.append(f"Possible N+1: {len(stacks)}x {shape}")
+            if stacks[0]:
+                lines.append(stacks[0].rstrip())
+        return '\n'.join(lines)
+
+
+@contextmanager
+def _wrap_all_connections(wrapper):
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield
+
+
+def get_view_budget(view, method=None):
+    """
+    Return the ``query_budget`` declared on a view class or function, if any.
+
+    A budget is either an int that applies to every method or a dict keyed
+    by viewset action or HTTP method, e.g. ``{'list': 3, 'destroy': 12,
+    'POST': 6}``. The action wins over the method, and ``'default'`` covers
+    anything not listed.
+    """
+    view_class = getattr(view, 'view_class', None) or getattr(view, 'cls', None) or view
+    budget = getattr(view_class, 'query_budget', None)
+    if not isinstance(budget, dict):
+        return budget
+    method = (method or 'GET').upper()
+    # Router-built viewset functions map methods to actions
+    action = (getattr(view, 'actions', None) or {}).get(method.lower())
+    for key in (action, method, 'default'):
+        if key in budget:
+            return budget[key]
+    return None
+
+
+def check_budget(recorder, budget, label):
+    """Raise QueryBudgetExceeded if the recorder went over budget or shows N+1 patterns."""
+    if (budget is not None and recorder.count > budget) or recorder.repeated_shapes():
+        raise QueryBudgetExceeded(recorder.report(label, budget))
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts queries per request and compares them with the view's declared
+    ``query_budget``. Over-budget requests and repeated query shapes are
+    logged with stack traces, or raised when QUERY_BUDGET_RAISE is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'QUERY_BUDGET_ENABLED', False)
+        self.raise_on_exceed = getattr(settings, 'QUERY_BUDGET_RAISE', False)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        # Resolve up front so the recorder knows which queries need a stack
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return self.get_response(request)
+
+        budget = get_view_budget(match.func, request.method)
+        recorder = QueryRecorder(budget=budget)
+        with recorder.record():
+            response = self.get_response(request)
+
+        label = f"{request.method} {request.path}"
+        try:
+            check_budget(recorder, budget, label)
+        except QueryBudgetExceeded as exc:
+            if self.raise_on_exceed:
+                raise
+            logger.warning(str(exc))
+        response['X-Query-Count'] = str(recorder.count)
+        return response
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin that fails a test when a request goes over its view's query budget."""
+
+    @contextmanager
+    def assertWithinQueryBudget(self, budget, label='block'):
+        recorder = QueryRecorder(budget=budget)
+        with recorder.record():
+            yield recorder
+        try:
+            check_budget(recorder, budget, label)
+        except QueryBudgetExceeded as exc:
+            self.fail(str(exc))
+
+    def assertViewWithinBudget(self, client, method, url, **kwargs):
+        budget = get_view_budget(resolve(url.split('?')[0]).func, method)
+        self.assertIsNotNone(budget, f"{url} does not declare a query_budget")
+        with self.assertWithinQueryBudget(budget, f"{method.upper()} {url}"):
+            response = getattr(client, method)(url, **kwargs)
+        return response
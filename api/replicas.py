@@ -0,0 +1,136 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.functional import LazyObject
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+logger = logging.getLogger(__name__)
+
+# Replica alias chosen for the current request, or None to read from the primary
+_read_alias = ContextVar('read_alias', default=None)
+# alias -> monotonic time until which a replica that failed to connect is skipped
+_down_until = {}
+
+
+def _pins():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE_ALIAS', 'default')]
+
+
+def pin_to_primary(user_id):
+    """Send the user's reads to the primary until replicas have caught up with their write."""
+    seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    if seconds:
+        _pins().set(f'replica-pin:{user_id}', 1, timeout=seconds)
+
+
+def is_pinned(user_id):
+    return _pins().get(f'replica-pin:{user_id}') is not None
+
+
+def request_user_id(request):
+    """
+    User id from the request's bearer token, without touching the database.
+    Authentication proper still happens in the view; this only decides routing.
+    """
+    user = getattr(request, 'user', None)
+    # Skip Django's lazy session user, which would query the database
+    if user is not None and not isinstance(user, LazyObject) and user.is_authenticated:
+        return user.id
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(header) != 2 or header[0] not in jwt_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        return AccessToken(header[1]).get(jwt_settings.USER_ID_CLAIM)
+    except TokenError:
+        return None
+
+
+def choose_replica():
+    """Pick a healthy replica at random, or None when every replica is down."""
+    replicas = list(getattr(settings, 'REPLICA_DATABASES', ()))
+    random.shuffle(replicas)
+    now = time.monotonic()
+    for alias in replicas:
+        if _down_until.get(alias, 0) > now:
+            continue
+        try:
+            # No-op for a live persistent connection
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            logger.warning("Read replica %s is unavailable; skipping it for now.", alias, exc_info=True)
+            _down_until[alias] = now + getattr(settings, 'REPLICA_RETRY_SECONDS', 30)
+            continue
+        return alias
+    return None
+
+
+def current_read_alias():
+    """The replica chosen for this request, for work that outlives the routing context."""
+    return _read_alias.get()
+
+
+class ReplicaRouter:
+    """
+    Routes reads of read-only endpoints to a replica and everything else to
+    the primary. ReplicaMiddleware decides per request; outside a request, and
+    inside a transaction on the primary, reads stay on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Sends safe requests to views that set ``read_replica = True`` to a
+    replica, unless the user wrote something in the last REPLICA_PIN_SECONDS.
+    Successful unsafe requests start that window.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _read_alias.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user_id = request_user_id(request)
+            if user_id is not None:
+                pin_to_primary(user_id)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS or not getattr(settings, 'REPLICA_DATABASES', None):
+            return None
+        view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None) or view_func
+        if not getattr(view_class, 'read_replica', False):
+            return None
+        user_id = request_user_id(request)
+        if user_id is None or not is_pinned(user_id):
+            _read_alias.set(choose_replica())
+        return None
@@ -0,0 +1,24 @@
+from rest_framework import serializers
+
+
+class MatchedSkillSerializer(serializers.Serializer):
+    skill_id = serializers.IntegerField()
+    skill_name = serializers.CharField()
+    proficiency_level = serializers.IntegerField()
+
+
+class MatchSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='user.id')
+    username = serializers.CharField(source='user.username')
+    first_name = serializers.CharField(source='user.first_name')
+    last_name = serializers.CharField(source='user.last_name')
+    location = serializers.CharField(source='user.profile.location', allow_null=True)
+    score = serializers.IntegerField()
+    they_offer = MatchedSkillSerializer(many=True)
+    they_want = MatchedSkillSerializer(many=True)
+    # Minutes per week both users are available; null until the current user sets slots
+    availability_overlap = serializers.IntegerField(allow_null=True)
+
+
+class RecommendationSerializer(MatchSerializer):
+    score = serializers.FloatField()
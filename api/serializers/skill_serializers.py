@@ -1,3 +1,5 @@
+from django.db import router, transaction
+from django.db.models.signals import post_save
 from rest_framework import serializers
 from api.models import Skill, UserSkill
 from .user_serializers import UserSerializer
@@ -30,6 +32,65 @@ class UserSkillSerializer(serializers.ModelSerializer):
         
         return attrs
 
+class UserSkillBulkCreateSerializer(serializers.ListSerializer):
+    """
+    Creates many user skills in a fixed number of queries: one lookup and one
+    insert for the skill names, then one lookup and one upsert for the user
+    skills. Re-adding a skill the user already has updates its proficiency
+    level instead of failing, and its post_save is sent with created=False.
+    The writes share one transaction, so receivers that act on commit run
+    once for the whole batch.
+    """
+    
+    @transaction.atomic
+    def create(self, validated_data):
+        user = self.context['request'].user
+        
+        # Remove duplicates in memory; the last entry for a skill wins
+        items = {}
+        for item in validated_data:
+            items[(item['skill_name'].lower(), item['skill_type'])] = item
+        
+        # One IN query for known skills, one insert for the rest
+        names = {name for name, _ in items}
+        skills_by_name = {skill.name: skill for skill in Skill.objects.filter(name__in=names)}
+        new_skills = Skill.objects.bulk_create(
+            [Skill(name=name) for name in sorted(names - skills_by_name.keys())],
+            update_conflicts=True, unique_fields=['name'], update_fields=['name'],
+        )
+        # Only skills that existed before can already be on the user's list
+        existing = set()
+        if skills_by_name:
+            existing = set(UserSkill.objects.filter(
+                user=user, skill__in=skills_by_name.values()
+            ).values_list('skill_id', 'skill_type'))
+        skills_by_name.update((skill.name, skill) for skill in new_skills)
+        
+        user_skills = UserSkill.objects.bulk_create(
+            [
+                UserSkill(
+                    user=user, skill=skills_by_name[name], skill_type=skill_type,
+                    proficiency_level=item.get('proficiency_level', 3),
+                )
+                for (name, skill_type), item in items.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'skill', 'skill_type'],
+            update_fields=['proficiency_level'],
+        )
+        
+        # bulk_create skips model signals; send them so indexes and caches follow
+        using = router.db_for_write(UserSkill)
+        for skill in new_skills:
+            post_save.send(sender=Skill, instance=skill, created=True,
+                           update_fields=None, raw=False, using=using)
+        for user_skill in user_skills:
+            created = (user_skill.skill_id, user_skill.skill_type) not in existing
+            post_save.send(sender=UserSkill, instance=user_skill, created=created,
+                           update_fields=None if created else ['proficiency_level'],
+                           raw=False, using=using)
+        return user_skills
+
 class UserSkillCreateSerializer(serializers.ModelSerializer):
     skill_name = serializers.CharField(write_only=True)
     
@@ -37,6 +98,7 @@ class UserSkillCreateSerializer(serializers.ModelSerializer):
         model = UserSkill
         fields = ('id', 'skill_name', 'skill_type', 'proficiency_level')
         read_only_fields = ('id',)
+        list_serializer_class = UserSkillBulkCreateSerializer
     
     def create(self, validated_data):
         user = self.context['request'].user
@@ -1,3 +1,4 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from api.models import SwapRequest, Feedback, UserSkill
 from .user_serializers import UserSerializer
@@ -28,30 +29,23 @@ class SwapRequestCreateSerializer(serializers.ModelSerializer):
         recipient_skill = attrs.get('recipient_skill')
         
         # Check if the requester is the owner of the requester_skill
-        if requester_skill.user != requester:
+        if requester_skill.user_id != requester.id:
             raise serializers.ValidationError({"requester_skill": "You can only offer your own skills."})
         
         # Check if the recipient is the owner of the recipient_skill
-        if recipient_skill.user != recipient:
+        if recipient_skill.user_id != recipient.id:
             raise serializers.ValidationError({"recipient_skill": "You can only request skills from their owner."})
         
-        # Check if a similar request already exists
-        existing_request = SwapRequest.objects.filter(
-            requester=requester,
-            recipient=recipient,
-            requester_skill=requester_skill,
-            recipient_skill=recipient_skill,
-            status='pending'
-        ).exists()
-        
-        if existing_request:
-            raise serializers.ValidationError("A similar swap request already exists.")
-        
         return attrs
     
     def create(self, validated_data):
         validated_data['requester'] = self.context['request'].user
-        return super().create(validated_data)
+        # The unique_pending_swap constraint rejects duplicates at insert time
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError("A similar swap request already exists.")
 
 class SwapRequestUpdateSerializer(serializers.ModelSerializer):
     class Meta:
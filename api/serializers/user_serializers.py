@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from api.models import Profile, UserSkill
+from django.core.files.storage import default_storage
+from api.models import Profile, UserSkill, UserRating
+from api.services.availability import overlap_minutes, slots_from_days, slots_to_days
+from api.services.geocoding import haversine_km
+from api.services.photos import variant_name
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -26,30 +30,50 @@ class RegisterSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
+class AvailabilitySlotsField(serializers.Field):
+    """Weekly slots as ``[{"day": "mon", "start": "18:00", "end": "21:00"}, ...]``."""
+    
+    def to_representation(self, value):
+        return slots_to_days(value)
+    
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError('Expected a list of slots.')
+        try:
+            return slots_from_days(data)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
 class ProfileSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     email = serializers.EmailField(source='user.email', read_only=True)
     first_name = serializers.CharField(source='user.first_name', required=False)
     last_name = serializers.CharField(source='user.last_name', required=False)
+    average_rating = serializers.FloatField(source='user.rating.average', read_only=True, allow_null=True)
+    rating_count = serializers.IntegerField(source='user.rating.rating_count', read_only=True, allow_null=True)
+    availability_slots = AvailabilitySlotsField(required=False)
     
     class Meta:
         model = Profile
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 
-                  'location', 'profile_photo', 'availability', 'is_public')
-        read_only_fields = ('id', 'username', 'email')
+                  'location', 'latitude', 'longitude', 'profile_photo', 'availability',
+                  'availability_slots', 'is_public',
+                  'average_rating', 'rating_count')
+        read_only_fields = ('id', 'username', 'email', 'latitude', 'longitude')
         
     def update(self, instance, validated_data):
         user_data = validated_data.pop('user', {})
         user = instance.user
         
-        # Update User model fields
-        if 'first_name' in user_data:
-            user.first_name = user_data['first_name']
-        if 'last_name' in user_data:
-            user.last_name = user_data['last_name']
-        user.save()
+        # Update User model fields, writing only the ones that changed
+        changed = [attr for attr in ('first_name', 'last_name')
+                   if attr in user_data and getattr(user, attr) != user_data[attr]]
+        for attr in changed:
+            setattr(user, attr, user_data[attr])
+        if changed:
+            user.save(update_fields=changed)
         
-        # Update Profile model fields
+        # Update Profile model fields; Profile.save() writes only dirty columns
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
@@ -64,13 +88,84 @@ class UserSkillInfoSerializer(serializers.ModelSerializer):
         fields = ('id', 'skill_name', 'skill_type', 'proficiency_level')
 
 class UserSearchSerializer(serializers.ModelSerializer):
-    profile_photo = serializers.ImageField(source='profile.profile_photo', read_only=True)
+    profile_photo = serializers.SerializerMethodField()
+    profile_photo_webp = serializers.SerializerMethodField()
     location = serializers.CharField(source='profile.location', read_only=True)
     availability = serializers.CharField(source='profile.availability', read_only=True)
+    availability_slots = AvailabilitySlotsField(source='profile.availability_slots', read_only=True)
+    availability_overlap = serializers.SerializerMethodField()
+    average_rating = serializers.FloatField(source='rating.average', read_only=True, allow_null=True)
+    rating_count = serializers.IntegerField(source='rating.rating_count', read_only=True, allow_null=True)
     user_skills = UserSkillInfoSerializer(many=True, read_only=True)
+    distance_km = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ('id', 'username', 'first_name', 'last_name', 
-                  'profile_photo', 'location', 'availability', 'user_skills')
-        read_only_fields = fields 
\ No newline at end of file
+                  'profile_photo', 'profile_photo_webp', 'location', 'availability',
+                  'availability_slots', 'availability_overlap',
+                  'average_rating', 'rating_count', 'user_skills', 'distance_km')
+        read_only_fields = fields
+    # Lets api.projection.Projection build the method fields from values() rows
+    projected_fields = {
+        'profile_photo': ('profile__profile_photo', 'profile__photo_variants'),
+        'profile_photo_webp': ('profile__photo_variants',),
+        'distance_km': ('profile__latitude', 'profile__longitude'),
+        'availability_overlap': ('profile__availability_slots',),
+    }
+    
+    def _photo_url(self, name):
+        if not name:
+            return None
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def get_profile_photo(self, obj):
+        profile = obj.profile
+        return self.project_profile_photo(profile.profile_photo.name, profile.photo_variants)
+    
+    def get_profile_photo_webp(self, obj):
+        return self.project_profile_photo_webp(obj.profile.photo_variants)
+    
+    def project_profile_photo(self, name, variants):
+        # Prefer the small thumbnail; fall back to the original until it is generated
+        return self._photo_url(variant_name(variants) or name)
+    
+    def project_profile_photo_webp(self, variants):
+        return self._photo_url(variant_name(variants, fmt='webp')) 
+    
+    def get_distance_km(self, obj):
+        return self.project_distance_km(obj.profile.latitude, obj.profile.longitude)
+    
+    def project_distance_km(self, latitude, longitude):
+        # Only "near" searches put an origin in the context
+        origin = self.context.get('origin')
+        if origin is None or latitude is None or longitude is None:
+            return None
+        return round(haversine_km(*origin, latitude, longitude), 1)
+    
+    def get_availability_overlap(self, obj):
+        return self.project_availability_overlap(obj.profile.availability_slots)
+    
+    def project_availability_overlap(self, slots):
+        # Minutes per week shared with the searcher, when the search ranks by availability
+        mine = self.context.get('slots')
+        if mine is None:
+            return None
+        return overlap_minutes(mine, slots)
+
+class TopRatedUserSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='user.id', read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+    location = serializers.CharField(source='user.profile.location', read_only=True)
+    average_rating = serializers.FloatField(source='average', read_only=True)
+    histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    
+    class Meta:
+        model = UserRating
+        fields = ('id', 'username', 'first_name', 'last_name', 'location',
+                  'average_rating', 'rating_count', 'histogram')
+        read_only_fields = fields
@@ -0,0 +1,149 @@
+import heapq
+import time
+from bisect import bisect_left, bisect_right
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.models import Skill
+from api.services.indexes import SharedIndex
+from api.services.search import search_engine
+from api.signals import bulk_updated
+
+# Prefixes matching more skills than this are ranked from a short-lived cache
+RANK_SCAN_LIMIT = 2000
+RANK_CACHE_SECONDS = 60
+# Ranked results kept per cached prefix, enough for the largest page
+RANK_CACHE_SIZE = 50
+
+
+class SkillAutocomplete(SharedIndex):
+    """
+    Prefix lookup over approved skill names, ranked by how many UserSkill
+    rows reference each skill.
+
+    Names are kept casefolded in a sorted array, so a prefix is one bisect
+    away from its range of matches. Usage counts come from the search
+    engine's posting lists. Broad prefixes, whose ranges are too long to
+    rank per keystroke, reuse their ranking for RANK_CACHE_SECONDS. The
+    array is built lazily and patched from Skill signals.
+    """
+    name = 'autocomplete'
+
+    def _clear(self):
+        self._keys = []
+        self._ids = []
+        # skill_id -> name, for approved skills
+        self._names = {}
+        # prefix -> (expires, [(skill_id, user_count), ...])
+        self._ranked = {}
+
+    def _load(self):
+        rows = Skill.objects.using(DEFAULT_DB_ALIAS).filter(is_approved=True).values_list('id', 'name').iterator(chunk_size=5000)
+        self._names = dict(rows)
+        entries = sorted((name.casefold(), skill_id) for skill_id, name in self._names.items())
+        self._keys = [key for key, _ in entries]
+        self._ids = [skill_id for _, skill_id in entries]
+
+    def _remove(self, skill_id):
+        name = self._names.pop(skill_id, None)
+        if name is None:
+            return
+        key = name.casefold()
+        index = bisect_left(self._keys, key)
+        while self._ids[index] != skill_id:
+            index += 1
+        del self._keys[index]
+        del self._ids[index]
+
+    def _upsert(self, skill_id, name, is_approved):
+        self._remove(skill_id)
+        if is_approved:
+            key = name.casefold()
+            index = bisect_right(self._keys, key)
+            self._keys.insert(index, key)
+            self._ids.insert(index, skill_id)
+            self._names[skill_id] = name
+        self._ranked = {}
+
+    def upsert(self, skill_id, name, is_approved):
+        with self._lock:
+            # Most skill saves leave the name and approval alone; don't make every process rebuild
+            if self._loaded and is_approved and self._names.get(skill_id) == name:
+                return
+        with self.patching() as loaded:
+            if loaded:
+                self._upsert(skill_id, name, is_approved)
+
+    def discard(self, skill_id):
+        with self.patching() as loaded:
+            if loaded:
+                self._remove(skill_id)
+                self._ranked = {}
+
+    def reindex(self, skill_ids):
+        """Re-read skills changed without per-row signals, such as by admin bulk approve/reject."""
+        with self.patching() as loaded:
+            if not loaded:
+                return
+            rows = Skill.objects.using(DEFAULT_DB_ALIAS).filter(id__in=skill_ids).values_list('id', 'name', 'is_approved')
+            for skill_id, name, is_approved in rows:
+                self._upsert(skill_id, name, is_approved)
+
+    def complete(self, prefix, limit=10):
+        """
+        Return up to ``limit`` approved skills whose name starts with
+        ``prefix`` (case-insensitively) as ``(skill_id, name, user_count)``,
+        most used first, then by name.
+        """
+        self.ensure_loaded()
+        key = prefix.casefold()
+        with self._lock:
+            start = bisect_left(self._keys, key)
+            # Every key with the prefix sorts before prefix + the highest code point
+            end = bisect_left(self._keys, key + '\U0010ffff', start)
+            if end - start <= RANK_SCAN_LIMIT:
+                ranked = self._rank(self._ids[start:end], limit)
+            else:
+                cached = self._ranked.get(key)
+                if cached is None or cached[0] < time.monotonic() or len(cached[1]) < limit:
+                    cached = (time.monotonic() + RANK_CACHE_SECONDS,
+                              self._rank(self._ids[start:end], max(limit, RANK_CACHE_SIZE)))
+                    self._ranked[key] = cached
+                ranked = cached[1][:limit]
+            names = self._names
+            ranked = [(skill_id, names[skill_id], count) for skill_id, count in ranked if skill_id in names]
+        return ranked
+
+    def _rank(self, skill_ids, limit):
+        # Positions follow name order, so equal counts rank alphabetically
+        counts = search_engine.holder_counts(skill_ids)
+        return [
+            (skill_id, count)
+            for count, _, skill_id in heapq.nlargest(
+                limit, ((count, -position, skill_id) for position, (skill_id, count) in enumerate(zip(skill_ids, counts)))
+            )
+        ]
+
+
+skill_autocomplete = SkillAutocomplete()
+
+
+@receiver(post_save, sender=Skill)
+def index_skill_name(sender, instance, **kwargs):
+    values = (instance.pk, instance.name, instance.is_approved)
+    transaction.on_commit(lambda: skill_autocomplete.upsert(*values))
+
+
+@receiver(post_delete, sender=Skill)
+def unindex_skill_name(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: skill_autocomplete.discard(pk))
+
+
+@receiver(bulk_updated)
+def reindex_bulk_updated_skills(sender, ids, **kwargs):
+    # Sent after commit by admin bulk approve/reject
+    if sender is Skill:
+        skill_autocomplete.reindex(ids)
@@ -0,0 +1,135 @@
+import re
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+MAX_SLOTS = 50
+
+WEEKDAYS = range(5)
+WEEKEND = range(5, 7)
+EVERY_DAY = range(7)
+# The choices offered by the profile form, as (days, start hour, end hour)
+PRESETS = {
+    'weekdays': (WEEKDAYS, 9, 18),
+    'weekends': (WEEKEND, 9, 21),
+    'mornings': (EVERY_DAY, 6, 12),
+    'afternoons': (EVERY_DAY, 12, 17),
+    'evenings': (EVERY_DAY, 17, 22),
+    'weekday evenings': (WEEKDAYS, 17, 22),
+    'weekend mornings': (WEEKEND, 6, 12),
+    'flexible': (EVERY_DAY, 8, 22),
+}
+
+_TIME_RE = re.compile(r'^(\d{1,2}):(\d{2})$')
+
+
+def normalize_slots(slots):
+    """
+    Canonical form of ``[[start, end], ...]`` minute-of-week intervals:
+    sorted, overlapping and touching intervals merged, then cut at midnight
+    so no interval spans two days. Intervals may run past the end of the
+    week and wrap round to Monday.
+    """
+    pieces = []
+    for start, end in slots:
+        length = min(end - start, MINUTES_PER_WEEK)
+        if length <= 0:
+            continue
+        start %= MINUTES_PER_WEEK
+        end = start + length
+        if end > MINUTES_PER_WEEK:
+            pieces.append([0, end - MINUTES_PER_WEEK])
+            end = MINUTES_PER_WEEK
+        pieces.append([start, end])
+    pieces.sort()
+
+    merged = []
+    for start, end in pieces:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    normalized = []
+    for start, end in merged:
+        while end - start > 0:
+            midnight = (start // MINUTES_PER_DAY + 1) * MINUTES_PER_DAY
+            normalized.append([start, min(end, midnight)])
+            start = midnight
+    return normalized
+
+
+def preset_slots(text):
+    """Slots for one of the profile form's availability choices, or None for any other text."""
+    preset = PRESETS.get(' '.join((text or '').casefold().split()))
+    if preset is None:
+        return None
+    days, start, end = preset
+    return normalize_slots(
+        [day * MINUTES_PER_DAY + start * 60, day * MINUTES_PER_DAY + end * 60] for day in days
+    )
+
+
+def overlap_minutes(a, b):
+    """Minutes shared by two normalized slot lists, walking both in order."""
+    total = i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if end > start:
+            total += end - start
+        if a[i][1] <= b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+def parse_time(value):
+    """Minutes since midnight for "HH:MM", allowing "24:00"; raises ValueError."""
+    match = _TIME_RE.match(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid time '{value}'; use HH:MM.")
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if minutes > 59 or hours * 60 + minutes > MINUTES_PER_DAY:
+        raise ValueError(f"Invalid time '{value}'.")
+    return hours * 60 + minutes
+
+
+def format_time(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def slots_from_days(entries):
+    """
+    Normalized slots from ``[{"day": "mon", "start": "18:00", "end": "21:00"}, ...]``.
+    An end at or before the start runs past midnight into the next day.
+    Raises ValueError for malformed entries.
+    """
+    if len(entries) > MAX_SLOTS:
+        raise ValueError(f'At most {MAX_SLOTS} slots are allowed.')
+    slots = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError('Each slot must be an object with day, start and end.')
+        day = str(entry.get('day', '')).strip().casefold()[:3]
+        if day not in DAYS:
+            raise ValueError(f"Invalid day '{entry.get('day')}'; use one of {', '.join(DAYS)}.")
+        start, end = parse_time(entry.get('start', '')), parse_time(entry.get('end', ''))
+        if end <= start:
+            end += MINUTES_PER_DAY
+        offset = DAYS.index(day) * MINUTES_PER_DAY
+        slots.append([offset + start, offset + end])
+    return normalize_slots(slots)
+
+
+def slots_to_days(slots):
+    """The ``slots_from_days`` form of normalized slots, one entry per day piece."""
+    return [
+        {
+            'day': DAYS[start // MINUTES_PER_DAY],
+            'start': format_time(start % MINUTES_PER_DAY),
+            'end': format_time(end - start // MINUTES_PER_DAY * MINUTES_PER_DAY),
+        }
+        for start, end in slots or ()
+    ]
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import secrets
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from api.models import Feedback
+from api.signals import swap_status_changed
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class InProcessBroker:
+    """
+    Fans events out to subscribers in this process.
+
+    Publishers may run on any thread (sync views, signal handlers); each
+    event is handed to the subscriber's event loop with
+    ``call_soon_threadsafe``, so an idle subscriber costs one queue and no
+    thread. Use RedisBroker (the EVENT_BROKER setting) when running several
+    workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        subscription = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_ids, event):
+        with self._lock:
+            targets = [sub for user_id in set(user_ids) for sub in self._subscribers.get(user_id, ())]
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                pass  # Subscriber's loop already closed
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Fans events out across worker processes through Redis pub/sub.
+
+    Events are published to a channel per user. Each worker holds one
+    pattern subscription, opened by its first subscriber, and hands what
+    arrives to its own subscribers the way InProcessBroker does.
+    """
+    channel_prefix = 'events:'
+
+    def __init__(self, url=None):
+        import redis
+
+        super().__init__()
+        self._url = url or settings.EVENT_BROKER_URL
+        self._redis = redis.Redis.from_url(self._url)
+        self._listener = None
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return subscription
+
+    def publish(self, user_ids, event):
+        from redis import RedisError
+
+        message = json.dumps(event, cls=DjangoJSONEncoder)
+        for user_id in set(user_ids):
+            try:
+                self._redis.publish(f'{self.channel_prefix}{user_id}', message)
+            except RedisError:
+                logger.exception("Could not publish %s for user %s", event['type'], user_id)
+
+    async def _listen(self):
+        from redis import RedisError
+        from redis import asyncio as aioredis
+
+        while True:
+            try:
+                client = aioredis.Redis.from_url(self._url, decode_responses=True)
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f'{self.channel_prefix}*')
+                    async for message in pubsub.listen():
+                        if message['type'] == 'pmessage':
+                            user_id = int(message['channel'][len(self.channel_prefix):])
+                            super().publish([user_id], json.loads(message['data']))
+            except RedisError:
+                logger.warning("Event subscription lost; reconnecting", exc_info=True)
+                await asyncio.sleep(1)
+
+
+def _offer(queue, event):
+    # Slow consumers lose their oldest events rather than growing without bound
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'EVENT_BROKER', 'api.services.events.InProcessBroker'))()
+    return _broker
+
+
+def _tickets():
+    return caches[getattr(settings, 'EVENT_TICKET_CACHE_ALIAS', 'default')]
+
+
+def issue_stream_ticket(user_id):
+    """
+    A single-use ticket that opens the user's event stream. EventSource
+    cannot send headers, and a ticket in the URL is harmless once used,
+    unlike an access token.
+    """
+    ticket = secrets.token_urlsafe(32)
+    _tickets().set(f'event-ticket:{ticket}', user_id, timeout=getattr(settings, 'EVENT_TICKET_SECONDS', 30))
+    return ticket
+
+
+def redeem_stream_ticket(ticket):
+    """The user id a ticket was issued to, or None if it is unknown, expired or used."""
+    if not ticket:
+        return None
+    cache = _tickets()
+    key = f'event-ticket:{ticket}'
+    user_id = cache.get(key)
+    # Only the request whose delete removed the ticket may use it
+    if user_id is None or not cache.delete(key):
+        return None
+    return user_id
+
+
+def format_event(event):
+    """Encode an event as a server-sent events frame."""
+    data = json.dumps(event['data'], cls=DjangoJSONEncoder)
+    return f"event: {event['type']}\ndata: {data}\n\n".encode()
+
+
+def publish_on_commit(user_ids, event_type, data):
+    event = {'type': event_type, 'data': data}
+    transaction.on_commit(lambda: get_broker().publish(user_ids, event))
+
+
+@receiver(swap_status_changed)
+def publish_swap_event(sender, instance, previous, created, **kwargs):
+    event_type = 'swap.created' if created else f'swap.{instance.status}'
+    publish_on_commit([instance.requester_id, instance.recipient_id], event_type, {
+        'id': instance.id,
+        'requester': instance.requester_id,
+        'recipient': instance.recipient_id,
+        'status': instance.status,
+        'previous_status': previous,
+        'updated_at': instance.updated_at,
+    })
+
+
+@receiver(post_save, sender=Feedback)
+def publish_feedback_event(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish_on_commit([instance.to_user_id], 'feedback.received', {
+            'id': instance.id,
+            'swap_request': instance.swap_request_id,
+            'from_user': instance.from_user_id,
+            'rating': instance.rating,
+            'created_at': instance.created_at,
+        })
@@ -0,0 +1,136 @@
+import csv
+import zipfile
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+
+from api.models import SwapRequest, Feedback
+
+CHUNK_SIZE = 2000
+
+# dataset -> (model, [(csv header, ndjson key, values() lookup)])
+DATASETS = {
+    'users': (User, [
+        ('ID', 'id', 'id'),
+        ('Username', 'username', 'username'),
+        ('Email', 'email', 'email'),
+        ('Date Joined', 'date_joined', 'date_joined'),
+        ('Last Login', 'last_login', 'last_login'),
+        ('Is Active', 'is_active', 'is_active'),
+    ]),
+    'swaps': (SwapRequest, [
+        ('ID', 'id', 'id'),
+        ('Requester', 'requester', 'requester__username'),
+        ('Recipient', 'recipient', 'recipient__username'),
+        ('Status', 'status', 'status'),
+        ('Created', 'created_at', 'created_at'),
+        ('Updated', 'updated_at', 'updated_at'),
+    ]),
+    'feedback': (Feedback, [
+        ('ID', 'id', 'id'),
+        ('Swap ID', 'swap_request', 'swap_request_id'),
+        ('From User', 'from_user', 'from_user__username'),
+        ('To User', 'to_user', 'to_user__username'),
+        ('Rating', 'rating', 'rating'),
+        ('Created', 'created_at', 'created_at'),
+    ]),
+}
+
+FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'ndjson': ('ndjson', 'application/x-ndjson'),
+}
+
+
+def iter_rows(dataset, using=None):
+    """Yield value tuples for a dataset with related names joined in SQL."""
+    model, columns = DATASETS[dataset]
+    lookups = [lookup for _, _, lookup in columns]
+    return model.objects.using(using).order_by('id').values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Buffer:
+    """Write-only file object whose contents are drained by the generator."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._chunks.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_dataset(dataset, fmt, using=None):
+    """Yield encoded chunks of one dataset in the requested format."""
+    _, columns = DATASETS[dataset]
+    buffer = _Buffer()
+    batch = 0
+
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow([header for header, _, _ in columns])
+        write_row = writer.writerow
+    else:
+        keys = [key for _, key, _ in columns]
+        encoder = DjangoJSONEncoder()
+
+        def write_row(row):
+            buffer.write(encoder.encode(dict(zip(keys, row))) + '\n')
+
+    for row in iter_rows(dataset, using):
+        write_row(row)
+        batch += 1
+        if batch == CHUNK_SIZE:
+            yield buffer.drain()
+            batch = 0
+    yield buffer.drain()
+
+
+def gzip_stream(chunks):
+    """Compress a byte stream with gzip framing without buffering it whole."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def zip_stream(datasets, fmt, using=None):
+    """Yield a zip archive holding one file per dataset."""
+    extension = FORMATS[fmt][0]
+    # The buffer cannot seek, so zipfile writes data descriptors after each member
+    sink = _Buffer()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for dataset in datasets:
+            with archive.open(f'{dataset}.{extension}', mode='w', force_zip64=True) as member:
+                for chunk in iter_dataset(dataset, fmt, using):
+                    member.write(chunk)
+                    yield sink.drain()
+    yield sink.drain()
+
+
+async def async_chunks(chunks):
+    """
+    Hand a chunk generator to an ASGI server one chunk at a time; Django
+    collects a sync iterator into a list before sending it. Every chunk is
+    produced in the request's sync thread, which owns the export's cursor.
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
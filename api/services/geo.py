@@ -0,0 +1,187 @@
+import math
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.models import Profile
+from api.services.geocoding import EARTH_RADIUS_KM, haversine_km
+from api.services.indexes import SharedIndex
+
+CELL_DEGREES = 0.5
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+# First radius tried by nearest(); it doubles until enough users are found
+NEAREST_START_KM = 10
+# Up to this many candidates are measured one by one rather than through the grid
+DIRECT_DISTANCE_LIMIT = 5000
+
+
+def cell_of(latitude, longitude):
+    return math.floor(latitude / CELL_DEGREES), math.floor(longitude / CELL_DEGREES)
+
+
+class GeoIndex(SharedIndex):
+    """
+    Grid index over the coordinates of public profiles.
+
+    The globe is cut into CELL_DEGREES cells; each cell maps a point to the
+    users located there. Gazetteer coordinates put a whole city on one
+    point, so distances are computed once per point rather than per user.
+    A query only visits the cells overlapping its bounding box. The index is
+    built lazily and patched from Profile signals.
+    """
+    name = 'geo'
+
+    def _clear(self):
+        # cell -> {(latitude, longitude): {user_id, ...}}
+        self._cells = defaultdict(dict)
+        # user_id -> (latitude, longitude)
+        self._points = {}
+
+    def _load(self):
+        rows = Profile.objects.using(DEFAULT_DB_ALIAS).filter(
+            is_public=True, latitude__isnull=False, longitude__isnull=False
+        ).values_list('user_id', 'latitude', 'longitude').iterator(chunk_size=5000)
+        for user_id, latitude, longitude in rows:
+            self._add(user_id, (latitude, longitude))
+
+    def _add(self, user_id, point):
+        self._cells[cell_of(*point)].setdefault(point, set()).add(user_id)
+        self._points[user_id] = point
+
+    def _remove(self, user_id):
+        point = self._points.pop(user_id, None)
+        if point is None:
+            return
+        cell = cell_of(*point)
+        users = self._cells[cell][point]
+        users.discard(user_id)
+        if not users:
+            del self._cells[cell][point]
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def upsert(self, user_id, latitude, longitude, is_public):
+        point = (latitude, longitude) if is_public and latitude is not None and longitude is not None else None
+        with self._lock:
+            # Most profile saves leave the location alone; don't make every process rebuild
+            if self._loaded and self._points.get(user_id) == point:
+                return
+        with self.patching() as loaded:
+            if loaded:
+                self._remove(user_id)
+                if point is not None:
+                    self._add(user_id, point)
+
+    def discard(self, user_id):
+        with self.patching() as loaded:
+            if loaded:
+                self._remove(user_id)
+
+    def location(self, user_id):
+        self.ensure_loaded()
+        return self._points.get(user_id)
+
+    def _cells_within(self, latitude, longitude, radius_km):
+        """Cells overlapping the bounding box of a circle."""
+        lat_span = radius_km / KM_PER_DEGREE
+        south, north = latitude - lat_span, latitude + lat_span
+        # Meridians converge, so the box widens with the latitude furthest from the equator
+        widest = min(max(abs(south), abs(north)), 89.999)
+        lon_span = radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest)))
+        if north >= 90 or south <= -90 or lon_span >= 180:
+            return list(self._cells)
+        rows = range(math.floor(south / CELL_DEGREES), math.floor(north / CELL_DEGREES) + 1)
+        columns = range(math.floor((longitude - lon_span) / CELL_DEGREES),
+                        math.floor((longitude + lon_span) / CELL_DEGREES) + 1)
+        if len(rows) * len(columns) > len(self._cells):
+            return list(self._cells)
+        wrap = round(360 / CELL_DEGREES)
+        half = wrap // 2
+        # Column indexes outside [-180, 180) wrap around the antimeridian
+        return [(row, (column + half) % wrap - half) for row in rows for column in columns]
+
+    def _points_within(self, latitude, longitude, radius_km):
+        """(distance_km, user ids) for every indexed point inside the circle, nearest first."""
+        found = []
+        for cell in self._cells_within(latitude, longitude, radius_km):
+            for (lat, lon), users in self._cells.get(cell, {}).items():
+                distance = haversine_km(latitude, longitude, lat, lon)
+                if distance <= radius_km:
+                    found.append((distance, users))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def within(self, latitude, longitude, radius_km, accept=None, limit=None):
+        """
+        Return ``[(user_id, distance_km), ...]`` for users within
+        ``radius_km``, nearest first, optionally keeping only users for
+        which ``accept(user_id)`` is true and stopping after ``limit``.
+        """
+        self.ensure_loaded()
+        results = []
+        with self._lock:
+            for distance, users in self._points_within(latitude, longitude, radius_km):
+                for user_id in sorted(users):
+                    if accept is None or accept(user_id):
+                        results.append((user_id, distance))
+                        if limit is not None and len(results) >= limit:
+                            return results
+        return results
+
+    def nearest(self, latitude, longitude, k, accept=None, max_km=HALF_CIRCUMFERENCE_KM):
+        """The ``k`` nearest accepted users within ``max_km``, as ``within`` returns them."""
+        radius = min(NEAREST_START_KM, max_km)
+        while True:
+            # Anything outside the radius is further than everything inside it
+            results = self.within(latitude, longitude, radius, accept=accept, limit=k)
+            if len(results) >= k or radius >= max_km:
+                return results
+            radius = min(radius * 2, max_km)
+
+
+geo_index = GeoIndex()
+
+
+def users_near(origin, radius_km, user_ids=None, exclude=None, limit=None):
+    """
+    Ids of public users within ``radius_km`` of ``origin``, nearest first:
+    all of them, or only those among ``user_ids``. Leaves out ``exclude``
+    and stops after ``limit``.
+    """
+    if user_ids is None:
+        accept = None if exclude is None else (lambda user_id: user_id != exclude)
+        if limit is None:
+            nearby = geo_index.within(*origin, radius_km, accept=accept)
+        else:
+            nearby = geo_index.nearest(*origin, limit, accept=accept, max_km=radius_km)
+        return [user_id for user_id, _ in nearby]
+    if len(user_ids) <= DIRECT_DISTANCE_LIMIT:
+        # Few candidates: measuring each one beats walking the grid
+        nearby = []
+        for user_id in user_ids:
+            point = geo_index.location(user_id)
+            if point is not None and user_id != exclude:
+                distance = haversine_km(*origin, *point)
+                if distance <= radius_km:
+                    nearby.append((distance, user_id))
+        nearby.sort()
+        return [user_id for _, user_id in nearby[:limit]]
+    candidates = set(user_ids)
+    candidates.discard(exclude)
+    nearby = geo_index.within(*origin, radius_km, accept=candidates.__contains__, limit=limit)
+    return [user_id for user_id, _ in nearby]
+
+
+@receiver(post_save, sender=Profile)
+def index_profile_location(sender, instance, **kwargs):
+    values = (instance.user_id, instance.latitude, instance.longitude, instance.is_public)
+    transaction.on_commit(lambda: geo_index.upsert(*values))
+
+
+@receiver(post_delete, sender=Profile)
+def unindex_profile_location(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: geo_index.discard(user_id))
@@ -0,0 +1,67 @@
+import csv
+import math
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+GAZETTEER_PATH = Path(__file__).resolve().parent.parent / 'data' / 'gazetteer.csv'
+EARTH_RADIUS_KM = 6371.0088
+# Longest place name in the gazetteer, in words
+MAX_NAME_WORDS = 4
+
+_COORDINATES_RE = re.compile(r'^\s*(-?\d{1,2}(?:\.\d+)?)\s*[,;\s]\s*(-?\d{1,3}(?:\.\d+)?)\s*$')
+
+
+def normalize(text):
+    """Casefold, strip accents and punctuation, and collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text).split())
+
+
+@lru_cache(maxsize=1)
+def gazetteer():
+    """Normalized place name or alias -> (latitude, longitude); the first entry for a name wins."""
+    places = {}
+    with open(GAZETTEER_PATH, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            point = (float(row['latitude']), float(row['longitude']))
+            for name in [row['name'], *filter(None, row['aliases'].split('|'))]:
+                places.setdefault(normalize(name), point)
+    return places
+
+
+@lru_cache(maxsize=4096)
+def geocode(location):
+    """
+    Coordinates for free-text ``location``, or None.
+
+    Accepts "lat, lon" pairs, and otherwise looks for the longest run of
+    words that names a place in the bundled gazetteer, so "Koregaon Park,
+    Pune" and "Pune, Maharashtra" both resolve to Pune.
+    """
+    if not location:
+        return None
+    match = _COORDINATES_RE.match(location)
+    if match:
+        latitude, longitude = float(match.group(1)), float(match.group(2))
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            return latitude, longitude
+        return None
+
+    places = gazetteer()
+    words = normalize(location).split()
+    for size in range(min(MAX_NAME_WORDS, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            point = places.get(' '.join(words[start:start + size]))
+            if point is not None:
+                return point
+    return None
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
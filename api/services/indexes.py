@@ -0,0 +1,136 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+from api.query_budget import unrecorded
+
+# Every SharedIndex subclass, by name, for invalidate_indexes()
+INDEX_NAMES = set()
+
+
+def _versions():
+    return caches[getattr(settings, 'INDEX_VERSION_CACHE_ALIAS', 'default')]
+
+
+def _version_key(name):
+    return f'index-version:{name}'
+
+
+def index_version(name):
+    """
+    Current shared version of an index. A missing version (never set, or
+    evicted) is seeded from the clock, so it never matches one a process
+    loaded before.
+    """
+    cache = _versions()
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_index_version(name):
+    """Bump and return the shared version, making every other process rebuild."""
+    cache = _versions()
+    key = _version_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def invalidate_indexes(*names):
+    """
+    Make every process rebuild the named indexes (all of them by default) on
+    their next query. Call this after writes that send no model signals:
+    queryset.update(), bulk_create() and management commands.
+    """
+    for name in names or sorted(INDEX_NAMES):
+        bump_index_version(name)
+
+
+class SharedIndex:
+    """
+    Base class for in-memory indexes that each worker process builds for itself.
+
+    A process loads its snapshot lazily with ``_load`` and then patches it
+    from model signals, which fire only in the process that wrote. Patches
+    also bump a version shared through INDEX_VERSION_CACHE_ALIAS, which must
+    increment atomically (see ``check_atomic_caches``): a patch whose bump
+    lands exactly one above the snapshot's version keeps the snapshot. A
+    process that finds a version it did not produce rebuilds on its next query, at
+    most INDEX_CHECK_SECONDS late. Writes that send no signals are picked up
+    when the snapshot is INDEX_MAX_AGE seconds old, or at once after
+    ``invalidate_indexes()``.
+
+    ``_load`` must read from the primary (``.using(DEFAULT_DB_ALIAS)``): a
+    snapshot from a lagging replica would be taken as the current version
+    and keep missing writes until the next one.
+    """
+    name = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        INDEX_NAMES.add(cls.name)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._version = None
+        self._built_at = self._checked_at = 0.0
+        self._clear()
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _load(self):
+        raise NotImplementedError
+
+    def ensure_loaded(self):
+        check_seconds = getattr(settings, 'INDEX_CHECK_SECONDS', 1)
+        if self._loaded and time.monotonic() - self._checked_at < check_seconds:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded and now - self._checked_at < check_seconds:
+                return
+            # Read the version first: a write landing during the load bumps it again
+            version = index_version(self.name)
+            max_age = getattr(settings, 'INDEX_MAX_AGE', 300)
+            if self._loaded and version == self._version and now - self._built_at < max_age:
+                self._checked_at = now
+                return
+            self._clear()
+            # A rebuild is paid once per process, not by the request that triggers it
+            with unrecorded():
+                self._load()
+            self._version = version
+            self._built_at = self._checked_at = time.monotonic()
+            self._loaded = True
+
+    @contextmanager
+    def patching(self):
+        """
+        Apply a write seen by this process, then publish it. Yields whether
+        there is a snapshot to patch. The snapshot keeps its place when no
+        other process published a write in between.
+        """
+        with self._lock:
+            yield self._loaded
+        version = bump_index_version(self.name)
+        with self._lock:
+            if self._loaded and self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+            self._loaded = False
+            self._version = None
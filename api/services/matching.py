@@ -0,0 +1,148 @@
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.models import UserSkill
+from api.services.indexes import SharedIndex
+
+OFFERED = 'offered'
+WANTED = 'wanted'
+
+
+class SkillIndex(SharedIndex):
+    """
+    In-memory inverted index over UserSkill keyed by (skill_id, skill_type).
+
+    The index is built lazily on first use and then patched from the
+    UserSkill save/delete signals, so serving a match request never scans
+    the api_userskill table.
+    """
+    name = 'matching'
+
+    def _clear(self):
+        # (skill_id, skill_type) -> {user_id: proficiency_level}
+        self._postings = defaultdict(dict)
+        # user_id -> {(skill_id, skill_type): proficiency_level}
+        self._by_user = defaultdict(dict)
+        # user_skill_id -> (user_id, skill_id, skill_type)
+        self._entries = {}
+
+    def _load(self):
+        rows = UserSkill.objects.using(DEFAULT_DB_ALIAS).values_list(
+            'id', 'user_id', 'skill_id', 'skill_type', 'proficiency_level'
+        ).iterator(chunk_size=5000)
+        for pk, user_id, skill_id, skill_type, proficiency in rows:
+            self._add(pk, user_id, skill_id, skill_type, proficiency)
+
+    def _add(self, pk, user_id, skill_id, skill_type, proficiency):
+        key = (skill_id, skill_type)
+        self._postings[key][user_id] = proficiency
+        self._by_user[user_id][key] = proficiency
+        self._entries[pk] = (user_id, skill_id, skill_type)
+
+    def _remove(self, pk):
+        entry = self._entries.pop(pk, None)
+        if entry is None:
+            return
+        user_id, skill_id, skill_type = entry
+        key = (skill_id, skill_type)
+        postings = self._postings.get(key)
+        if postings is not None:
+            postings.pop(user_id, None)
+            if not postings:
+                del self._postings[key]
+        user_keys = self._by_user.get(user_id)
+        if user_keys is not None:
+            user_keys.pop(key, None)
+            if not user_keys:
+                del self._by_user[user_id]
+
+    def upsert(self, pk, user_id, skill_id, skill_type, proficiency):
+        with self.patching() as loaded:
+            if loaded:
+                self._remove(pk)
+                self._add(pk, user_id, skill_id, skill_type, proficiency)
+
+    def discard(self, pk):
+        with self.patching() as loaded:
+            if loaded:
+                self._remove(pk)
+
+    def skills_for(self, user_id, skill_type):
+        """Return {skill_id: proficiency_level} for one user and skill type."""
+        self.ensure_loaded()
+        with self._lock:
+            return {
+                skill_id: proficiency
+                for (skill_id, kind), proficiency in self._by_user.get(user_id, {}).items()
+                if kind == skill_type
+            }
+
+    def users_for(self, skill_id, skill_type):
+        """Return {user_id: proficiency_level} for one (skill, skill_type) key."""
+        self.ensure_loaded()
+        with self._lock:
+            return dict(self._postings.get((skill_id, skill_type), {}))
+
+    def mutual_matches(self, user_id):
+        """
+        Return reciprocal matches for a user, best first.
+
+        Each match is a dict with the partner's user id, the skills they
+        offer that the user wants, and the skills the user offers that they
+        want. Partners must appear on both sides to be included.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            my_skills = self._by_user.get(user_id, {})
+            wanted = [skill_id for (skill_id, kind) in my_skills if kind == WANTED]
+            offered = {skill_id: level for (skill_id, kind), level in my_skills.items() if kind == OFFERED}
+
+            # Partners who offer something I want
+            they_offer = defaultdict(dict)
+            for skill_id in wanted:
+                for other_id, level in self._postings.get((skill_id, OFFERED), {}).items():
+                    if other_id != user_id:
+                        they_offer[other_id][skill_id] = level
+
+            # Of those, keep the ones who want something I offer
+            matches = []
+            for skill_id, my_level in offered.items():
+                for other_id in self._postings.get((skill_id, WANTED), {}):
+                    if other_id in they_offer:
+                        matches.append((other_id, skill_id, my_level))
+
+        they_want = defaultdict(dict)
+        for other_id, skill_id, my_level in matches:
+            they_want[other_id][skill_id] = my_level
+
+        results = []
+        for other_id, wanted_from_me in they_want.items():
+            offered_to_me = they_offer[other_id]
+            results.append({
+                'user_id': other_id,
+                'offers': offered_to_me,
+                'wants': wanted_from_me,
+                'score': len(offered_to_me) + len(wanted_from_me),
+                'proficiency': sum(offered_to_me.values()),
+            })
+        results.sort(key=lambda m: (-m['score'], -m['proficiency'], m['user_id']))
+        return results
+
+
+skill_index = SkillIndex()
+
+
+@receiver(post_save, sender=UserSkill)
+def index_user_skill(sender, instance, **kwargs):
+    values = (instance.pk, instance.user_id, instance.skill_id,
+              instance.skill_type, instance.proficiency_level)
+    transaction.on_commit(lambda: skill_index.upsert(*values))
+
+
+@receiver(post_delete, sender=UserSkill)
+def unindex_user_skill(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: skill_index.discard(pk))
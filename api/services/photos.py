@@ -0,0 +1,105 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from api.models import Profile
+from api.signals import bulk_updated
+
+logger = logging.getLogger(__name__)
+
+PHOTO_SIZES = getattr(settings, 'PROFILE_PHOTO_SIZES', (64, 128, 256))
+SEARCH_PHOTO_SIZE = getattr(settings, 'PROFILE_PHOTO_SEARCH_SIZE', 128)
+PHOTO_ASYNC = getattr(settings, 'PROFILE_PHOTO_ASYNC', True)
+THUMBNAIL_DIR = 'profile_photos/thumbs'
+
+# name -> (Pillow format, file extension, save options)
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='profile-photos')
+
+
+def _store(data, size, extension):
+    """Save bytes under a content-hashed name and return the storage name."""
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    name = f'{THUMBNAIL_DIR}/{digest}_{size}.{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def build_variants(photo):
+    """
+    Decode an image once and return {size: {format: storage name}} for every
+    configured square thumbnail size and output format.
+    """
+    with photo.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    variants = {}
+    for size in sorted(PHOTO_SIZES, reverse=True):
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        variants[str(size)] = {}
+        for fmt, (pillow_format, extension, options) in FORMATS.items():
+            buffer = BytesIO()
+            image.save(buffer, pillow_format, **options)
+            variants[str(size)][fmt] = _store(buffer.getvalue(), size, extension)
+    return variants
+
+
+def process_profile_photo(profile_id, photo_name):
+    """Generate thumbnails for a profile's current photo and record them on the profile."""
+    try:
+        profile = Profile.objects.get(pk=profile_id)
+        if profile.profile_photo.name != photo_name:
+            return  # Replaced by a newer upload, which has its own job
+        variants = build_variants(profile.profile_photo)
+        # Record them only if the photo is still current, so a slower job for
+        # an older upload never overwrites the thumbnails of a newer one
+        updated = Profile.objects.filter(pk=profile_id, profile_photo=photo_name).update(
+            photo_variants=variants, updated_at=timezone.now()
+        )
+        if updated:
+            bulk_updated.send(sender=Profile, ids=[profile_id], fields=['photo_variants', 'updated_at'])
+    except Exception:
+        logger.exception("Could not process photo for profile %s", profile_id)
+    finally:
+        if PHOTO_ASYNC:
+            close_old_connections()
+
+
+def schedule_photo_processing(profile):
+    """
+    Queue thumbnail generation for a newly uploaded photo after the current
+    transaction commits, so the request that uploaded it returns right away.
+    The previous photo's thumbnails are dropped at once; until the new ones
+    exist, search results fall back to the original.
+    """
+    # Written even if this instance never saw the old variants: it may have
+    # been loaded before the previous job recorded them
+    profile.photo_variants = {}
+    profile.save(update_fields=['photo_variants', 'updated_at'])
+    if not profile.profile_photo:
+        return
+
+    profile_id, photo_name = profile.pk, profile.profile_photo.name
+    if PHOTO_ASYNC:
+        transaction.on_commit(lambda: _executor.submit(process_profile_photo, profile_id, photo_name))
+    else:
+        transaction.on_commit(lambda: process_profile_photo(profile_id, photo_name))
+
+
+def variant_name(variants, size=SEARCH_PHOTO_SIZE, fmt='jpeg'):
+    """Return the storage name of a thumbnail from ``Profile.photo_variants``, or None if it has not been generated."""
+    return (variants or {}).get(str(size), {}).get(fmt)
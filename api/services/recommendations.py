@@ -0,0 +1,446 @@
+import heapq
+import math
+import threading
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from api.models import PartnerRecommendation, RecommendationChange, SkillNeighbours, SwapRequest, UserSkill
+from api.services.matching import OFFERED, WANTED
+from api.signals import swap_status_changed
+
+NEIGHBOURS_PER_SKILL = 20
+# Columns must share at least this many users to count as similar
+MIN_SUPPORT = 2
+# Skills of a user's predicted profile that partners are drawn from
+PREDICTED_SKILLS = 10
+HOLDERS_PER_SKILL = 50
+PARTNERS_PER_USER = 50
+
+
+def skill_weight(proficiency, completed):
+    """Matrix weight of one user skill: its level, raised by each completed swap that used it."""
+    return proficiency * (1 + math.log1p(completed))
+
+
+def complement(item):
+    """The column that meets ``item``: wanting a skill is met by people who offer it, and the other way round."""
+    skill_id, skill_type = item
+    return skill_id, OFFERED if skill_type == WANTED else WANTED
+
+
+def _heaviest(pair):
+    """Sort key for (key, value) pairs: largest value first, ties by key, whatever order they were loaded in."""
+    return -pair[1], pair[0]
+
+
+def _batches(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def completed_swaps(user_skill_ids=None):
+    """Completed swaps per user skill id, for every user skill or only ``user_skill_ids``."""
+    completed = Counter()
+    for field in ('requester_skill', 'recipient_skill'):
+        swaps = SwapRequest.objects.filter(status='completed', **{f'{field}__isnull': False})
+        if user_skill_ids is not None:
+            swaps = swaps.filter(**{f'{field}__in': user_skill_ids})
+        totals = swaps.order_by().values_list(field).annotate(total=Count('id'))
+        for user_skill_id, total in totals.iterator(chunk_size=5000):
+            completed[user_skill_id] += total
+    return completed
+
+
+class SkillMatrix:
+    """
+    Sparse user x (skill_id, skill_type) matrix over UserSkill, held as
+    rows and columns of dicts.
+
+    ``load()`` reads the whole matrix. An incremental refresh starts empty
+    and reads only the full rows of some users (``load_rows``) and the full
+    columns of some items (``load_columns``). The norm and heaviest holders
+    of a column that is not loaded come from its SkillNeighbours row.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        # user_id -> {item: (weight, proficiency_level)}
+        self.rows = {}
+        # item -> {user_id: weight}
+        self.columns = {}
+        self.complete = False
+        self._complete_rows = set()
+        self._complete_columns = set()
+        self._user_skill_ids = set()
+        self._norms = {}
+        self._holders = {}
+        # item -> (norm, [(user_id, weight), ...]) read from SkillNeighbours
+        self._stored = {}
+
+    @classmethod
+    def load(cls, batch_size=1000):
+        matrix = cls(batch_size)
+        completed = completed_swaps()
+        rows = UserSkill.objects.values_list(
+            'id', 'user_id', 'skill_id', 'skill_type', 'proficiency_level'
+        ).iterator(chunk_size=5000)
+        for pk, user_id, skill_id, skill_type, proficiency in rows:
+            matrix.add(user_id, (skill_id, skill_type), skill_weight(proficiency, completed[pk]), proficiency)
+        matrix.complete = True
+        return matrix
+
+    def add(self, user_id, item, weight, proficiency):
+        self.rows.setdefault(user_id, {})[item] = (weight, proficiency)
+        self.columns.setdefault(item, {})[user_id] = weight
+
+    def _read(self, queryset):
+        rows = [
+            row for row in queryset.values_list('id', 'user_id', 'skill_id', 'skill_type', 'proficiency_level')
+            if row[0] not in self._user_skill_ids
+        ]
+        completed = Counter()
+        for batch in _batches([row[0] for row in rows], self.batch_size):
+            completed.update(completed_swaps(batch))
+        for pk, user_id, skill_id, skill_type, proficiency in rows:
+            self._user_skill_ids.add(pk)
+            self.add(user_id, (skill_id, skill_type), skill_weight(proficiency, completed[pk]), proficiency)
+
+    def has_row(self, user_id):
+        return self.complete or user_id in self._complete_rows
+
+    def has_column(self, item):
+        return self.complete or item in self._complete_columns
+
+    def load_rows(self, user_ids):
+        missing = sorted(user_id for user_id in set(user_ids) if not self.has_row(user_id))
+        for batch in _batches(missing, self.batch_size):
+            self._read(UserSkill.objects.filter(user_id__in=batch))
+        self._complete_rows.update(missing)
+
+    def load_columns(self, items):
+        missing = {item for item in items if not self.has_column(item)}
+        for skill_type in (OFFERED, WANTED):
+            skill_ids = sorted(skill_id for skill_id, kind in missing if kind == skill_type)
+            for batch in _batches(skill_ids, self.batch_size):
+                self._read(UserSkill.objects.filter(skill_type=skill_type, skill_id__in=batch))
+        self._complete_columns.update(missing)
+
+    def load_stored(self, items):
+        """Read the norms and holders of columns that are not loaded; columns never stored are loaded instead."""
+        wanted = {item for item in items if not self.has_column(item) and item not in self._stored}
+        for skill_type in (OFFERED, WANTED):
+            skill_ids = sorted(skill_id for skill_id, kind in wanted if kind == skill_type)
+            for batch in _batches(skill_ids, self.batch_size):
+                stored = SkillNeighbours.objects.filter(skill_type=skill_type, skill_id__in=batch)
+                for skill_id, norm, holders in stored.values_list('skill_id', 'norm', 'holders'):
+                    self._stored[(skill_id, skill_type)] = (norm, [tuple(holder) for holder in holders])
+        self.load_columns(wanted - self._stored.keys())
+
+    def norm(self, item):
+        if not self.has_column(item):
+            return self._stored[item][0]
+        if item not in self._norms:
+            self._norms[item] = math.sqrt(sum(weight * weight for weight in self.columns.get(item, {}).values()))
+        return self._norms[item]
+
+    def top_holders(self, item):
+        """The users with the heaviest weight in a column, heaviest first."""
+        if not self.has_column(item):
+            return self._stored[item][1]
+        if item not in self._holders:
+            self._holders[item] = heapq.nsmallest(HOLDERS_PER_SKILL, self.columns.get(item, {}).items(), key=_heaviest)
+        return self._holders[item]
+
+    def similar(self, items, limit=NEIGHBOURS_PER_SKILL):
+        """
+        ``{item: [[skill_id, skill_type, similarity], ...]}``: rows of the
+        column-normalised M^T M, keeping every column that shares at least
+        MIN_SUPPORT users with the item. Loads the columns, the rows of their
+        holders and the norms of every column those rows touch.
+        """
+        self.load_columns(items)
+        holders = {user_id for item in items for user_id in self.columns.get(item, ())}
+        self.load_rows(holders)
+        self.load_stored({other for user_id in holders for other in self.rows[user_id]})
+
+        similar = {}
+        for item in items:
+            dot = defaultdict(float)
+            support = Counter()
+            for user_id, weight in self.columns.get(item, {}).items():
+                for other, (other_weight, _) in self.rows[user_id].items():
+                    if other != item:
+                        dot[other] += weight * other_weight
+                        support[other] += 1
+            norm = self.norm(item)
+            scored = (
+                (other, value / (norm * self.norm(other)))
+                for other, value in dot.items() if support[other] >= MIN_SUPPORT
+            )
+            similar[item] = [
+                [skill_id, skill_type, round(score, 4)]
+                for (skill_id, skill_type), score in heapq.nsmallest(limit, scored, key=_heaviest)
+            ]
+        return similar
+
+    def recommend(self, user_ids, neighbours, limit=PARTNERS_PER_USER):
+        """
+        ``{user_id: partners}``. Each user's row is spread over similar
+        columns to predict what else they offer and want; partners are the
+        heaviest holders of the complementary columns.
+        """
+        self.load_rows(user_ids)
+        complements = {}
+        for user_id in user_ids:
+            predicted = defaultdict(float)
+            for item, (weight, _) in self.rows.get(user_id, {}).items():
+                predicted[item] += weight
+                for skill_id, skill_type, similarity in neighbours.get(item, ()):
+                    predicted[(skill_id, skill_type)] += weight * similarity
+            complements[user_id] = [
+                (complement(item), interest)
+                for item, interest in heapq.nsmallest(PREDICTED_SKILLS, predicted.items(), key=_heaviest)
+            ]
+        self.load_stored({item for pairs in complements.values() for item, _ in pairs})
+
+        ranked = {}
+        for user_id, pairs in complements.items():
+            scores = defaultdict(float)
+            for item, interest in pairs:
+                for partner_id, weight in self.top_holders(item):
+                    scores[partner_id] += interest * weight
+            scores.pop(user_id, None)
+            ranked[user_id] = heapq.nsmallest(limit, scores.items(), key=_heaviest)
+        # Reasons list every complementary column a partner holds, not only those they lead
+        self.load_rows({partner_id for pairs in ranked.values() for partner_id, _ in pairs})
+
+        results = {}
+        for user_id, pairs in ranked.items():
+            items = [item for item, _ in complements[user_id]]
+            results[user_id] = []
+            for partner_id, score in pairs:
+                partner_row = self.rows.get(partner_id, {})
+                reasons = [(item, partner_row[item][1]) for item in items if item in partner_row]
+                results[user_id].append({
+                    'user_id': partner_id,
+                    'score': round(score, 3),
+                    'offers': sorted([skill_id, level] for (skill_id, kind), level in reasons if kind == OFFERED),
+                    'wants': sorted([skill_id, level] for (skill_id, kind), level in reasons if kind == WANTED),
+                })
+        return results
+
+
+def refresh_recommendations(full=False, max_age=None, batch_size=1000, log=None):
+    """
+    Bring SkillNeighbours and PartnerRecommendation up to date with UserSkill
+    and completed swaps.
+
+    Signal receivers record the users whose skills or completed swaps
+    changed as RecommendationChange rows. A refresh loads only the matrix
+    around them: it recomputes similarities for the columns they hold or
+    left, for every column sharing a holder with one of those, and for the
+    columns listing one of those as a neighbour; and partners for the
+    changed users and for everyone holding a column whose suggestions draw
+    on a changed one. Users whose partners are more than
+    ``max_age`` seconds old are recomputed too, which catches writes that
+    sent no signals. ``full``, or an empty store, recomputes everything.
+    Returns counts of the work done.
+    """
+    log = log or (lambda message: None)
+    if max_age is None:
+        max_age = getattr(settings, 'RECOMMENDATION_MAX_AGE', 86400)
+    # Changes recorded while this runs are left for the next run
+    last_change = RecommendationChange.objects.aggregate(last=Max('id'))['last']
+
+    if full or not SkillNeighbours.objects.exists():
+        counts = _refresh_all(batch_size, log)
+    else:
+        stale = set()
+        if max_age:
+            cutoff = timezone.now() - timedelta(seconds=max_age)
+            stale = set(PartnerRecommendation.objects.filter(computed_at__lt=cutoff).values_list('user_id', flat=True))
+        counts = _refresh_changes(last_change, stale, batch_size, log)
+
+    if last_change is not None:
+        RecommendationChange.objects.filter(id__lte=last_change).delete()
+    return counts
+
+
+def _refresh_all(batch_size, log):
+    matrix = SkillMatrix.load(batch_size)
+    log(f"matrix: {len(matrix.rows)} users x {len(matrix.columns)} skill columns")
+    items = sorted(matrix.columns)
+    neighbours = matrix.similar(items)
+    stored = set(SkillNeighbours.objects.values_list('skill_id', 'skill_type').iterator(chunk_size=5000))
+    removed = sorted(stored - matrix.columns.keys())
+    _save_neighbours(matrix, neighbours, items, removed, batch_size)
+    log(f"skill columns: {len(items)} recomputed, {len(removed)} removed")
+
+    users = sorted(matrix.rows)
+    stored_users = set(PartnerRecommendation.objects.values_list('user_id', flat=True).iterator(chunk_size=5000))
+    gone = sorted(stored_users - matrix.rows.keys())
+    _save_partners(matrix, neighbours, users, gone, batch_size, log)
+    return {'columns': len(items), 'columns_removed': len(removed), 'users': len(users), 'users_removed': len(gone)}
+
+
+def _refresh_changes(last_change, stale, batch_size, log):
+    matrix = SkillMatrix(batch_size)
+    changed_users = set()
+    changed = set()
+    if last_change is not None:
+        changes = RecommendationChange.objects.filter(id__lte=last_change).values_list('user_id', 'skill_id', 'skill_type')
+        for user_id, skill_id, skill_type in changes.iterator(chunk_size=5000):
+            changed_users.add(user_id)
+            if skill_id is not None:
+                changed.add((skill_id, skill_type))
+    if not changed_users and not stale:
+        log("no changes")
+        return {'columns': 0, 'columns_removed': 0, 'users': 0, 'users_removed': 0}
+
+    matrix.load_rows(changed_users)
+    for user_id in changed_users:
+        changed.update(matrix.rows.get(user_id, ()))
+    neighbours = {
+        (skill_id, skill_type): value
+        for skill_id, skill_type, value in SkillNeighbours.objects.values_list(
+            'skill_id', 'skill_type', 'neighbours'
+        ).iterator(chunk_size=5000)
+    }
+    # A column's similarities move with its own entries, with those of the
+    # columns it lists, and with the norm of every column it shares a holder
+    # with: a shrunk column can climb into a list that left it out
+    matrix.load_columns(changed)
+    matrix.load_rows({user_id for item in changed for user_id in matrix.columns.get(item, ())})
+    affected = changed | {
+        other for item in changed for user_id in matrix.columns.get(item, ()) for other in matrix.rows[user_id]
+    } | {
+        item for item, value in neighbours.items()
+        if any((skill_id, skill_type) in changed for skill_id, skill_type, _ in value)
+    }
+    matrix.load_columns(affected)
+    items = sorted(item for item in affected if matrix.columns.get(item))
+    removed = sorted(item for item in affected if not matrix.columns.get(item) and item in neighbours)
+    neighbours.update(matrix.similar(items))
+    for item in removed:
+        del neighbours[item]
+    _save_neighbours(matrix, neighbours, items, removed, batch_size)
+    log(f"skill columns: {len(items)} recomputed, {len(removed)} removed")
+
+    # Partners come from the holders of the complements of a user's columns
+    # and of their neighbours, so holders of those columns are affected too
+    moved = {complement(item) for item in changed}
+    sources = set(affected) | moved | {
+        item for item, value in neighbours.items()
+        if any((skill_id, skill_type) in moved for skill_id, skill_type, _ in value)
+    }
+    users = changed_users | stale | _holders(sources, batch_size)
+    matrix.load_rows(users)
+    gone = sorted(user_id for user_id in changed_users | stale if user_id not in matrix.rows)
+    users = sorted(user_id for user_id in users if user_id in matrix.rows)
+    _save_partners(matrix, neighbours, users, gone, batch_size, log)
+    return {'columns': len(items), 'columns_removed': len(removed), 'users': len(users), 'users_removed': len(gone)}
+
+
+def _holders(items, batch_size):
+    """Ids of every user holding one of ``items``."""
+    user_ids = set()
+    for skill_type in (OFFERED, WANTED):
+        skill_ids = sorted(skill_id for skill_id, kind in items if kind == skill_type)
+        for batch in _batches(skill_ids, batch_size):
+            user_ids.update(UserSkill.objects.filter(skill_type=skill_type, skill_id__in=batch).values_list('user_id', flat=True))
+    return user_ids
+
+
+def _save_neighbours(matrix, neighbours, items, removed, batch_size):
+    for batch in _batches(items, batch_size):
+        with transaction.atomic():
+            SkillNeighbours.objects.bulk_create(
+                [
+                    SkillNeighbours(
+                        skill_id=skill_id, skill_type=skill_type, neighbours=neighbours[(skill_id, skill_type)],
+                        norm=matrix.norm((skill_id, skill_type)),
+                        holders=[list(holder) for holder in matrix.top_holders((skill_id, skill_type))],
+                    )
+                    for skill_id, skill_type in batch
+                ],
+                update_conflicts=True, unique_fields=['skill', 'skill_type'],
+                update_fields=['neighbours', 'norm', 'holders', 'updated_at'],
+            )
+    for skill_type in (OFFERED, WANTED):
+        skill_ids = sorted(skill_id for skill_id, kind in removed if kind == skill_type)
+        for batch in _batches(skill_ids, batch_size):
+            SkillNeighbours.objects.filter(skill_type=skill_type, skill_id__in=batch).delete()
+
+
+def _save_partners(matrix, neighbours, users, gone, batch_size, log):
+    for start, batch in enumerate(_batches(users, batch_size)):
+        partners = matrix.recommend(batch, neighbours)
+        with transaction.atomic():
+            PartnerRecommendation.objects.bulk_create(
+                [PartnerRecommendation(user_id=user_id, partners=partners[user_id]) for user_id in batch],
+                update_conflicts=True, unique_fields=['user'], update_fields=['partners', 'computed_at'],
+            )
+        log(f"users: {min((start + 1) * batch_size, len(users))} / {len(users)}")
+    for batch in _batches(gone, batch_size):
+        PartnerRecommendation.objects.filter(user_id__in=batch).delete()
+
+
+# Changes noted in this thread's open transaction, written on commit
+_pending = threading.local()
+
+
+def record_change(user_ids, item=None):
+    """
+    Note that users' recommendations need recomputing; ``item`` is a column
+    they left. Notes are written in one INSERT when the transaction commits.
+    Notes from a rolled-back transaction go out with the next commit, which
+    only costs that refresh a little extra work.
+    """
+    changes = getattr(_pending, 'changes', None)
+    if changes is None:
+        changes = _pending.changes = set()
+    changes.update((user_id, *(item or (None, ''))) for user_id in user_ids)
+    transaction.on_commit(_write_changes)
+
+
+def _write_changes():
+    changes = getattr(_pending, 'changes', None)
+    if not changes:
+        return
+    _pending.changes = set()
+    RecommendationChange.objects.bulk_create(
+        RecommendationChange(user_id=user_id, skill_id=skill_id, skill_type=skill_type)
+        for user_id, skill_id, skill_type in changes
+    )
+
+
+@receiver(post_save, sender=UserSkill)
+def note_user_skill_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_change([instance.user_id])
+
+
+@receiver(post_delete, sender=UserSkill)
+def note_user_skill_deleted(sender, instance, **kwargs):
+    record_change([instance.user_id], (instance.skill_id, instance.skill_type))
+
+
+@receiver(swap_status_changed)
+def note_completed_swap(sender, instance, previous, **kwargs):
+    # Completed swaps weigh the user skills they used
+    if 'completed' in (previous, instance.status):
+        record_change([instance.requester_id, instance.recipient_id])
+
+
+@receiver(post_delete, sender=SwapRequest)
+def note_deleted_swap(sender, instance, **kwargs):
+    if (getattr(instance, '_loaded_status', None) or instance.status) == 'completed':
+        record_change([instance.requester_id, instance.recipient_id])
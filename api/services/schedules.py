@@ -0,0 +1,130 @@
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.models import Profile
+from api.services.availability import MINUTES_PER_DAY
+from api.services.indexes import SharedIndex
+
+
+class AvailabilityIndex(SharedIndex):
+    """
+    Interval index over the weekly availability slots of public profiles.
+
+    Every slot is a ``(start, end, user_id)`` tuple in one array sorted by
+    start. Normalized slots never span midnight, so none is longer than a
+    day: a slot overlapping ``[start, end)`` must start in
+    ``(start - MINUTES_PER_DAY, end)``, and a query bisects to that window
+    instead of comparing against every user. Slots of private profiles are
+    kept per user, so a private user can still search with their own, but
+    are left out of the array. The index is built lazily and patched from
+    Profile signals.
+    """
+    name = 'availability'
+
+    def _clear(self):
+        self._entries = []
+        # user_id -> (slots, is_public)
+        self._users = {}
+
+    def _load(self):
+        rows = Profile.objects.using(DEFAULT_DB_ALIAS).values_list(
+            'user_id', 'availability_slots', 'is_public'
+        ).iterator(chunk_size=5000)
+        entries = []
+        for user_id, slots, is_public in rows:
+            if slots:
+                self._users[user_id] = (slots, is_public)
+                if is_public:
+                    entries.extend((start, end, user_id) for start, end in slots)
+        entries.sort()
+        self._entries = entries
+
+    def _remove(self, user_id):
+        slots, is_public = self._users.pop(user_id, ((), False))
+        if not is_public:
+            return
+        for start, end in slots:
+            index = bisect_left(self._entries, (start, end, user_id))
+            del self._entries[index]
+
+    def upsert(self, user_id, slots, is_public):
+        entry = (slots, is_public) if slots else None
+        with self._lock:
+            # Most profile saves leave availability and visibility alone; don't make every process rebuild
+            if self._loaded and self._users.get(user_id) == entry:
+                return
+        with self.patching() as loaded:
+            if not loaded:
+                return
+            self._remove(user_id)
+            if entry is not None:
+                self._users[user_id] = entry
+                if is_public:
+                    for start, end in slots:
+                        insort(self._entries, (start, end, user_id))
+
+    def discard(self, user_id):
+        with self.patching() as loaded:
+            if loaded:
+                self._remove(user_id)
+
+    def slots(self, user_id):
+        """A user's normalized slots, public or not; empty when none are set."""
+        self.ensure_loaded()
+        return self._users.get(user_id, ((), False))[0]
+
+    def overlaps(self, slots, exclude=None):
+        """
+        ``{user_id: minutes}`` for every public user sharing at least one
+        minute with ``slots`` (normalized), leaving out ``exclude``.
+        """
+        self.ensure_loaded()
+        shared = Counter()
+        with self._lock:
+            entries = self._entries
+            for query_start, query_end in slots:
+                lo = bisect_left(entries, (query_start - MINUTES_PER_DAY + 1,))
+                hi = bisect_left(entries, (query_end,), lo)
+                for start, end, user_id in entries[lo:hi]:
+                    if end > query_start:
+                        shared[user_id] += min(end, query_end) - max(start, query_start)
+        shared.pop(exclude, None)
+        return shared
+
+
+availability_index = AvailabilityIndex()
+
+
+def users_available(overlaps, exclude=None):
+    """Ids of the users in ``overlaps``, most shared time first, then by id, leaving out ``exclude``."""
+    ranked = sorted(overlaps, key=lambda user_id: (-overlaps[user_id], user_id))
+    return [user_id for user_id in ranked if user_id != exclude]
+
+
+def by_overlap(user_ids, overlaps, min_overlap=0, rank=False):
+    """
+    Drop users sharing fewer than ``min_overlap`` minutes in ``overlaps``
+    and, with ``rank``, move those sharing the most time first. Ties keep
+    their incoming order.
+    """
+    if min_overlap:
+        user_ids = [user_id for user_id in user_ids if overlaps.get(user_id, 0) >= min_overlap]
+    if rank:
+        user_ids = sorted(user_ids, key=lambda user_id: -overlaps.get(user_id, 0))
+    return user_ids
+
+
+@receiver(post_save, sender=Profile)
+def index_profile_availability(sender, instance, **kwargs):
+    values = (instance.user_id, instance.availability_slots, instance.is_public)
+    transaction.on_commit(lambda: availability_index.upsert(*values))
+
+
+@receiver(post_delete, sender=Profile)
+def unindex_profile_availability(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: availability_index.discard(user_id))
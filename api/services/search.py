@@ -0,0 +1,180 @@
+from array import array
+from bisect import bisect_left, insort
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.models import Profile, UserSkill
+from api.services.indexes import SharedIndex, index_version
+
+
+class UserSearchEngine(SharedIndex):
+    """
+    Multi-skill user search over in-memory posting lists.
+
+    Each (skill_id, skill_type) key maps to a sorted array of user ids and
+    their proficiency levels. Queries intersect (AND) or union (OR) the
+    posting lists of the requested skills, keep users with a public profile
+    and rank the survivors by proficiency. The engine is built lazily and
+    then patched from UserSkill and Profile signals.
+    """
+    name = 'search'
+
+    def _clear(self):
+        # (skill_id, skill_type) -> sorted array of user ids
+        self._postings = {}
+        # (skill_id, skill_type) -> {user_id: proficiency_level}
+        self._levels = {}
+        # user_skill_id -> (user_id, skill_id, skill_type)
+        self._entries = {}
+        self._public = set()
+
+    def _load(self):
+        levels = {}
+        rows = UserSkill.objects.using(DEFAULT_DB_ALIAS).values_list(
+            'id', 'user_id', 'skill_id', 'skill_type', 'proficiency_level'
+        ).iterator(chunk_size=5000)
+        for pk, user_id, skill_id, skill_type, proficiency in rows:
+            levels.setdefault((skill_id, skill_type), {})[user_id] = proficiency
+            self._entries[pk] = (user_id, skill_id, skill_type)
+        self._levels = levels
+        self._postings = {key: array('q', sorted(users)) for key, users in levels.items()}
+        self._public = set(
+            Profile.objects.using(DEFAULT_DB_ALIAS).filter(is_public=True).values_list('user_id', flat=True).iterator(chunk_size=5000)
+        )
+
+    def _remove(self, pk):
+        entry = self._entries.pop(pk, None)
+        if entry is None:
+            return
+        user_id, skill_id, skill_type = entry
+        key = (skill_id, skill_type)
+        users = self._levels.get(key)
+        if users is None or users.pop(user_id, None) is None:
+            return
+        postings = self._postings[key]
+        index = bisect_left(postings, user_id)
+        if index < len(postings) and postings[index] == user_id:
+            del postings[index]
+        if not users:
+            del self._levels[key]
+            del self._postings[key]
+
+    def upsert_skill(self, pk, user_id, skill_id, skill_type, proficiency):
+        with self.patching() as loaded:
+            if not loaded:
+                return
+            self._remove(pk)
+            key = (skill_id, skill_type)
+            users = self._levels.setdefault(key, {})
+            if user_id not in users:
+                insort(self._postings.setdefault(key, array('q')), user_id)
+            users[user_id] = proficiency
+            self._entries[pk] = (user_id, skill_id, skill_type)
+
+    def discard_skill(self, pk):
+        with self.patching() as loaded:
+            if loaded:
+                self._remove(pk)
+
+    def set_public(self, user_id, is_public):
+        with self._lock:
+            # Most profile saves leave visibility alone; don't make every process rebuild
+            if (self._loaded and (user_id in self._public) == is_public
+                    and self._version == index_version(self.name)):
+                return
+        with self.patching() as loaded:
+            if not loaded:
+                return
+            if is_public:
+                self._public.add(user_id)
+            else:
+                self._public.discard(user_id)
+
+    def holder_counts(self, skill_ids):
+        """Number of UserSkill rows, offered or wanted, for each skill id."""
+        self.ensure_loaded()
+        with self._lock:
+            levels = self._levels
+            return [
+                len(levels.get((skill_id, 'offered'), ())) + len(levels.get((skill_id, 'wanted'), ()))
+                for skill_id in skill_ids
+            ]
+
+    def _candidates(self, key, min_level):
+        if min_level <= 1:
+            return self._postings.get(key, ())
+        levels = self._levels.get(key, {})
+        return [user_id for user_id in self._postings.get(key, ()) if levels[user_id] >= min_level]
+
+    def search(self, skill_ids, skill_type='offered', match_all=True, min_level=1, public_only=True):
+        """
+        Return ranked user ids having the given skills.
+
+        With ``match_all`` a user must hold every skill at ``min_level`` or
+        above; otherwise any one skill is enough. Results are ordered by the
+        number of matched skills, then total proficiency, then user id.
+        """
+        self.ensure_loaded()
+        keys = [(skill_id, skill_type) for skill_id in dict.fromkeys(skill_ids)]
+        if not keys:
+            return []
+
+        with self._lock:
+            postings = sorted((self._candidates(key, min_level) for key in keys), key=len)
+            if match_all:
+                if not postings[0]:
+                    return []
+                user_ids = set(postings[0])
+                for other in postings[1:]:
+                    user_ids.intersection_update(other)
+                    if not user_ids:
+                        return []
+            else:
+                user_ids = set().union(*postings)
+
+            if public_only:
+                user_ids &= self._public
+
+            ranked = []
+            for user_id in user_ids:
+                matched = 0
+                score = 0
+                for key in keys:
+                    level = self._levels.get(key, {}).get(user_id)
+                    if level is not None and level >= min_level:
+                        matched += 1
+                        score += level
+                ranked.append((-matched, -score, user_id))
+
+        ranked.sort()
+        return [user_id for _, _, user_id in ranked]
+
+
+search_engine = UserSearchEngine()
+
+
+@receiver(post_save, sender=UserSkill)
+def index_user_skill(sender, instance, **kwargs):
+    values = (instance.pk, instance.user_id, instance.skill_id,
+              instance.skill_type, instance.proficiency_level)
+    transaction.on_commit(lambda: search_engine.upsert_skill(*values))
+
+
+@receiver(post_delete, sender=UserSkill)
+def unindex_user_skill(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: search_engine.discard_skill(pk))
+
+
+@receiver(post_save, sender=Profile)
+def index_profile_visibility(sender, instance, **kwargs):
+    user_id, is_public = instance.user_id, instance.is_public
+    transaction.on_commit(lambda: search_engine.set_public(user_id, is_public))
+
+
+@receiver(post_delete, sender=Profile)
+def unindex_profile(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: search_engine.set_public(user_id, False))
@@ -0,0 +1,11 @@
+from django.dispatch import Signal
+
+# Sent after a queryset.update() that bypassed per-instance signals.
+# Arguments: sender (the model class), ids (list of affected primary keys),
+# fields (names of the updated fields).
+bulk_updated = Signal()
+
+# Sent after a SwapRequest is created or its status changes.
+# Arguments: sender (SwapRequest), instance, previous (the old status, or
+# None when created), created.
+swap_status_changed = Signal()
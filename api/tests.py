@@ -1,3 +1,1658 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import pickle
+import tempfile
+import zipfile
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.db.models.signals import post_save
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from api.models import (
+    Profile, Skill, UserSkill, SwapCounter, SwapRequest, Feedback, UserRating,
+    PartnerRecommendation, RecommendationChange, SkillNeighbours,
+)
+from api.cache import is_process_local
+from api.checks import check_atomic_caches, check_shared_caches
+from api.query_budget import QueryBudgetTestMixin, QueryRecorder
+from api.serializers.skill_serializers import UserSkillSerializer
+from api.serializers.swap_serializers import SwapRequestSerializer
+from api.services.indexes import bump_index_version, index_version, invalidate_indexes
+from api.replicas import ReplicaRouter, _read_alias
+from api.services import exports, photos, recommendations
+from api.services.autocomplete import SkillAutocomplete, skill_autocomplete
+from api.services.geo import GeoIndex, geo_index
+from api.services.availability import preset_slots
+from api.services.schedules import AvailabilityIndex, availability_index
+from api.services.events import get_broker
+from api.services.matching import skill_index
+from api.services.search import search_engine
+from api.throttling import BucketStore, get_store, parse_rate
+from PIL import Image
 
 # Create your tests here.
+
+# The shared cache in a throwaway directory, so tests never clear a dev server's
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'skill-swap-tests'},
+    'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp()},
+}
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+def make_user(username, offered=(), wanted=(), **profile):
+    """A user with offered and wanted skills (created as needed) and optional profile fields."""
+    user = User.objects.create_user(username, email=f'{username}@example.com', password='pass12345')
+    for skill_type, names in (('offered', offered), ('wanted', wanted)):
+        for name in names:
+            skill, _ = Skill.objects.get_or_create(name=name, defaults={'is_approved': True})
+            UserSkill.objects.create(user=user, skill=skill, skill_type=skill_type, proficiency_level=3)
+    if profile:
+        for field, value in profile.items():
+            setattr(user.profile, field, value)
+        user.profile.save()
+    return user
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """List endpoints must stay within their declared query budget regardless of row count."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='pass12345')
+        cls.admin = User.objects.create_superuser('admin', password='pass12345')
+        skills = [Skill.objects.create(name=f'skill-{i}') for i in range(5)]
+        own_skill = UserSkill.objects.create(user=cls.user, skill=skills[0], skill_type='offered')
+        UserSkill.objects.create(user=cls.user, skill=skills[1], skill_type='wanted')
+        for i in range(5):
+            other = User.objects.create_user(f'other-{i}', password='pass12345')
+            other_skill = UserSkill.objects.create(user=other, skill=skills[i], skill_type='offered')
+            UserSkill.objects.create(user=other, skill=skills[0], skill_type='wanted')
+            swap = SwapRequest.objects.create(
+                requester=other, recipient=cls.user,
+                requester_skill=other_skill, recipient_skill=own_skill, status='completed'
+            )
+            Feedback.objects.create(swap_request=swap, from_user=other, to_user=cls.user, rating=4, comment='ok')
+
+    def setUp(self):
+        # In-memory indexes are loaded once per process; load them up front
+        for index in (skill_index, search_engine):
+            index.reset()
+            index.ensure_loaded()
+        # Measure the uncached path of cached list views
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_user_list_endpoints(self):
+        for url in ['/api/skills/', '/api/user-skills/', '/api/users/search/?q=skill',
+                    '/api/users/search/?skills=skill-0&match=any', '/api/matches/',
+                    '/api/swaps/', '/api/feedback/received/', '/api/profile/']:
+            with self.subTest(url=url):
+                response = self.assertViewWithinBudget(self.client, 'get', url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_list_endpoints(self):
+        self.client.force_authenticate(self.admin)
+        for url in ['/api/admin/skills/', '/api/admin/users/', '/api/admin/swaps/']:
+            with self.subTest(url=url):
+                response = self.assertViewWithinBudget(self.client, 'get', url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_write_actions(self):
+        self.client.force_authenticate(self.admin)
+        skill = Skill.objects.create(name='pending-skill', is_approved=False)
+        target = User.objects.create_user('target', password='pass12345')
+        cases = [
+            ('post', '/api/admin/skills/', {'name': 'new-skill'}),
+            ('patch', f'/api/admin/skills/{skill.id}/', {'name': 'renamed-skill'}),
+            ('post', f'/api/admin/skills/{skill.id}/approve/', None),
+            ('post', '/api/admin/skills/bulk-reject/', {'ids': [skill.id]}),
+            ('delete', f'/api/admin/skills/{skill.id}/', None),
+            ('post', f'/api/admin/users/{target.id}/ban/', None),
+            ('post', '/api/admin/users/bulk-activate/', {'ids': [target.id]}),
+            ('patch', f'/api/admin/users/{target.id}/', {'first_name': 'Tar'}),
+            ('delete', f'/api/admin/users/{target.id}/', None),
+        ]
+        for method, url, data in cases:
+            with self.subTest(method=method, url=url):
+                response = self.assertViewWithinBudget(self.client, method, url, data=data, format='json')
+                self.assertLess(response.status_code, 300)
+
+    def test_budget_is_resolved_per_action(self):
+        from django.urls import resolve
+        from api.query_budget import get_view_budget
+        destroy = get_view_budget(resolve('/api/admin/users/1/').func, 'DELETE')
+        retrieve = get_view_budget(resolve('/api/admin/users/1/').func, 'GET')
+        ban = get_view_budget(resolve('/api/admin/users/1/ban/').func, 'POST')
+        self.assertGreater(destroy, retrieve)
+        self.assertEqual(ban, 3)
+        self.assertEqual(get_view_budget(resolve('/api/swaps/').func, 'POST'), 16)
+
+    def test_stacks_only_for_queries_the_report_shows(self):
+        recorder = QueryRecorder(budget=2)
+        with recorder.record():
+            list(Skill.objects.all())
+            list(User.objects.all())
+            for _ in range(2):
+                Skill.objects.filter(name='skill-0').exists()
+        self.assertEqual([bool(stack) for sql, stack in recorder.queries], [False, False, True, True])
+        report = recorder.report('block', 2)
+        self.assertIn('First query over budget', report)
+        self.assertNotIn('Possible N+1', report)
+
+        recorder = QueryRecorder()
+        with recorder.record():
+            for i in range(3):
+                Skill.objects.filter(name=f'skill-{i}').exists()
+        [stacks] = recorder.repeated_shapes().values()
+        self.assertEqual([bool(stack) for stack in stacks], [True, False, False])
+        self.assertIn('test_stacks_only_for_queries_the_report_shows', recorder.report('block'))
+
+    def test_index_loads_are_not_counted(self):
+        search_engine.reset()
+        recorder = QueryRecorder()
+        with recorder.record():
+            search_engine.ensure_loaded()
+            list(Skill.objects.all())
+        self.assertEqual(recorder.count, 1)
+
+class HotPathIndexTests(TestCase):
+    """The hot-path filters must be answered from the composite indexes, not table scans."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password='pass12345')
+        cls.bob = User.objects.create_user('bob', password='pass12345')
+        cls.skill = Skill.objects.create(name='python')
+        cls.alice_skill = UserSkill.objects.create(user=cls.alice, skill=cls.skill, skill_type='offered')
+        cls.bob_skill = UserSkill.objects.create(user=cls.bob, skill=cls.skill, skill_type='wanted')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables would otherwise always be scanned sequentially
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f'No EXPLAIN expectations for {connection.vendor}')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_swap_lists_use_participant_status_indexes(self):
+        self.assertUsesIndex(
+            SwapRequest.objects.filter(requester=self.alice, status='pending').order_by('-created_at'),
+            'swap_requester_status_idx'
+        )
+        self.assertUsesIndex(
+            SwapRequest.objects.filter(recipient=self.alice, status='pending').order_by('-created_at'),
+            'swap_recipient_status_idx'
+        )
+
+    def test_skill_search_uses_covering_index(self):
+        self.assertUsesIndex(
+            UserSkill.objects.filter(skill=self.skill, skill_type='offered').values_list('user_id', 'proficiency_level'),
+            'userskill_skill_type_idx'
+        )
+
+    def test_received_feedback_uses_to_user_index(self):
+        self.assertUsesIndex(
+            Feedback.objects.filter(to_user=self.alice).order_by('-created_at'),
+            'feedback_to_user_idx'
+        )
+
+    def test_only_one_pending_swap_per_pair(self):
+        fields = dict(requester=self.alice, recipient=self.bob,
+                      requester_skill=self.alice_skill, recipient_skill=self.bob_skill)
+        SwapRequest.objects.create(**fields)
+        SwapRequest.objects.create(status='rejected', **fields)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SwapRequest.objects.create(**fields)
+
+@override_settings(CACHES=TEST_CACHES, INDEX_CHECK_SECONDS=0,
+                   THROTTLE_STORE_PATH=os.path.join(tempfile.mkdtemp(), 'throttle.sqlite3'))
+class ApiTestCase(APITestCase):
+    """
+    Starts every test with empty caches, throttle buckets and in-memory
+    indexes, which outlive the per-test transaction rollback.
+    """
+
+    def setUp(self):
+        super().setUp()
+        clear_caches()
+        get_store().clear()
+        for index in (skill_index, search_engine, skill_autocomplete, geo_index, availability_index):
+            index.reset()
+
+class MatchTests(ApiTestCase):
+    """Reciprocal matches come from the in-memory skill index, which follows writes from any process."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python'], wanted=['guitar'])
+        cls.bob = make_user('bob', offered=['guitar'], wanted=['python'])
+        cls.carol = make_user('carol', offered=['guitar'])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.alice)
+
+    def matched_usernames(self):
+        response = self.client.get('/api/matches/')
+        self.assertEqual(response.status_code, 200)
+        return [match['username'] for match in response.data]
+
+    def test_only_reciprocal_partners_match(self):
+        self.assertEqual(self.matched_usernames(), ['bob'])
+
+    def test_saved_skill_is_patched_in(self):
+        self.matched_usernames()
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSkill.objects.create(user=self.carol, skill=Skill.objects.get(name='python'), skill_type='wanted')
+        self.assertEqual(self.matched_usernames(), ['bob', 'carol'])
+
+    def test_write_published_by_another_process_triggers_rebuild(self):
+        self.matched_usernames()
+        # queryset.update() sends no signals; the writer publishes it through the shared version
+        UserSkill.objects.filter(user=self.bob, skill_type='wanted').update(skill_type='offered')
+        bump_index_version('matching')
+        self.assertEqual(self.matched_usernames(), [])
+
+    def test_invalidate_indexes_after_bulk_write(self):
+        self.matched_usernames()
+        UserSkill.objects.bulk_create([
+            UserSkill(user=self.carol, skill=Skill.objects.get(name='python'), skill_type='wanted'),
+        ])
+        invalidate_indexes()
+        self.assertEqual(self.matched_usernames(), ['bob', 'carol'])
+
+    def test_old_snapshot_is_rebuilt(self):
+        self.matched_usernames()
+        # A row written without signals reaching the index, as by another program
+        UserSkill.objects.bulk_create([
+            UserSkill(user=self.carol, skill=Skill.objects.get(name='python'), skill_type='wanted'),
+        ])
+        self.assertEqual(self.matched_usernames(), ['bob'])
+        with override_settings(INDEX_MAX_AGE=0):
+            self.assertEqual(self.matched_usernames(), ['bob', 'carol'])
+
+class UserSearchTests(ApiTestCase):
+    """Multi-skill search over the posting lists: AND/OR, levels, type and visibility."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.searcher = make_user('searcher')
+        cls.both = make_user('both', offered=['python', 'django'])
+        cls.python = make_user('python-only', offered=['python'])
+        cls.hidden = make_user('hidden', offered=['python', 'django'], is_public=False)
+        cls.learner = make_user('learner', wanted=['python'])
+        UserSkill.objects.filter(user=cls.python).update(proficiency_level=5)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.searcher)
+
+    def search(self, query):
+        response = self.client.get(f'/api/users/search/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [user['username'] for user in response.data]
+
+    def test_match_all_requires_every_skill(self):
+        self.assertEqual(self.search('skills=python,django'), ['both'])
+
+    def test_match_any_ranks_by_matched_skills_then_level(self):
+        self.assertEqual(self.search('skills=python,django&match=any'), ['both', 'python-only'])
+
+    def test_min_level_and_type_filters(self):
+        self.assertEqual(self.search('skills=python&min_level=4'), ['python-only'])
+        self.assertEqual(self.search('skills=python&type=wanted'), ['learner'])
+
+    def test_unknown_skill_with_match_all_is_empty(self):
+        self.assertEqual(self.search('skills=python,cobol'), [])
+
+    def test_visibility_change_is_patched_in(self):
+        self.assertEqual(self.search('skills=python,django'), ['both'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hidden.profile.is_public = True
+            self.hidden.profile.save()
+        self.assertEqual(self.search('skills=python,django'), ['both', 'hidden'])
+
+    def test_bulk_write_is_picked_up_after_invalidation(self):
+        self.assertEqual(self.search('skills=django&match=any'), ['both'])
+        UserSkill.objects.filter(user=self.python).update(skill=Skill.objects.get(name='django'))
+        invalidate_indexes('search')
+        # update() skips the response cache's signals too
+        clear_caches()
+        self.assertEqual(self.search('skills=django&match=any'), ['python-only', 'both'])
+
+class NearSearchTests(ApiTestCase):
+    """Radius and nearest-user search over the grid index, alone and combined with skills."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python'], location='Pune')
+        cls.erin = make_user('erin', offered=['guitar'], location='Koregaon Park, Pune')
+        cls.bob = make_user('bob', offered=['python'], location='Mumbai')
+        cls.carol = make_user('carol', offered=['python'], location='Delhi')
+        cls.dave = make_user('dave', offered=['python'], location='Pune', is_public=False)
+        cls.frank = make_user('frank')
+
+    def setUp(self):
+        super().setUp()
+        # Load up front, so the requests show the query budget of a warm process
+        for index in (geo_index, search_engine):
+            index.ensure_loaded()
+        self.client.force_authenticate(self.alice)
+
+    def search(self, query, user=None):
+        if user is not None:
+            self.client.force_authenticate(user)
+        response = self.client.get(f'/api/users/search/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [user['username'] for user in response.data]
+
+    def test_near_me_leaves_out_the_searcher(self):
+        self.assertEqual(self.search('near=me&radius_km=200'), ['erin', 'bob'])
+        self.assertEqual(self.search('near=me&radius_km=200&limit=1'), ['erin'])
+        self.assertEqual(self.search('near=Pune&radius_km=200', user=self.frank), ['alice', 'erin', 'bob'])
+
+    def test_skills_near_a_place_are_ordered_by_distance(self):
+        self.assertEqual(self.search('skills=python&near=Mumbai&radius_km=200', user=self.frank), ['bob', 'alice'])
+        self.assertEqual(self.search('q=python&near=Mumbai&radius_km=200', user=self.frank), ['bob', 'alice'])
+
+    def test_every_near_search_leaves_out_its_own_searcher(self):
+        # Cached results must not carry the first searcher's exclusion over to the next
+        self.assertEqual(self.search('near=Pune&radius_km=200', user=self.alice), ['erin', 'bob'])
+        self.assertEqual(self.search('near=Pune&radius_km=200', user=self.bob), ['alice', 'erin'])
+        for query in ('skills=python&near=Pune&radius_km=200', 'q=python&near=Pune&radius_km=200'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query, user=self.alice), ['bob'])
+                self.assertEqual(self.search(query, user=self.bob), ['alice'])
+
+    def test_unknown_place_and_missing_location_are_rejected(self):
+        self.assertEqual(self.client.get('/api/users/search/?near=Atlantis').status_code, 400)
+        self.client.force_authenticate(self.frank)
+        self.assertEqual(self.client.get('/api/users/search/?near=me').status_code, 400)
+
+    def test_moved_user_reaches_another_process(self):
+        other = GeoIndex()
+        other.ensure_loaded()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.erin.profile.location = 'Delhi'
+            self.erin.profile.save()
+        self.assertEqual(other.location(self.erin.id), other.location(self.carol.id))
+        self.assertEqual(self.search('near=me&radius_km=200'), ['bob'])
+
+    def test_unchanged_location_does_not_publish(self):
+        self.search('near=me')
+        version = index_version('geo')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.erin.profile.availability = 'evenings'
+            self.erin.profile.save()
+        self.assertEqual(index_version('geo'), version)
+
+
+class AvailabilitySearchTests(ApiTestCase):
+    """Search ranks and filters by weekly time shared with the searcher, from the interval index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', availability='weekends')
+        cls.bob = make_user('bob', offered=['python'], availability='weekend mornings')
+        cls.carol = make_user('carol', availability='flexible')
+        cls.dave = make_user('dave', offered=['python'], availability='weekdays')
+        cls.erin = make_user('erin', availability='weekends', is_public=False)
+        cls.frank = make_user('frank')
+
+    def setUp(self):
+        super().setUp()
+        # Load up front, so the requests show the query budget of a warm process
+        for index in (availability_index, search_engine):
+            index.ensure_loaded()
+        self.client.force_authenticate(self.alice)
+
+    def search(self, query):
+        response = self.client.get(f'/api/users/search/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [(user['username'], user['availability_overlap']) for user in response.data]
+
+    def test_ranks_other_public_users_by_shared_time(self):
+        self.assertEqual(self.search('sort=availability'), [('carol', 1440), ('bob', 360)])
+        self.assertEqual(self.search('min_overlap=600'), [('carol', 1440)])
+
+    def test_ranks_and_filters_skill_matches(self):
+        self.assertEqual(self.search('skills=python&sort=availability'), [('bob', 360), ('dave', 0)])
+        self.assertEqual(self.search('skills=python&min_overlap=1'), [('bob', 360)])
+
+    def test_searcher_without_slots_is_rejected(self):
+        self.client.force_authenticate(self.frank)
+        self.assertEqual(self.client.get('/api/users/search/?sort=availability').status_code, 400)
+
+    def test_changed_slots_reach_another_process(self):
+        other = AvailabilityIndex()
+        other.ensure_loaded()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.carol.profile.availability = 'weekdays'
+            self.carol.profile.save()
+        self.assertEqual(set(other.overlaps(other.slots(self.alice.id), exclude=self.alice.id)), {self.bob.id})
+        self.assertEqual(self.search('sort=availability'), [('bob', 360)])
+
+    def test_unchanged_slots_do_not_publish(self):
+        version = index_version('availability')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.carol.profile.location = 'Pune'
+            self.carol.profile.save()
+        self.assertEqual(index_version('availability'), version)
+
+    def test_migration_fills_slots_from_presets(self):
+        fill = import_module('api.migrations.0009_profile_availability_slots').fill_availability_slots
+        Profile.objects.update(availability_slots=[])
+        Profile.objects.filter(user=self.frank).update(availability='most evenings')
+        fill(django_apps, mock.Mock(connection=connection))
+        self.assertEqual(Profile.objects.get(user=self.bob).availability_slots, preset_slots('weekend mornings'))
+        self.assertEqual(Profile.objects.get(user=self.frank).availability_slots, [])
+
+
+class ExportTests(ApiTestCase):
+    """Admin exports stream every row in each format and container."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('export-admin', password='pass12345')
+        cls.alice = make_user('alice', offered=['python'])
+        cls.bob = make_user('bob', offered=['guitar'])
+        swap = SwapRequest.objects.create(
+            requester=cls.alice, recipient=cls.bob, status='completed',
+            requester_skill=cls.alice.user_skills.get(), recipient_skill=cls.bob.user_skills.get(),
+        )
+        Feedback.objects.create(swap_request=swap, from_user=cls.alice, to_user=cls.bob, rating=5)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, query):
+        response = self.client.get(f'/api/admin/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export('type=users&file_format=csv').decode())))
+        self.assertEqual(rows[0][:2], ['ID', 'Username'])
+        self.assertEqual(sorted(row[1] for row in rows[1:]), ['alice', 'bob', 'export-admin'])
+
+    def test_ndjson(self):
+        lines = self.export('type=swaps&file_format=ndjson').decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        swap = json.loads(lines[0])
+        self.assertEqual((swap['requester'], swap['recipient'], swap['status']), ('alice', 'bob', 'completed'))
+
+    def test_gzip(self):
+        body = gzip.decompress(self.export('type=feedback&file_format=ndjson&gzip=1'))
+        feedback = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([(row['from_user'], row['to_user'], row['rating']) for row in feedback], [('alice', 'bob', 5)])
+
+    def test_zip_of_all_datasets(self):
+        archive = zipfile.ZipFile(io.BytesIO(self.export('type=all&file_format=csv')))
+        self.assertEqual(sorted(archive.namelist()), ['feedback.csv', 'swaps.csv', 'users.csv'])
+        counts = {name: len(archive.read(name).decode().splitlines()) - 1 for name in archive.namelist()}
+        self.assertEqual(counts, {'feedback.csv': 1, 'swaps.csv': 1, 'users.csv': 3})
+
+    def test_streams_chunk_by_chunk_under_asgi(self):
+        async def export():
+            response = await AsyncClient().get(
+                '/api/admin/export/?type=all&file_format=ndjson',
+                headers={'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'},
+            )
+            # An async iterator reaches the server as is; a sync one would be listed first
+            self.assertTrue(response.is_async)
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        with mock.patch.object(exports, 'CHUNK_SIZE', 1):
+            archive = zipfile.ZipFile(io.BytesIO(async_to_sync(export)()))
+        self.assertEqual(len(archive.read('users.ndjson').decode().splitlines()), 3)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get('/api/admin/export/?type=users&file_format=xml')
+        self.assertEqual(response.status_code, 400)
+
+
+class ResponseCacheTests(ApiTestCase):
+    """Cached list and search responses live in the shared cache and are dropped by writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('cache-admin', password='pass12345')
+        cls.alice = make_user('alice', offered=['python'])
+        cls.bob = make_user('bob', offered=['python'])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.alice)
+
+    def get_names(self, url, field):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row[field] for row in response.data)
+
+    def test_responses_use_a_cache_every_worker_shares(self):
+        self.assertFalse(is_process_local('shared'))
+        with override_settings(RESPONSE_CACHE_ALIAS='default'):
+            self.assertEqual([warning.id for warning in check_shared_caches(None)], ['api.W001'])
+        self.assertEqual(check_shared_caches(None), [])
+
+    def test_index_versions_need_atomic_increments(self):
+        self.assertEqual(check_atomic_caches(None), [])
+        # The file cache reads and writes a counter separately
+        with override_settings(INDEX_VERSION_CACHE_ALIAS='shared'):
+            self.assertEqual([error.id for error in check_atomic_caches(None)], ['api.E001'])
+
+    def test_skill_list_follows_writes(self):
+        self.assertEqual(self.get_names('/api/skills/', 'name'), ['python'])
+        Skill.objects.create(name='guitar', is_approved=True)
+        self.assertEqual(self.get_names('/api/skills/', 'name'), ['guitar', 'python'])
+
+    def test_search_follows_profile_writes(self):
+        self.assertEqual(self.get_names('/api/users/search/?q=python', 'username'), ['alice', 'bob'])
+        self.client.force_authenticate(self.bob)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/profile/', {'is_public': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_names('/api/users/search/?q=python', 'username'), ['alice'])
+
+    def test_search_follows_skill_writes(self):
+        self.assertEqual(self.get_names('/api/users/search/?q=python', 'username'), ['alice', 'bob'])
+        with self.captureOnCommitCallbacks(execute=True):
+            make_user('carol', offered=['python'])
+        self.assertEqual(self.get_names('/api/users/search/?q=python', 'username'), ['alice', 'bob', 'carol'])
+
+
+class AuthUserCacheTests(ApiTestCase):
+    """Token users are cached in the shared cache, and a ban takes effect on the next request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('auth-admin', password='pass12345')
+        cls.alice = make_user('alice')
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.alice)}')
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+
+    def cached_user(self, alias='shared'):
+        return caches[alias].get(f'auth-user:{self.alice.id}')
+
+    def test_ban_rejects_the_next_request(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        self.assertIsNotNone(self.cached_user())
+        response = self.admin_client.post(f'/api/admin/users/{self.alice.id}/ban/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+
+    def test_bulk_ban_rejects_the_next_request(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.admin_client.post('/api/admin/users/bulk-ban/', {'ids': [self.alice.id]}, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertIsNone(self.cached_user())
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+
+    def test_cache_holds_only_what_authentication_needs(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        cached = pickle.dumps(self.cached_user())
+        for secret in (self.alice.password, self.alice.email):
+            self.assertNotIn(secret.encode(), cached)
+        # The cached user authenticates, and the profile and its user load in one query
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/profile/')
+        self.assertEqual((response.data['username'], response.data['email']), ('alice', 'alice@example.com'))
+
+    def test_admin_permission_from_the_cache(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}')
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/admin/users/').status_code, 200)
+
+    # simplejwt rebinds its settings on change, leaving modules holding the old object
+    @mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True)
+    def test_password_change_revokes_cached_tokens(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.alice)}')
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        self.alice.set_password('new-pass12345')
+        self.alice.save()
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_ALIAS='default')
+    def test_process_local_cache_is_not_used(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        self.assertIsNone(self.cached_user('default'))
+        # Another worker's ban sends no signal to this process
+        User.objects.filter(pk=self.alice.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+
+
+class ConditionalGetTests(ApiTestCase):
+    """Polled endpoints answer a matching If-None-Match with 304 until their rows change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python'])
+        cls.bob = make_user('bob', offered=['guitar'])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.alice)
+
+    def assertRevalidates(self, url):
+        """GET ``url`` and check a repeat with its ETag is a bodiless 304; returns the ETag."""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        repeat = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.content, b'')
+        return etag
+
+    def test_profile(self):
+        etag = self.assertRevalidates('/api/profile/')
+        response = self.client.patch('/api/profile/', {'location': 'Pune'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_profile_changes_with_user_fields_only(self):
+        etag = self.assertRevalidates('/api/profile/')
+        response = self.client.patch('/api/profile/', {'first_name': 'Alicia'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(User.objects.get(pk=self.alice.pk))
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['first_name'], 'Alicia')
+
+    def test_swap_list_changes_on_create_and_delete(self):
+        etag = self.assertRevalidates('/api/swaps/')
+        swap = SwapRequest.objects.create(
+            requester=self.alice, recipient=self.bob,
+            requester_skill=self.alice.user_skills.get(), recipient_skill=self.bob.user_skills.get(),
+        )
+        created = self.client.get('/api/swaps/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(created.status_code, 200)
+        self.assertEqual(len(created.data), 1)
+        # A delete leaves max(updated_at) alone; the row count still moves the ETag
+        swap.delete()
+        self.assertNotEqual(self.client.get('/api/swaps/', HTTP_IF_NONE_MATCH=created['ETag']).status_code, 304)
+
+    def test_swap_list_changes_with_joined_rows(self):
+        SwapRequest.objects.create(
+            requester=self.alice, recipient=self.bob,
+            requester_skill=self.alice.user_skills.get(), recipient_skill=self.bob.user_skills.get(),
+        )
+        etag = self.assertRevalidates('/api/swaps/')
+        # Nulls the swap's recipient_skill without saving the swap
+        self.bob.user_skills.get().delete()
+        response = self.client.get('/api/swaps/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data[0]['recipient_skill'])
+
+        skill = Skill.objects.get(name='python')
+        skill.name = 'python3'
+        skill.save()
+        response = self.client.get('/api/swaps/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['requester_skill_name'], 'python3')
+
+        bob = User.objects.get(pk=self.bob.pk)
+        bob.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get('/api/swaps/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        bob.username = 'robert'
+        bob.save()
+        response = self.client.get('/api/swaps/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['recipient_username'], 'robert')
+
+    def test_skill_list(self):
+        etag = self.assertRevalidates('/api/skills/')
+        Skill.objects.create(name='chess', is_approved=True)
+        self.assertEqual(self.client.get('/api/skills/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_query(self):
+        etag = self.assertRevalidates('/api/skills/')
+        self.assertEqual(self.client.get('/api/skills/?search=py', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+def image_upload(name, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 200), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+@mock.patch.object(photos, 'PHOTO_ASYNC', False)
+class ProfilePhotoTests(ApiTestCase):
+    """Uploads get content-hashed thumbnails, and a stale job never overwrites a newer photo's."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python'])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.alice)
+
+    def upload(self, name, color):
+        response = self.client.patch('/api/profile/', {'profile_photo': image_upload(name, color)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return Profile.objects.get(user=self.alice)
+
+    def test_upload_builds_every_variant(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload('red.png', 'red')
+        profile = Profile.objects.get(user=self.alice)
+        self.assertEqual(sorted(profile.photo_variants, key=int), [str(size) for size in sorted(photos.PHOTO_SIZES)])
+        thumbnail = profile.photo_variants['128']['webp']
+        self.assertRegex(thumbnail, r'^profile_photos/thumbs/[0-9a-f]{20}_128\.webp$')
+        response = self.client.get('/api/users/search/?q=python')
+        self.assertTrue(response.data[0]['profile_photo'].endswith(profile.photo_variants['128']['jpeg']))
+
+    def test_new_upload_drops_old_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload('red.png', 'red')
+        # The new photo's job has not run yet
+        profile = self.upload('blue.png', 'blue')
+        self.assertEqual(profile.photo_variants, {})
+
+    def test_stale_job_does_not_overwrite_newer_photo(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            old = self.upload('red.png', 'red')
+        build_variants = photos.build_variants
+
+        def replaced_while_building(photo):
+            variants = build_variants(photo)
+            self.upload('blue.png', 'blue')
+            return variants
+
+        with mock.patch.object(photos, 'build_variants', replaced_while_building):
+            photos.process_profile_photo(old.pk, old.profile_photo.name)
+        profile = Profile.objects.get(user=self.alice)
+        self.assertNotEqual(profile.profile_photo.name, old.profile_photo.name)
+        self.assertEqual(profile.photo_variants, {})
+
+
+class UserSkillBulkTests(ApiTestCase):
+    """The bulk endpoint adds and removes many skills in a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python'])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.alice)
+        self.saved = []
+        post_save.connect(self.record_save, sender=UserSkill, dispatch_uid='bulk-test')
+        self.addCleanup(post_save.disconnect, sender=UserSkill, dispatch_uid='bulk-test')
+
+    def record_save(self, sender, instance, created, **kwargs):
+        self.saved.append((instance.skill.name, instance.skill_type, created))
+
+    def test_create_dedupes_and_upserts(self):
+        payload = [
+            {'skill_name': 'Python', 'skill_type': 'offered', 'proficiency_level': 5},
+            {'skill_name': 'chess', 'skill_type': 'wanted', 'proficiency_level': 1},
+            {'skill_name': 'CHESS', 'skill_type': 'wanted', 'proficiency_level': 2},
+        ]
+        response = self.client.post('/api/user-skills/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted((row['skill_name'], row['skill_type'], row['proficiency_level']) for row in response.data),
+            [('chess', 'wanted', 2), ('python', 'offered', 5)],
+        )
+        self.assertEqual(self.alice.user_skills.count(), 2)
+        # Only the skill the user did not have before is reported as created
+        self.assertEqual(sorted(self.saved), [('chess', 'wanted', True), ('python', 'offered', False)])
+
+    def test_create_query_count_is_fixed(self):
+        payload = [{'skill_name': f'skill-{i}', 'skill_type': 'wanted'} for i in range(20)]
+        payload.append({'skill_name': 'python', 'skill_type': 'offered'})
+        # Skill lookup and insert, user skill lookup and upsert in one
+        # transaction (a savepoint inside the test's), then the response rows
+        with self.assertNumQueries(7):
+            response = self.client.post('/api/user-skills/bulk/', payload, format='json')
+        self.assertEqual(len(response.data), 21)
+
+    def test_delete_only_own_skills(self):
+        other = make_user('bob', offered=['guitar'])
+        ids = [self.alice.user_skills.get().id, other.user_skills.get().id]
+        response = self.client.delete('/api/user-skills/bulk/', {'ids': ids}, format='json')
+        self.assertEqual(response.data, {'deleted': 1})
+        self.assertTrue(other.user_skills.exists())
+
+    def test_batch_size_is_limited(self):
+        payload = [{'skill_name': f'skill-{i}', 'skill_type': 'wanted'} for i in range(101)]
+        self.assertEqual(self.client.post('/api/user-skills/bulk/', payload, format='json').status_code, 400)
+
+
+class BulkModerationTests(ApiTestCase):
+    """Bulk admin actions update many rows in one statement and keep caches in step."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('bulk-admin', password='pass12345')
+        cls.other_admin = User.objects.create_superuser('other-admin', password='pass12345')
+        cls.spammers = [make_user(f'spam-{i}') for i in range(3)]
+        cls.pending = [Skill.objects.create(name=f'pending-{i}', is_approved=False) for i in range(3)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def post(self, url, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data, format='json')
+
+    def test_bulk_approve_by_filter_refreshes_cached_list(self):
+        user_client = APIClient()
+        user_client.force_authenticate(self.spammers[0])
+        self.assertEqual(user_client.get('/api/skills/').data, [])
+        response = self.post('/api/admin/skills/bulk-approve/', {'filter': {'name__icontains': 'pending'}})
+        self.assertEqual(response.data, {'status': 'skills approved', 'updated': 3})
+        self.assertEqual(len(user_client.get('/api/skills/').data), 3)
+
+    def test_bulk_ban_spares_admins(self):
+        ids = [user.id for user in self.spammers] + [self.admin.id, self.other_admin.id]
+        response = self.post('/api/admin/users/bulk-ban/', {'ids': ids})
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(
+            sorted(User.objects.filter(is_active=False).values_list('username', flat=True)),
+            ['spam-0', 'spam-1', 'spam-2'],
+        )
+
+    def test_bulk_activate_by_filter(self):
+        User.objects.filter(username__startswith='spam').update(is_active=False)
+        response = self.post('/api/admin/users/bulk-activate/', {'filter': {'is_active': False}})
+        self.assertEqual(response.data['updated'], 3)
+
+    def test_invalid_targets_are_rejected(self):
+        for data in ({}, {'ids': 'all'}, {'ids': [1, 'x']}, {'filter': {'password': 'x'}}):
+            with self.subTest(data=data):
+                self.assertEqual(self.post('/api/admin/users/bulk-ban/', data).status_code, 400)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(self.spammers[0])
+        self.assertEqual(self.post('/api/admin/skills/bulk-approve/', {'ids': [1]}).status_code, 403)
+
+
+class AutocompleteTests(ApiTestCase):
+    """Skill name prefixes complete from the in-memory index, which follows writes from any process."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('complete-admin', password='pass12345')
+        cls.alice = make_user('alice', offered=['Python', 'pandas'], wanted=['piano'])
+        cls.bob = make_user('bob', offered=['pandas'])
+        Skill.objects.create(name='pottery', is_approved=False)
+
+    def setUp(self):
+        super().setUp()
+        # Load up front, so the requests show the query budget of a warm process
+        for index in (skill_autocomplete, search_engine):
+            index.ensure_loaded()
+        self.client.force_authenticate(self.alice)
+
+    def complete(self, prefix, limit=10):
+        response = self.client.get('/api/skills/autocomplete/', {'prefix': prefix, 'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return [(skill['name'], skill['user_count']) for skill in response.data]
+
+    def test_ranks_by_usage_then_name(self):
+        self.assertEqual(self.complete('P'), [('pandas', 2), ('piano', 1), ('Python', 1)])
+        self.assertEqual(self.complete('p', limit=1), [('pandas', 2)])
+        self.assertEqual(self.complete('py'), [('Python', 1)])
+        self.assertEqual(self.complete('x'), [])
+
+    def test_unapproved_skills_are_left_out(self):
+        self.assertEqual(self.complete('pot'), [])
+
+    def test_saved_skill_reaches_another_process(self):
+        other = SkillAutocomplete()
+        other.ensure_loaded()
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.create(name='photography', is_approved=True)
+        self.assertEqual([name for _, name, _ in other.complete('pho')], ['photography'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.get(name='photography').delete()
+        self.assertEqual(other.complete('pho'), [])
+
+    def test_unchanged_save_does_not_publish(self):
+        self.complete('p')
+        version = index_version('autocomplete')
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.get(name='piano').save()
+        self.assertEqual(index_version('autocomplete'), version)
+
+    def test_bulk_approve_reaches_process_without_snapshot(self):
+        # Another process has a snapshot; this one never loaded its own
+        other = SkillAutocomplete()
+        other.ensure_loaded()
+        skill_autocomplete.reset()
+        self.client.force_authenticate(self.admin)
+        pottery = Skill.objects.get(name='pottery')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/admin/skills/bulk-approve/', {'ids': [pottery.id]}, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual([name for _, name, _ in other.complete('pot')], ['pottery'])
+
+
+class UserRatingTests(ApiTestCase):
+    """Rating totals follow new feedback and back the top-rated list and search results."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python'])
+        cls.bob = make_user('bob', offered=['python'])
+        cls.carol = make_user('carol', offered=['guitar'])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.carol)
+
+    def completed_swap(self, requester, recipient):
+        return SwapRequest.objects.create(
+            requester=requester, recipient=recipient, status='completed',
+            requester_skill=requester.user_skills.get(), recipient_skill=recipient.user_skills.get(),
+        )
+
+    def rate(self, user, rating):
+        swap = self.completed_swap(self.carol, user)
+        response = self.client.post('/api/feedback/', {'swap_request': swap.id, 'rating': rating, 'comment': 'ok'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_feedback_updates_totals(self):
+        self.rate(self.alice, 5)
+        self.rate(self.alice, 2)
+        rating = UserRating.objects.get(user=self.alice)
+        self.assertEqual((rating.rating_count, rating.rating_sum, rating.average), (2, 7, 3.5))
+        self.assertEqual(rating.histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+    def test_top_rated_order(self):
+        self.rate(self.alice, 4)
+        self.rate(self.bob, 5)
+        self.rate(self.bob, 5)
+        response = self.client.get('/api/users/top-rated/')
+        self.assertEqual([row['username'] for row in response.data], ['bob', 'alice'])
+        response = self.client.get('/api/users/top-rated/?min_count=2')
+        self.assertEqual([row['username'] for row in response.data], ['bob'])
+
+    def test_cached_search_shows_new_rating(self):
+        def ratings():
+            return {row['username']: row['average_rating'] for row in self.client.get('/api/users/search/?q=python').data}
+
+        self.assertEqual(ratings(), {'alice': None, 'bob': None})
+        self.rate(self.alice, 4)
+        self.assertEqual(ratings(), {'alice': 4.0, 'bob': None})
+
+    def test_migration_backfills_existing_feedback(self):
+        backfill = import_module('api.migrations.0004_user_rating').backfill_user_ratings
+        swap = self.completed_swap(self.alice, self.bob)
+        Feedback.objects.create(swap_request=swap, from_user=self.alice, to_user=self.bob, rating=3)
+        Feedback.objects.create(swap_request=swap, from_user=self.bob, to_user=self.alice, rating=5)
+        UserRating.objects.all().delete()
+        # RunPython passes a schema editor only for its connection's alias
+        backfill(django_apps, mock.Mock(connection=connection))
+        self.assertEqual(
+            sorted(UserRating.objects.values_list('user__username', 'rating_count', 'average', 'count_3')),
+            [('alice', 1, 5.0, 0), ('bob', 1, 3.0, 1)],
+        )
+
+
+class SwapCounterTests(ApiTestCase):
+    """Badge counters follow swap creates, status changes and deletes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('counter-admin', password='pass12345')
+        cls.alice = make_user('alice', offered=['python'])
+        cls.bob = make_user('bob', offered=['guitar'])
+        cls.carol = make_user('carol', offered=['chess'])
+
+    def swap(self, requester, recipient, status='pending'):
+        return SwapRequest.objects.create(
+            requester=requester, recipient=recipient, status=status,
+            requester_skill=requester.user_skills.get(), recipient_skill=recipient.user_skills.get(),
+        )
+
+    def counts(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/swaps/counts/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_status_change_moves_counts(self):
+        swap = self.swap(self.alice, self.bob)
+        self.assertEqual(self.counts(self.bob)['received']['pending'], 1)
+        swap.status = 'accepted'
+        swap.save()
+        received = self.counts(self.bob)['received']
+        self.assertEqual((received['pending'], received['accepted']), (0, 1))
+        swap.delete()
+        self.assertEqual(self.counts(self.alice)['sent']['accepted'], 0)
+
+    def test_deleting_user_with_swaps(self):
+        self.swap(self.alice, self.bob)
+        self.swap(self.carol, self.alice, status='accepted')
+        self.swap(self.bob, self.carol, status='accepted')
+        self.client.force_authenticate(self.admin)
+        response = self.client.delete(f'/api/admin/users/{self.alice.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(SwapCounter.objects.filter(user_id=self.alice.id).exists())
+        self.assertEqual(self.counts(self.bob)['received']['pending'], 0)
+        carol = self.counts(self.carol)
+        self.assertEqual((carol['sent']['accepted'], carol['received']['accepted']), (0, 1))
+
+
+class EventStreamTests(ApiTestCase):
+    """The event stream authenticates without tokens in the URL and closes for banned users."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python'])
+        cls.bob = make_user('bob', offered=['guitar'])
+
+    def ticket(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/events/ticket/')
+        self.assertEqual(response.status_code, 201)
+        return response.data['ticket']
+
+    def status_of(self, url, **headers):
+        async def get():
+            response = await AsyncClient().get(url, headers=headers)
+            if response.streaming:
+                await response.streaming_content.aclose()
+            return response.status_code
+        return async_to_sync(get)()
+
+    def ban(self, user):
+        user.is_active = False
+        user.save()
+
+    def test_rejects_missing_or_invalid_credentials(self):
+        access = AccessToken.for_user(self.alice)
+        self.assertEqual(self.status_of('/api/events/'), 401)
+        self.assertEqual(self.status_of(f'/api/events/?token={access}'), 401)
+        self.assertEqual(self.status_of('/api/events/?ticket=made-up'), 401)
+        self.assertEqual(self.status_of('/api/events/', Authorization='Bearer not-a-token'), 401)
+        self.assertEqual(self.status_of('/api/events/', Authorization=f'Bearer {access}'), 200)
+
+    def test_ticket_is_single_use(self):
+        ticket = self.ticket(self.alice)
+        self.assertEqual(self.status_of(f'/api/events/?ticket={ticket}'), 200)
+        self.assertEqual(self.status_of(f'/api/events/?ticket={ticket}'), 401)
+
+    def test_inactive_user_is_rejected(self):
+        ticket = self.ticket(self.alice)
+        self.ban(self.alice)
+        self.assertEqual(self.status_of(f'/api/events/?ticket={ticket}'), 401)
+
+    def test_delivers_published_events(self):
+        async def receive():
+            response = await AsyncClient().get(f'/api/events/?ticket={ticket}')
+            chunks = response.streaming_content
+            try:
+                self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+                get_broker().publish([self.alice.id, self.bob.id], {'type': 'swap.created', 'data': {'id': 7}})
+                return await asyncio.wait_for(anext(chunks), timeout=5)
+            finally:
+                await chunks.aclose()
+
+        ticket = self.ticket(self.alice)
+        self.assertEqual(async_to_sync(receive)(), b'event: swap.created\ndata: {"id": 7}\n\n')
+
+    @override_settings(EVENT_RECHECK_SECONDS=0.05)
+    def test_stream_closes_once_user_is_banned(self):
+        async def follow():
+            response = await AsyncClient().get(f'/api/events/?ticket={ticket}')
+            chunks = response.streaming_content
+            await anext(chunks)
+            await sync_to_async(self.ban)(self.alice)
+            with self.assertRaises(StopAsyncIteration):
+                await asyncio.wait_for(anext(chunks), timeout=5)
+
+        ticket = self.ticket(self.alice)
+        async_to_sync(follow)()
+
+    def test_swap_events_go_to_both_users(self):
+        with mock.patch.object(get_broker(), 'publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            SwapRequest.objects.create(
+                requester=self.alice, recipient=self.bob,
+                requester_skill=self.alice.user_skills.get(), recipient_skill=self.bob.user_skills.get(),
+            )
+        user_ids, event = publish.call_args.args
+        self.assertEqual((sorted(user_ids), event['type']), (sorted([self.alice.id, self.bob.id]), 'swap.created'))
+
+
+class SwapListTests(ApiTestCase):
+    """Swap lists filter by role and status in SQL and load any number of rows in the same queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('swap-admin', password='pass12345')
+        cls.alice = make_user('alice', offered=['python'])
+        cls.bob = make_user('bob', offered=['guitar'])
+        cls.carol = make_user('carol', offered=['chess'])
+        cls.sent = cls.swap(cls.alice, cls.bob)
+        cls.received = cls.swap(cls.carol, cls.alice, status='accepted')
+        cls.unrelated = cls.swap(cls.bob, cls.carol)
+
+    @staticmethod
+    def swap(requester, recipient, status='pending'):
+        return SwapRequest.objects.create(
+            requester=requester, recipient=recipient, status=status,
+            requester_skill=requester.user_skills.get(), recipient_skill=recipient.user_skills.get(),
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.alice)
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results'] if 'limit=' in url else response.data
+        return [row['id'] for row in rows]
+
+    def test_role_and_status_filters(self):
+        self.assertEqual(sorted(self.ids('/api/swaps/')), sorted([self.sent.id, self.received.id]))
+        self.assertEqual(self.ids('/api/swaps/?role=sent'), [self.sent.id])
+        self.assertEqual(self.ids('/api/swaps/?role=received'), [self.received.id])
+        self.assertEqual(self.ids('/api/swaps/?status=accepted'), [self.received.id])
+        self.assertEqual(self.ids('/api/swaps/?role=sent&status=accepted'), [])
+
+    def test_rows_carry_joined_names(self):
+        row = self.client.get('/api/swaps/?role=received').data[0]
+        self.assertEqual(
+            (row['requester_username'], row['recipient_username'], row['requester_skill_name'], row['recipient_skill_name']),
+            ('carol', 'alice', 'chess', 'python'),
+        )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def count_queries():
+            clear_caches()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get('/api/swaps/').status_code, 200)
+            return len(queries)
+
+        before = count_queries()
+        for i in range(6):
+            other = make_user(f'partner-{i}', offered=[f'skill-{i}'])
+            self.swap(other, self.alice, status='completed')
+        self.assertEqual(count_queries(), before)
+
+    def test_limit_pages_newest_first(self):
+        newest = self.swap(self.bob, self.alice, status='rejected')
+        response = self.client.get('/api/swaps/?limit=2')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['results'][0]['id'], newest.id)
+
+    def test_detail_only_for_participants(self):
+        self.assertEqual(self.client.get(f'/api/swaps/{self.sent.id}/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/swaps/{self.unrelated.id}/').status_code, 404)
+
+    def test_admin_list_sees_every_swap(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(len(self.client.get('/api/admin/swaps/').data), 3)
+        self.assertEqual([row['id'] for row in self.client.get('/api/admin/swaps/?status=accepted').data],
+                         [self.received.id])
+
+
+class FastRenderingTests(ApiTestCase):
+    """Projected lists rendered with orjson are byte-for-byte what serializers and JSONRenderer produce."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python', 'café'], wanted=['guitar'], location='Zürich')
+        cls.bob = make_user('bob', offered=['guitar'], wanted=['python'])
+        cls.bob.first_name = 'Bob \u2028 Line'
+        cls.bob.save()
+        SwapRequest.objects.create(
+            requester=cls.bob, recipient=cls.alice, message='Tausch? \u2029 😀',
+            requester_skill=cls.bob.user_skills.get(skill_type='offered'),
+            recipient_skill=cls.alice.user_skills.get(skill__name='python'),
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.alice)
+
+    def test_matches_stock_renderer(self):
+        for url in ['/api/skills/', '/api/user-skills/', '/api/swaps/', '/api/users/search/?q=python',
+                    '/api/users/search/?skills=guitar&match=any', '/api/profile/']:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_matches_serializers(self):
+        request = self.client.get('/api/swaps/').wsgi_request
+        cases = [
+            ('/api/swaps/', SwapRequestSerializer(
+                SwapRequest.objects.involving(self.alice).order_by('-created_at', '-id'), many=True)),
+            ('/api/user-skills/', UserSkillSerializer(
+                UserSkill.objects.filter(user=self.alice).select_related('skill'), many=True,
+                context={'request': request})),
+        ]
+        for url, serializer in cases:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).content, JSONRenderer().render(serializer.data))
+
+
+class IndexReplicaTests(ApiTestCase):
+    """In-memory indexes load from the primary even while a request reads from a replica."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Registered before TestCase sets up, which makes every query on an
+        # alias the test does not declare fail
+        connections.settings['replica'] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+            'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        })['replica']
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python'], location='Pune', availability='weekends')
+        cls.bob = make_user('bob', wanted=['python'], offered=['guitar'])
+
+    def setUp(self):
+        super().setUp()
+        # What ReplicaMiddleware does for a read_replica view, minus the
+        # primary fallback inside the test's transaction
+        token = _read_alias.set('replica')
+        self.addCleanup(_read_alias.reset, token)
+        router = mock.patch.object(ReplicaRouter, 'db_for_read', lambda self, model, **hints: _read_alias.get())
+        router.start()
+        self.addCleanup(router.stop)
+
+    def test_reads_are_routed_to_the_replica(self):
+        with self.assertRaisesMessage(AssertionError, "Database queries to 'replica' are not allowed"):
+            Skill.objects.exists()
+
+    def test_indexes_load_from_the_primary(self):
+        python = Skill.objects.using(DEFAULT_DB_ALIAS).get(name='python')
+        self.assertEqual(skill_index.users_for(python.id, 'offered'), {self.alice.id: 3})
+        self.assertEqual(search_engine.search([python.id], skill_type='wanted'), [self.bob.id])
+        self.assertEqual([name for _, name, _ in skill_autocomplete.complete('py')], ['python'])
+        self.assertEqual([user_id for user_id, _ in geo_index.nearest(18.52, 73.86, 1)], [self.alice.id])
+        self.assertTrue(availability_index.slots(self.alice.id))
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'login': '2/min', 'register': '2/min', 'search': '2/min'},
+})
+class ThrottleTests(ApiTestCase):
+    """Token buckets reject abusive clients before any password hash or query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python'])
+        cls.bob = make_user('bob', offered=['python'])
+
+    def login(self, password='wrong'):
+        return self.client.post('/api/login/', {'username': 'alice', 'password': password}, format='json')
+
+    def test_bucket_refills_over_time(self):
+        store = get_store()
+        capacity, refill_rate = parse_rate('2/min')
+        self.assertEqual((capacity, refill_rate), (2, 2 / 60))
+        self.assertEqual(store.take('k', capacity, refill_rate, now=0), (True, 0))
+        self.assertEqual(store.take('k', capacity, refill_rate, now=0), (True, 0))
+        allowed, wait = store.take('k', capacity, refill_rate, now=0)
+        self.assertEqual((allowed, round(wait)), (False, 30))
+        self.assertTrue(store.take('k', capacity, refill_rate, now=30)[0])
+
+    def test_buckets_are_shared_between_stores_on_one_file(self):
+        # What two worker processes on the host see
+        other = BucketStore(get_store().path)
+        self.assertTrue(get_store().take('shared', 1, 0.001, now=0)[0])
+        self.assertFalse(other.take('shared', 1, 0.001, now=0)[0])
+
+    def test_login_is_rejected_before_authenticating(self):
+        self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.login().status_code, 401)
+        with self.assertNumQueries(0):
+            response = self.login('pass12345')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_forwarded_for_header_does_not_pick_the_bucket(self):
+        # No proxy is configured, so a client-sent header is not its address
+        codes = [
+            self.client.post('/api/login/', {'username': 'alice', 'password': 'wrong'}, format='json',
+                             HTTP_X_FORWARDED_FOR=f'203.0.113.{i}').status_code
+            for i in range(3)
+        ]
+        self.assertEqual(codes, [401, 401, 429])
+
+    def test_search_is_limited_per_user(self):
+        # Keyed on the bearer token's user, so clients behind one address don't share a bucket
+        def search(user):
+            token = AccessToken.for_user(user)
+            return self.client.get('/api/users/search/?q=python', HTTP_AUTHORIZATION=f'Bearer {token}').status_code
+
+        self.assertEqual([search(self.alice) for _ in range(3)], [200, 200, 429])
+        self.assertEqual(search(self.bob), 200)
+
+    def test_unavailable_store_allows_requests(self):
+        with override_settings(THROTTLE_STORE_PATH=os.path.join(tempfile.mkdtemp(), 'missing', 'throttle.sqlite3')):
+            with self.assertLogs('api.throttling', 'WARNING'):
+                codes = [self.login().status_code for _ in range(3)]
+        self.assertEqual(codes, [401, 401, 401])
+
+
+class CopyDatabaseTests(ApiTestCase):
+    """copy_database moves every row to a migrated target, resumably, and checks it arrived intact."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice', offered=['python'], wanted=['guitar'], location='Pune')
+        cls.bob = make_user('bob', offered=['guitar'], wanted=['python'])
+        SwapRequest.objects.create(
+            requester=cls.alice, recipient=cls.bob,
+            requester_skill=cls.alice.user_skills.get(skill_type='offered'),
+            recipient_skill=cls.bob.user_skills.get(skill_type='offered'),
+        )
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.target = f"sqlite:///{os.path.join(directory, 'target.sqlite3')}"
+        self.checkpoint = os.path.join(directory, 'checkpoint.json')
+        # Declared only once TestCase has set up, so the runner creates no
+        # test database for it and the test's transaction leaves it alone
+        import_module('api.management.commands.copy_database').Command().connect('copy_target', self.target)
+        databases = mock.patch.object(type(self), 'databases', {DEFAULT_DB_ALIAS, 'copy_target'})
+        databases.start()
+        self.addCleanup(databases.stop)
+        self.addCleanup(self.drop_target)
+        # The router migrates only the primary
+        with override_settings(DATABASE_ROUTERS=[]):
+            call_command('migrate', database='copy_target', verbosity=0)
+
+    def drop_target(self):
+        connections['copy_target'].close()
+        del connections['copy_target']
+        del connections.settings['copy_target']
+
+    def copy(self, **options):
+        output = io.StringIO()
+        call_command('copy_database', source='default', target=self.target,
+                     checkpoint=self.checkpoint, chunk_size=2, stdout=output, **options)
+        return output.getvalue()
+
+    def test_copies_rows_with_ids_and_timestamps(self):
+        self.assertIn('Copied and verified', self.copy())
+        copied = SwapRequest.objects.using('copy_target').get()
+        original = SwapRequest.objects.get()
+        self.assertEqual((copied.pk, copied.requester_id, copied.updated_at),
+                         (original.pk, original.requester_id, original.updated_at))
+        self.assertEqual(Profile.objects.using('copy_target').get(user=self.alice).location, 'Pune')
+        # Sequences were moved past the copied ids
+        skill = Skill.objects.using('copy_target').create(name='chess')
+        self.assertGreater(skill.pk, Skill.objects.order_by('pk').last().pk)
+
+    def test_resumes_from_checkpoint(self):
+        self.copy()
+        with open(self.checkpoint) as f:
+            checkpoint = json.load(f)
+        self.assertTrue(all(state['done'] for state in checkpoint.values()))
+        # A crash after inserting a chunk but before recording it
+        checkpoint['api_userskill'] = {'rows': 0, 'last_pk': None, 'done': False}
+        with open(self.checkpoint, 'w') as f:
+            json.dump(checkpoint, f)
+        output = self.copy()
+        self.assertIn('auth_user: already copied', output)
+        self.assertIn('api_userskill: 2 rows', output)
+        self.assertIn('Copied and verified', output)
+
+    def test_refuses_to_overwrite_without_checkpoint(self):
+        self.copy()
+        with self.assertRaisesMessage(CommandError, 'already has rows on the target'):
+            self.copy(restart=True)
+
+    def test_verify_reports_changed_rows(self):
+        self.copy()
+        Profile.objects.using('copy_target').filter(user=self.bob).update(location='Mumbai')
+        with self.assertRaisesMessage(CommandError, 'Verification failed for: api_profile'):
+            self.copy(verify_only=True)
+
+    def test_dependency_order(self):
+        from api.management.commands.copy_database import dependency_order
+        order = dependency_order([SwapRequest, UserSkill, Skill, User])
+        self.assertLess(order.index(User), order.index(UserSkill))
+        self.assertLess(order.index(Skill), order.index(UserSkill))
+        self.assertLess(order.index(UserSkill), order.index(SwapRequest))
+
+
+class SeedAndBenchTests(ApiTestCase):
+    """seed_synthetic builds consistent data, and bench_endpoints exercises every route on it."""
+
+    def seed(self, users=24):
+        call_command('seed_synthetic', users=users, batch_size=7, stdout=io.StringIO())
+
+    def test_seed_is_consistent(self):
+        self.seed()
+        users = User.objects.filter(username__startswith='synthetic-').exclude(username='synthetic-admin')
+        self.assertEqual(users.count(), 24)
+        self.assertEqual(Profile.objects.filter(user__in=users).count(), 24)
+        self.assertEqual(UserSkill.objects.filter(user__in=users).count(), 24 * 4)
+        self.assertEqual(SwapRequest.objects.count(), 24)
+        # Counters and ratings were bulk-created, so nothing kept them in step
+        for counter in SwapCounter.objects.all():
+            for direction, field in (('sent', 'requester'), ('received', 'recipient')):
+                for status in ('pending', 'accepted', 'rejected', 'completed'):
+                    self.assertEqual(getattr(counter, f'{direction}_{status}'),
+                                     SwapRequest.objects.filter(**{field: counter.user_id}, status=status).count())
+        for rating in UserRating.objects.all():
+            self.assertEqual(rating.rating_count, Feedback.objects.filter(to_user=rating.user_id).count())
+        member = users.get(username='synthetic-0')
+        self.assertTrue(SwapRequest.objects.filter(recipient=member, status='pending').exists())
+        self.assertFalse(Feedback.objects.filter(from_user=member).exists())
+
+    def test_seed_refuses_to_run_twice(self):
+        self.seed(users=4)
+        with self.assertRaisesMessage(CommandError, 'Synthetic data already exists'):
+            self.seed(users=4)
+
+    def test_bench_covers_every_route_and_flags_regressions(self):
+        self.seed()
+        baseline_dir = tempfile.mkdtemp()
+        output = io.StringIO()
+        options = {'iterations': 1, 'warmup': 1, 'baseline_dir': baseline_dir, 'scale': 'tiny', 'stdout': output}
+        call_command('bench_endpoints', save_baseline=True, **options)
+        self.assertNotIn('No benchmark scenario', output.getvalue())
+        with open(os.path.join(baseline_dir, 'tiny.json')) as f:
+            baseline = json.load(f)
+        failed = {label: result['status'] for label, result in baseline['results'].items() if result['status'] >= 400}
+        self.assertEqual(failed, {})
+
+        # A baseline that issued fewer queries makes this run a regression
+        baseline['results']['swaps']['queries'] -= 1
+        with open(os.path.join(baseline_dir, 'tiny.json'), 'w') as f:
+            json.dump(baseline, f)
+        with self.assertRaisesMessage(CommandError, '1 regression(s): swaps'):
+            call_command('bench_endpoints', route=['swaps'], fail_on_regression=True, **options)
+
+
+class RecommendationTests(ApiTestCase):
+    """Co-occurrence recommendations, and incremental refreshes that match a full one."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # People who offer python tend to want spanish
+        cls.alice = make_user('alice', offered=['python'], wanted=['spanish'])
+        cls.bob = make_user('bob', offered=['python'], wanted=['spanish'])
+        cls.carol = make_user('carol', offered=['spanish'], wanted=['python'])
+        cls.dave = make_user('dave', offered=['spanish'], wanted=['guitar'])
+        cls.erin = make_user('erin', offered=['guitar'], wanted=['drums'])
+        cls.skills = dict(Skill.objects.values_list('name', 'id'))
+
+    def setUp(self):
+        super().setUp()
+        # Changes noted by setUpTestData's writes, whose transaction never commits
+        recommendations._pending.changes = set()
+        recommendations.refresh_recommendations(full=True)
+
+    def partners(self, user):
+        return [p['user_id'] for p in PartnerRecommendation.objects.get(user=user).partners]
+
+    def stored(self):
+        return (
+            {(n.skill_id, n.skill_type): (n.neighbours, round(n.norm, 9), n.holders) for n in SkillNeighbours.objects.all()},
+            dict(PartnerRecommendation.objects.values_list('user_id', 'partners')),
+        )
+
+    def test_ranks_complementary_partners_first(self):
+        python, spanish = self.skills['python'], self.skills['spanish']
+        neighbours = SkillNeighbours.objects.get(skill_id=python, skill_type='offered').neighbours
+        self.assertEqual(neighbours[0], [spanish, 'wanted', 1.0])
+        partners = PartnerRecommendation.objects.get(user=self.alice).partners
+        self.assertEqual(partners[0]['user_id'], self.carol.id)
+        self.assertEqual((partners[0]['offers'], partners[0]['wants']), ([[spanish, 3]], [[python, 3]]))
+        self.assertNotIn(self.alice.id, self.partners(self.alice))
+
+        self.client.force_authenticate(self.alice)
+        response = self.client.get('/api/recommendations/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['username'], 'carol')
+
+    def test_writes_record_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSkill.objects.filter(user=self.dave, skill_id=self.skills['guitar']).delete()
+            UserSkill.objects.create(user=self.erin, skill_id=self.skills['python'], skill_type='wanted')
+        self.assertEqual(
+            set(RecommendationChange.objects.values_list('user_id', 'skill_id', 'skill_type')),
+            {(self.dave.id, self.skills['guitar'], 'wanted'), (self.erin.id, None, '')},
+        )
+
+    def test_nothing_changed_loads_nothing(self):
+        with self.assertNumQueries(2):
+            counts = recommendations.refresh_recommendations(max_age=0)
+        self.assertEqual(counts['users'], 0)
+
+    def test_new_partner_reaches_unchanged_users(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            frank = make_user('frank', offered=['spanish'], wanted=['python'])
+            offered = frank.user_skills.get(skill_type='offered')
+            offered.proficiency_level = 5
+            offered.save()
+        # No max_age: alice and bob never changed, yet they see frank at once
+        counts = recommendations.refresh_recommendations(max_age=0)
+        self.assertEqual(self.partners(self.alice)[0], frank.id)
+        self.assertEqual(self.partners(self.bob)[0], frank.id)
+        # erin's guitar/drums suggestions draw on nothing that moved
+        self.assertLess(counts['users'], User.objects.count())
+        self.assertFalse(RecommendationChange.objects.exists())
+
+        incremental = self.stored()
+        recommendations.refresh_recommendations(full=True)
+        self.assertEqual(incremental, self.stored())
+
+    def test_removed_skills_and_users(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.carol.delete()
+            UserSkill.objects.filter(user=self.erin, skill_type='wanted').delete()
+        counts = recommendations.refresh_recommendations(max_age=0)
+        self.assertNotIn(self.carol.id, self.partners(self.alice))
+        # Nobody wants drums, or python now that carol is gone
+        self.assertFalse(SkillNeighbours.objects.filter(skill_id=self.skills['drums']).exists())
+        self.assertFalse(SkillNeighbours.objects.filter(skill_id=self.skills['python'], skill_type='wanted').exists())
+        self.assertEqual(counts['columns_removed'], 2)
+
+        incremental = self.stored()
+        recommendations.refresh_recommendations(full=True)
+        self.assertEqual(incremental, self.stored())
+
+    def test_shrunk_column_climbs_lists_that_left_it_out(self):
+        # chess's crowd keeps it below every lesson from the other cello players' lists
+        lessons = [f'lesson-{i}' for i in range(recommendations.NEIGHBOURS_PER_SKILL + 1)]
+        make_user('gina', offered=['cello'], wanted=['chess', *lessons])
+        make_user('hugo', offered=['cello'], wanted=['chess', *lessons])
+        make_user('ivan', wanted=lessons)
+        crowd = [make_user(f'fan-{i}', wanted=['chess']) for i in range(4)]
+        recommendations._pending.changes = set()
+        recommendations.refresh_recommendations(full=True)
+        cello = SkillNeighbours.objects.get(skill__name='cello', skill_type='offered')
+        chess = Skill.objects.get(name='chess').id
+        self.assertNotIn([chess, 'wanted'], [neighbour[:2] for neighbour in cello.neighbours])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSkill.objects.filter(user__in=crowd).delete()
+        recommendations.refresh_recommendations(max_age=0)
+        cello.refresh_from_db()
+        self.assertEqual(cello.neighbours[0][:2], [chess, 'wanted'])
+
+        incremental = self.stored()
+        recommendations.refresh_recommendations(full=True)
+        self.assertEqual(incremental, self.stored())
+
+    def test_completed_swaps_weigh_skills(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            swap = SwapRequest.objects.create(
+                requester=self.dave, recipient=self.alice,
+                requester_skill=self.dave.user_skills.get(skill_type='offered'),
+                recipient_skill=self.alice.user_skills.get(skill_type='offered'),
+                status='accepted',
+            )
+            swap.status = 'completed'
+            swap.save()
+        recommendations.refresh_recommendations(max_age=0)
+        # dave's spanish now outweighs carol's for people who want it
+        holders = SkillNeighbours.objects.get(skill_id=self.skills['spanish'], skill_type='offered').holders
+        self.assertEqual([user_id for user_id, _ in holders], [self.dave.id, self.carol.id])
+        self.assertGreater(holders[0][1], holders[1][1])
+
+        incremental = self.stored()
+        recommendations.refresh_recommendations(full=True)
+        self.assertEqual(incremental, self.stored())
+
+    def test_stale_users_are_recomputed(self):
+        recommendations.refresh_recommendations(max_age=0)
+        PartnerRecommendation.objects.filter(user=self.erin).update(computed_at=timezone.now() - timedelta(days=2))
+        counts = recommendations.refresh_recommendations(max_age=86400)
+        self.assertEqual(counts['users'], 1)
+        self.assertGreater(PartnerRecommendation.objects.get(user=self.erin).computed_at, timezone.now() - timedelta(minutes=1))
@@ -0,0 +1,151 @@
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from api.replicas import request_user_id
+
+logger = logging.getLogger(__name__)
+
+# Rows untouched this long are full buckets again and can be dropped
+PRUNE_AFTER = 86400
+PRUNE_PROBABILITY = 0.001
+
+
+def default_store_path():
+    # tmpfs when available, so the store never waits on a disk
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'skill-swap-throttle.sqlite3')
+
+
+class BucketStore:
+    """
+    Token buckets in a local SQLite file, so every worker process on the
+    host draws from the same buckets. Each take is one short write
+    transaction; SQLite serializes them across processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Losing a few refills on power loss is fine for rate limiting
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS bucket ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL'
+                ') WITHOUT ROWID'
+            )
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, refill_rate, now=None):
+        """
+        Take one token from ``key``'s bucket, refilled at ``refill_rate``
+        tokens per second up to ``capacity``. Returns ``(allowed, wait)``,
+        where ``wait`` is the seconds until a token is available.
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(now - row[1], 0) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                'INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                (key, tokens, now),
+            )
+            if random.random() < PRUNE_PROBABILITY:
+                conn.execute('DELETE FROM bucket WHERE updated < ?', (now - PRUNE_AFTER,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, 0 if allowed else (1 - tokens) / refill_rate
+
+    def clear(self):
+        self._connection().execute('DELETE FROM bucket')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        path = getattr(settings, 'THROTTLE_STORE_PATH', None) or default_store_path()
+        if _store is None or _store.path != path:
+            _store = BucketStore(path)
+        return _store
+
+
+def parse_rate(rate):
+    """'10/min' -> (capacity 10, refill 10 tokens per 60 seconds)."""
+    num, period = rate.split('/')
+    duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+    return int(num), int(num) / duration
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle for views that set ``throttle_scope``; the rate
+    comes from DEFAULT_THROTTLE_RATES[scope]. ``throttle_by = 'user'`` keys
+    the bucket by the bearer token's user and falls back to the client IP;
+    ``'ip'`` (the default) always uses the IP, which trusts X-Forwarded-For
+    only as far as REST_FRAMEWORK['NUM_PROXIES']. The store is fail-open.
+    """
+
+    def __init__(self):
+        self._wait = None
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if not rate:
+            return True
+
+        user_id = request_user_id(request._request) if getattr(view, 'throttle_by', 'ip') == 'user' else None
+        ident = f'user:{user_id}' if user_id is not None else f'ip:{self.get_ident(request)}'
+        capacity, refill_rate = parse_rate(rate)
+        try:
+            allowed, self._wait = get_store().take(f'{scope}:{ident}', capacity, refill_rate)
+        except sqlite3.Error:
+            logger.warning("Throttle store unavailable; allowing request.", exc_info=True)
+            return True
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class ThrottleFirstMixin:
+    """
+    Checks throttles before authentication and permissions, so a rejected
+    request costs no token lookup, password hash or query.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        self.check_throttles(request)
+        self._throttles_checked = True
+        super().initial(request, *args, **kwargs)
+
+    def check_throttles(self, request):
+        if not getattr(self, '_throttles_checked', False):
+            super().check_throttles(request)
@@ -3,10 +3,11 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     RegisterView, LoginView, ProfileView,
-    SkillListView, UserSkillListView, UserSkillDetailView, UserSearchView,
-    SwapRequestListCreateView, SwapRequestDetailView,
+    SkillListView, SkillAutocompleteView, UserSkillListView, UserSkillBulkView, UserSkillDetailView, UserSearchView,
+    SwapRequestListCreateView, SwapRequestDetailView, SwapCountsView,
     FeedbackCreateView, FeedbackListView,
-    AdminSkillViewSet, AdminUserViewSet, AdminSwapRequestViewSet, ExportView
+    AdminSkillViewSet, AdminUserViewSet, AdminSwapRequestViewSet, ExportView,
+    MatchListView, RecommendationListView, TopRatedUsersView, EventTicketView, event_stream
 )
 
 # Create a router for admin viewsets
@@ -26,16 +27,28 @@ urlpatterns = [
     
     # Skill endpoints
     path('skills/', SkillListView.as_view(), name='skills'),
+    path('skills/autocomplete/', SkillAutocompleteView.as_view(), name='skill-autocomplete'),
     path('user-skills/', UserSkillListView.as_view(), name='user-skills'),
+    path('user-skills/bulk/', UserSkillBulkView.as_view(), name='user-skill-bulk'),
     path('user-skills/<int:pk>/', UserSkillDetailView.as_view(), name='user-skill-detail'),
     
     # User search endpoint
     path('users/search/', UserSearchView.as_view(), name='user-search'),
+    path('users/top-rated/', TopRatedUsersView.as_view(), name='top-rated-users'),
+    
+    # Match endpoints
+    path('matches/', MatchListView.as_view(), name='matches'),
+    path('recommendations/', RecommendationListView.as_view(), name='recommendations'),
     
     # Swap request endpoints
     path('swaps/', SwapRequestListCreateView.as_view(), name='swaps'),
+    path('swaps/counts/', SwapCountsView.as_view(), name='swap-counts'),
     path('swaps/<int:pk>/', SwapRequestDetailView.as_view(), name='swap-detail'),
     
+    # Server-sent events (served under ASGI)
+    path('events/', event_stream, name='events'),
+    path('events/ticket/', EventTicketView.as_view(), name='event-ticket'),
+    
     # Feedback endpoints
     path('feedback/', FeedbackCreateView.as_view(), name='feedback-create'),
     path('feedback/received/', FeedbackListView.as_view(), name='feedback-list'),
@@ -1,6 +1,9 @@
 # Views package
 from .auth_views import RegisterView, LoginView
 from .profile_views import ProfileView
-from .skill_views import SkillListView, UserSkillListView, UserSkillDetailView, UserSearchView
-from .swap_views import SwapRequestListCreateView, SwapRequestDetailView, FeedbackCreateView, FeedbackListView
-from .admin_views import AdminSkillViewSet, AdminUserViewSet, AdminSwapRequestViewSet, ExportView 
\ No newline at end of file
+from .skill_views import SkillListView, SkillAutocompleteView, UserSkillListView, UserSkillBulkView, UserSkillDetailView, UserSearchView
+from .swap_views import SwapRequestListCreateView, SwapRequestDetailView, SwapCountsView, FeedbackCreateView, FeedbackListView
+from .admin_views import AdminSkillViewSet, AdminUserViewSet, AdminSwapRequestViewSet, ExportView 
+from .match_views import MatchListView, RecommendationListView
+from .rating_views import TopRatedUsersView
+from .event_views import EventTicketView, event_stream
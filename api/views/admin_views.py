@@ -2,18 +2,82 @@ from rest_framework import generics, status, viewsets
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
 from rest_framework.decorators import action
+from rest_framework.pagination import LimitOffsetPagination
 from django.contrib.auth.models import User
 from api.models import Skill, SwapRequest, Feedback
 from api.serializers.skill_serializers import SkillSerializer
 from api.serializers.swap_serializers import SwapRequestSerializer
 from api.serializers.user_serializers import UserSerializer
-import csv
-from django.http import HttpResponse
+from django.core.exceptions import FieldError, ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from api.signals import bulk_updated
+from api.projection import ProjectedListMixin
+from api.replicas import current_read_alias
+from api.services.exports import DATASETS, FORMATS, async_chunks, iter_dataset, gzip_stream, zip_stream
 
-class AdminSkillViewSet(viewsets.ModelViewSet):
+class BulkActionMixin:
+    """
+    List-level moderation actions that apply one UPDATE to many rows.
+    
+    Targets come from ``{"ids": [...]}`` or ``{"filter": {...}}`` restricted to
+    ``bulk_filter_fields``. Per-instance signals are skipped, so ``bulk_updated``
+    is sent with the affected ids for caches and indexes to follow.
+    """
+    bulk_filter_fields = ()
+    
+    def get_bulk_queryset(self, request):
+        ids = request.data.get('ids')
+        filters = request.data.get('filter')
+        model = self.get_queryset().model
+        
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                return None, Response({"ids": "Provide a list of ids."}, status=status.HTTP_400_BAD_REQUEST)
+            return model.objects.filter(id__in=ids), None
+        if isinstance(filters, dict) and filters:
+            unknown = set(filters) - set(self.bulk_filter_fields)
+            if unknown:
+                return None, Response(
+                    {"filter": f"Unsupported filter fields: {', '.join(sorted(unknown))}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                return model.objects.filter(**filters), None
+            except (FieldError, ValueError, ValidationError) as exc:
+                return None, Response({"filter": exc.messages if hasattr(exc, 'messages') else str(exc)},
+                                      status=status.HTTP_400_BAD_REQUEST)
+        return None, Response({"detail": "Provide either ids or filter."}, status=status.HTTP_400_BAD_REQUEST)
+    
+    def bulk_update(self, request, message, **values):
+        queryset, error = self.get_bulk_queryset(request)
+        if error is not None:
+            return error
+        queryset = self.exclude_from_bulk(request, queryset, values)
+        
+        with transaction.atomic():
+            ids = list(queryset.values_list('id', flat=True))
+            updated = queryset.model.objects.filter(id__in=ids).update(**values) if ids else 0
+            transaction.on_commit(
+                lambda: bulk_updated.send(sender=queryset.model, ids=ids, fields=list(values))
+            )
+        return Response({'status': message, 'updated': updated})
+    
+    def exclude_from_bulk(self, request, queryset, values):
+        return queryset
+
+class AdminSkillViewSet(BulkActionMixin, ProjectedListMixin, viewsets.ModelViewSet):
     queryset = Skill.objects.all()
     serializer_class = SkillSerializer
     permission_classes = [IsAdminUser]
+    # Deletes cascade to user skills, swaps and their feedback
+    query_budget = {
+        'list': 2, 'retrieve': 2, 'create': 3, 'update': 4, 'partial_update': 4, 'destroy': 12,
+        'approve': 3, 'reject': 3, 'bulk_approve': 5, 'bulk_reject': 5,
+    }
+    bulk_filter_fields = ('is_approved', 'name__icontains', 'created_at__gte', 'created_at__lte')
     
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -28,72 +92,106 @@ class AdminSkillViewSet(viewsets.ModelViewSet):
         skill.is_approved = False
         skill.save()
         return Response({'status': 'skill rejected'})
+    
+    @action(detail=False, methods=['post'], url_path='bulk-approve')
+    def bulk_approve(self, request):
+        return self.bulk_update(request, 'skills approved', is_approved=True, updated_at=timezone.now())
+    
+    @action(detail=False, methods=['post'], url_path='bulk-reject')
+    def bulk_reject(self, request):
+        return self.bulk_update(request, 'skills rejected', is_approved=False, updated_at=timezone.now())
 
-class AdminUserViewSet(viewsets.ModelViewSet):
+class AdminUserViewSet(BulkActionMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
+    # A delete walks every table that references the user
+    query_budget = {
+        'list': 2, 'retrieve': 2, 'create': 4, 'update': 4, 'partial_update': 4, 'destroy': 32,
+        'ban': 3, 'activate': 3, 'bulk_ban': 5, 'bulk_activate': 5,
+    }
+    bulk_filter_fields = ('is_active', 'username__icontains', 'email__icontains',
+                          'date_joined__gte', 'date_joined__lte', 'last_login__isnull')
     
     @action(detail=True, methods=['post'])
     def ban(self, request, pk=None):
         user = self.get_object()
         user.is_active = False
-        user.save()
+        user.save(update_fields=['is_active'])
         return Response({'status': 'user banned'})
     
     @action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
         user = self.get_object()
         user.is_active = True
-        user.save()
+        user.save(update_fields=['is_active'])
         return Response({'status': 'user activated'})
+    
+    @action(detail=False, methods=['post'], url_path='bulk-ban')
+    def bulk_ban(self, request):
+        return self.bulk_update(request, 'users banned', is_active=False)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-activate')
+    def bulk_activate(self, request):
+        return self.bulk_update(request, 'users activated', is_active=True)
+    
+    def exclude_from_bulk(self, request, queryset, values):
+        # Never let a bulk ban lock out the admin running it, or other admins
+        if values.get('is_active') is False:
+            queryset = queryset.exclude(id=request.user.id).exclude(is_superuser=True)
+        return queryset
 
-class AdminSwapRequestViewSet(viewsets.ReadOnlyModelViewSet):
+class AdminSwapRequestViewSet(ProjectedListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = SwapRequest.objects.all()
     serializer_class = SwapRequestSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = LimitOffsetPagination
+    query_budget = {'list': 3, 'retrieve': 2}
     
     def get_queryset(self):
-        queryset = SwapRequest.objects.all()
+        queryset = SwapRequest.objects.with_names().order_by('-created_at', '-id')
         status = self.request.query_params.get('status')
         if status:
             queryset = queryset.filter(status=status)
         return queryset
 
 class ExportView(generics.GenericAPIView):
+    """
+    Streams admin exports without loading whole tables into memory.
+    
+    Query params: ``type`` (``users``, ``swaps``, ``feedback`` or ``all`` for a
+    zip of the three), ``file_format`` (``csv`` or ``ndjson``) and ``gzip=1``.
+    """
     permission_classes = [IsAdminUser]
+    query_budget = 4
+    read_replica = True
     
     def get(self, request, *args, **kwargs):
         export_type = request.query_params.get('type', 'users')
+        export_format = request.query_params.get('file_format', 'csv')
         
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{export_type}.csv"'
-        
-        writer = csv.writer(response)
+        if export_format not in FORMATS:
+            return Response({"detail": f"Unsupported format '{export_format}'."}, status=status.HTTP_400_BAD_REQUEST)
+        if export_type != 'all' and export_type not in DATASETS:
+            return Response({"detail": f"Unsupported export type '{export_type}'."}, status=status.HTTP_400_BAD_REQUEST)
         
-        if export_type == 'users':
-            writer.writerow(['ID', 'Username', 'Email', 'Date Joined', 'Last Login', 'Is Active'])
-            for user in User.objects.all():
-                writer.writerow([
-                    user.id, user.username, user.email, 
-                    user.date_joined, user.last_login, user.is_active
-                ])
-                
-        elif export_type == 'swaps':
-            writer.writerow(['ID', 'Requester', 'Recipient', 'Status', 'Created', 'Updated'])
-            for swap in SwapRequest.objects.all():
-                writer.writerow([
-                    swap.id, swap.requester.username, swap.recipient.username,
-                    swap.status, swap.created_at, swap.updated_at
-                ])
-                
-        elif export_type == 'feedback':
-            writer.writerow(['ID', 'Swap ID', 'From User', 'To User', 'Rating', 'Created'])
-            for feedback in Feedback.objects.all():
-                writer.writerow([
-                    feedback.id, feedback.swap_request.id, 
-                    feedback.from_user.username, feedback.to_user.username,
-                    feedback.rating, feedback.created_at
-                ])
+        extension, content_type = FORMATS[export_format]
+        # The body streams after the request's routing context is gone
+        using = current_read_alias()
+        if export_type == 'all':
+            stream = zip_stream(list(DATASETS), export_format, using)
+            filename = 'export.zip'
+            content_type = 'application/zip'
+        else:
+            stream = iter_dataset(export_type, export_format, using)
+            filename = f'{export_type}.{extension}'
+            if request.query_params.get('gzip') in ('1', 'true'):
+                stream = gzip_stream(stream)
+                filename += '.gz'
+                content_type = 'application/gzip'
+        if isinstance(request._request, ASGIRequest):
+            stream = async_chunks(stream)
         
-        return response 
\ No newline at end of file
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -3,10 +3,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from api.serializers.user_serializers import RegisterSerializer, UserSerializer
+from api.throttling import ThrottleFirstMixin
 
-class RegisterView(generics.CreateAPIView):
+class RegisterView(ThrottleFirstMixin, generics.CreateAPIView):
     serializer_class = RegisterSerializer
     permission_classes = [AllowAny]
+    query_budget = 8
+    throttle_scope = 'register'
     
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -18,5 +21,7 @@ class RegisterView(generics.CreateAPIView):
             "message": "User registered successfully",
         }, status=status.HTTP_201_CREATED)
 
-class LoginView(TokenObtainPairView):
-    permission_classes = [AllowAny] 
\ No newline at end of file
+class LoginView(ThrottleFirstMixin, TokenObtainPairView):
+    permission_classes = [AllowAny]
+    query_budget = 2
+    throttle_scope = 'login' 
\ No newline at end of file
@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import get_cached_user
+from api.services.events import get_broker, format_event, issue_stream_ticket, redeem_stream_ticket
+
+HEARTBEAT_SECONDS = 15
+
+
+class EventTicketView(APIView):
+    """
+    Issues a single-use ticket for ``GET /api/events/?ticket=...``, valid for
+    EVENT_TICKET_SECONDS. EventSource cannot send an Authorization header,
+    and access tokens must not go in URLs, where they end up in logs.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = 1
+
+    def post(self, request, *args, **kwargs):
+        return Response({
+            'ticket': issue_stream_ticket(request.user.id),
+            'expires_in': getattr(settings, 'EVENT_TICKET_SECONDS', 30),
+        }, status=status.HTTP_201_CREATED)
+
+
+def _authenticate(request):
+    """(user id, unix expiry or None) from a bearer header or a stream ticket; (None, None) if neither is valid."""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        try:
+            token = AccessToken(header[len('Bearer '):])
+            return token[api_settings.USER_ID_CLAIM], token['exp']
+        except (TokenError, KeyError):
+            return None, None
+    return redeem_stream_ticket(request.GET.get('ticket')), None
+
+
+def _is_active(user_id):
+    user = get_cached_user(user_id)
+    return user is not None and user.is_active
+
+
+async def event_stream(request):
+    """
+    Server-sent events for the authenticated user: swap created / accepted /
+    rejected / completed and feedback received. Served under ASGI, where each
+    open stream is a coroutine waiting on a queue rather than a thread.
+
+    Authenticate with a bearer header, or with a ticket from
+    ``POST /api/events/ticket/`` for EventSource; reconnecting needs a new
+    ticket. The stream closes when a bearer token expires, and when the user
+    is found inactive by the check run every EVENT_RECHECK_SECONDS.
+    """
+    user_id, expires_at = await sync_to_async(_authenticate)(request)
+    if user_id is None:
+        return JsonResponse({"detail": "Provide a bearer token or a valid stream ticket."}, status=401)
+    if not await sync_to_async(_is_active)(user_id):
+        return JsonResponse({"detail": "User not found or inactive"}, status=401)
+
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    _, queue = subscription
+    recheck_seconds = getattr(settings, 'EVENT_RECHECK_SECONDS', 30)
+
+    async def stream():
+        try:
+            yield b'retry: 5000\n\n'
+            now = time.monotonic()
+            next_heartbeat, next_check = now + HEARTBEAT_SECONDS, now + recheck_seconds
+            while expires_at is None or time.time() < expires_at:
+                now = time.monotonic()
+                if now >= next_check:
+                    # Bans drop the shared cached user, so this sees them at once
+                    if not await sync_to_async(_is_active)(user_id):
+                        break
+                    next_check = now + recheck_seconds
+                if now >= next_heartbeat:
+                    yield b': keep-alive\n\n'
+                    next_heartbeat = now + HEARTBEAT_SECONDS
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=min(next_heartbeat, next_check) - now)
+                except asyncio.TimeoutError:
+                    continue
+                yield format_event(event)
+                next_heartbeat = time.monotonic() + HEARTBEAT_SECONDS
+        finally:
+            broker.unsubscribe(user_id, subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,138 @@
+from rest_framework import generics
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from api.models import PartnerRecommendation, Skill, User
+from api.serializers.match_serializers import MatchSerializer, RecommendationSerializer
+from api.services.availability import overlap_minutes
+from api.services.matching import skill_index
+from api.services.recommendations import PARTNERS_PER_USER
+from api.services.schedules import availability_index
+
+DEFAULT_MATCH_LIMIT = 20
+MAX_MATCH_LIMIT = 100
+
+
+class MatchListView(generics.GenericAPIView):
+    """
+    Ranked mutual matches: users who offer a skill the current user wants
+    and want a skill the current user offers. ``sort=availability`` puts
+    partners sharing the most weekly availability first.
+    """
+    serializer_class = MatchSerializer
+    permission_classes = [IsAuthenticated]
+    query_budget = 5
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', DEFAULT_MATCH_LIMIT))
+        except ValueError:
+            limit = DEFAULT_MATCH_LIMIT
+        return max(1, min(limit, MAX_MATCH_LIMIT))
+
+    def by_availability(self, candidates):
+        """Stable reorder of candidate dicts by time shared with the current user, for ``sort=availability``."""
+        if not candidates or self.request.query_params.get('sort') != 'availability':
+            return candidates
+        slots = availability_index.slots(self.request.user.id)
+        if not slots:
+            return candidates
+        overlaps = availability_index.overlaps(slots)
+        return sorted(candidates, key=lambda candidate: -overlaps.get(candidate['user_id'], 0))
+
+    def availability_overlap(self, user_id):
+        slots = availability_index.slots(self.request.user.id)
+        return overlap_minutes(slots, availability_index.slots(user_id)) if slots else None
+
+    def get(self, request, *args, **kwargs):
+        limit = self.get_limit()
+        candidates = self.by_availability(skill_index.mutual_matches(request.user.id))
+
+        # Walk the ranking in batches and keep only visible partners
+        matches = []
+        users = {}
+        for start in range(0, len(candidates), limit * 2):
+            batch = candidates[start:start + limit * 2]
+            visible = User.objects.filter(
+                id__in=[m['user_id'] for m in batch],
+                is_active=True,
+                profile__is_public=True,
+            ).select_related('profile')
+            users.update((user.id, user) for user in visible)
+            matches.extend(m for m in batch if m['user_id'] in users)
+            if len(matches) >= limit:
+                break
+        matches = matches[:limit]
+
+        skill_ids = set()
+        for match in matches:
+            skill_ids.update(match['offers'])
+            skill_ids.update(match['wants'])
+        skill_names = dict(Skill.objects.filter(id__in=skill_ids).values_list('id', 'name'))
+
+        def describe(skills):
+            return [
+                {'skill_id': skill_id, 'skill_name': skill_names.get(skill_id, ''), 'proficiency_level': level}
+                for skill_id, level in sorted(skills.items(), key=lambda item: -item[1])
+            ]
+
+        data = [
+            {
+                'user': users[match['user_id']],
+                'score': match['score'],
+                'they_offer': describe(match['offers']),
+                'they_want': describe(match['wants']),
+                'availability_overlap': self.availability_overlap(match['user_id']),
+            }
+            for match in matches
+        ]
+        serializer = self.get_serializer(data, many=True)
+        return Response(serializer.data)
+
+
+class RecommendationListView(MatchListView):
+    """
+    People the current user may want to swap with, beyond exact matches:
+    partners suggested from skill co-occurrence and precomputed by
+    ``manage.py refresh_recommendations``. Users without precomputed
+    recommendations get an empty list until the next refresh.
+    """
+    serializer_class = RecommendationSerializer
+    query_budget = 4
+
+    def get(self, request, *args, **kwargs):
+        limit = min(self.get_limit(), PARTNERS_PER_USER)
+        partners = (
+            PartnerRecommendation.objects.filter(user=request.user).values_list('partners', flat=True).first()
+            or []
+        )
+
+        # The store may lag behind deactivations and visibility changes
+        candidates = self.by_availability(partners)[:limit * 2]
+        users = {
+            user.id: user for user in User.objects.filter(
+                id__in=[p['user_id'] for p in candidates], is_active=True, profile__is_public=True,
+            ).select_related('profile')
+        } if candidates else {}
+        partners = [p for p in candidates if p['user_id'] in users][:limit]
+
+        skill_ids = {skill_id for p in partners for skill_id, _ in p['offers'] + p['wants']}
+        skill_names = dict(Skill.objects.filter(id__in=skill_ids).values_list('id', 'name')) if skill_ids else {}
+
+        def describe(skills):
+            return [
+                {'skill_id': skill_id, 'skill_name': skill_names.get(skill_id, ''), 'proficiency_level': level}
+                for skill_id, level in sorted(skills, key=lambda item: -item[1])
+            ]
+
+        data = [
+            {
+                'user': users[p['user_id']],
+                'score': p['score'],
+                'they_offer': describe(p['offers']),
+                'they_want': describe(p['wants']),
+                'availability_overlap': self.availability_overlap(p['user_id']),
+            }
+            for p in partners
+        ]
+        serializer = self.get_serializer(data, many=True)
+        return Response(serializer.data)
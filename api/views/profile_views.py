@@ -3,10 +3,35 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from api.models import Profile
 from api.serializers.user_serializers import ProfileSerializer
+from api.conditional import ConditionalGetMixin
+from api.services.photos import schedule_photo_processing
 
-class ProfileView(generics.RetrieveUpdateAPIView):
+class ProfileView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     serializer_class = ProfileSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = {'GET': 2, 'PUT': 6, 'PATCH': 6}
+    
+    def get_queryset(self):
+        return Profile.objects.filter(user=self.request.user)
     
     def get_object(self):
-        return self.request.user.profile 
\ No newline at end of file
+        # The token user carries only the columns authentication needs; load
+        # the profile with the user and rating the payload shows in one query
+        if not hasattr(self, '_profile'):
+            self._profile = Profile.objects.select_related('user__rating').get(user_id=self.request.user.id)
+        return self._profile
+    
+    def perform_update(self, serializer):
+        profile = serializer.save()
+        if 'profile_photo' in serializer.validated_data:
+            schedule_photo_processing(profile)
+    
+    def get_validator_state(self):
+        profile = self.get_object()
+        # Loads (and caches on the user) the rating the serializer shows
+        rating = getattr(profile.user, 'rating', None)
+        totals = (rating.rating_count, rating.rating_sum) if rating else (0, 0)
+        # User columns shown in the payload; saving them leaves profile.updated_at alone
+        user = profile.user
+        names = (user.username, user.email, user.first_name, user.last_name)
+        return (profile.pk, profile.updated_at, names, totals), profile.updated_at 
\ No newline at end of file
@@ -0,0 +1,28 @@
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
+from api.models import UserRating
+from api.serializers.user_serializers import TopRatedUserSerializer
+
+class TopRatedUsersView(generics.ListAPIView):
+    """
+    Public, active users ordered by average rating, read straight off the
+    UserRating (average, rating_count) index.
+    """
+    serializer_class = TopRatedUserSerializer
+    permission_classes = [IsAuthenticated]
+    query_budget = 2
+    max_limit = 100
+    
+    def get_queryset(self):
+        params = self.request.query_params
+        try:
+            min_count = max(1, int(params.get('min_count', 1)))
+            limit = max(1, min(int(params.get('limit', 20)), self.max_limit))
+        except ValueError:
+            min_count, limit = 1, 20
+        
+        return UserRating.objects.filter(
+            rating_count__gte=min_count,
+            user__is_active=True,
+            user__profile__is_public=True,
+        ).select_related('user', 'user__profile').order_by('-average', '-rating_count')[:limit]
@@ -1,29 +1,78 @@
 from rest_framework import generics, status, filters
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from django.db.models import Q, Prefetch, Case, When
 from api.models import Skill, UserSkill, User
 from api.serializers.skill_serializers import (
     SkillSerializer, UserSkillSerializer, UserSkillCreateSerializer
 )
 from api.serializers.user_serializers import UserSerializer, UserSearchSerializer
+from api.services.autocomplete import skill_autocomplete
+from api.services.availability import MINUTES_PER_WEEK
+from api.services.geo import users_near
+from api.services.geocoding import geocode
+from api.services.schedules import availability_index, by_overlap, users_available
+from api.services.search import search_engine
+from api.cache import CachedListMixin
+from api.conditional import ConditionalGetMixin
+from api.projection import ProjectedListMixin
+from api.throttling import ThrottleFirstMixin
 
-class SkillListView(generics.ListAPIView):
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 200
+DEFAULT_AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+DEFAULT_NEAR_RADIUS_KM = 50
+MAX_NEAR_RADIUS_KM = 500
+
+def _int_param(params, name, default, minimum, maximum):
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return max(minimum, min(value, maximum))
+
+class SkillListView(ConditionalGetMixin, CachedListMixin, ProjectedListMixin, generics.ListAPIView):
     queryset = Skill.objects.filter(is_approved=True)
     serializer_class = SkillSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 3
+    read_replica = True
+    cache_tags = ('skill',)
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
-class UserSkillListView(generics.ListCreateAPIView):
+class SkillAutocompleteView(generics.GenericAPIView):
+    """
+    Approved skills whose name starts with ``prefix``, most used first.
+    
+    Query params: ``prefix`` (required) and ``limit`` (1-50, default 10).
+    Served from the in-memory prefix index, without touching the database.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = 1
+    
+    def get(self, request, *args, **kwargs):
+        prefix = request.query_params.get('prefix', '').strip()
+        if not prefix:
+            return Response([])
+        limit = _int_param(request.query_params, 'limit', DEFAULT_AUTOCOMPLETE_LIMIT, 1, MAX_AUTOCOMPLETE_LIMIT)
+        return Response([
+            {'id': skill_id, 'name': name, 'user_count': count}
+            for skill_id, name, count in skill_autocomplete.complete(prefix, limit)
+        ])
+
+class UserSkillListView(ProjectedListMixin, generics.ListCreateAPIView):
     serializer_class = UserSkillSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = {'GET': 2, 'POST': 7}
     
     def get_queryset(self):
         user = self.request.user
         skill_type = self.request.query_params.get('type')
         
-        queryset = UserSkill.objects.filter(user=user)
+        queryset = UserSkill.objects.filter(user=user).select_related('skill')
         if skill_type:
             queryset = queryset.filter(skill_type=skill_type)
         
@@ -34,20 +83,65 @@ class UserSkillListView(generics.ListCreateAPIView):
             return UserSkillCreateSerializer
         return UserSkillSerializer
 
+class UserSkillBulkView(generics.GenericAPIView):
+    """
+    POST a list of {skill_name, skill_type, proficiency_level} to add many
+    skills at once; DELETE {"ids": [...]} to remove many.
+    """
+    serializer_class = UserSkillCreateSerializer
+    permission_classes = [IsAuthenticated]
+    query_budget = {'POST': 7, 'DELETE': 8}
+    max_batch_size = 100
+    
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True, max_length=self.max_batch_size)
+        serializer.is_valid(raise_exception=True)
+        user_skills = serializer.save()
+        
+        queryset = UserSkill.objects.filter(pk__in=[us.pk for us in user_skills]).select_related('skill')
+        return Response(UserSkillSerializer(queryset, many=True).data, status=status.HTTP_201_CREATED)
+    
+    def delete(self, request, *args, **kwargs):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({"ids": "Provide a list of user skill ids."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_batch_size:
+            return Response({"ids": f"At most {self.max_batch_size} ids per request."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        _, deleted = UserSkill.objects.filter(user=request.user, id__in=ids).delete()
+        return Response({"deleted": deleted.get(UserSkill._meta.label, 0)})
+
 class UserSkillDetailView(generics.RetrieveDestroyAPIView):
     serializer_class = UserSkillSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = {'GET': 2, 'DELETE': 8}
     
     def get_queryset(self):
-        return UserSkill.objects.filter(user=self.request.user)
+        return UserSkill.objects.filter(user=self.request.user).select_related('skill')
 
-class UserSearchView(generics.ListAPIView):
+class UserSearchView(ThrottleFirstMixin, CachedListMixin, ProjectedListMixin, generics.ListAPIView):
     serializer_class = UserSearchSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 4
+    read_replica = True
+    throttle_scope = 'search'
+    throttle_by = 'user'
+    # 'feedback' because results show each user's average rating
+    cache_tags = ('user', 'profile', 'skill', 'userskill', 'feedback')
     
     def get_queryset(self):
+        origin = self.get_origin()
+        overlaps = self.get_overlaps()
+        skills = self.request.query_params.get('skills')
+        if skills:
+            return self.search_skills(skills, origin)
+        
         skill_query = self.request.query_params.get('q', '')
         if not skill_query:
+            if origin is not None:
+                return self.search_near(origin)
+            if overlaps is not None:
+                return self.search_available()
             return User.objects.none()
         
         # Find users with public profiles who offer the requested skill
@@ -55,6 +149,169 @@ class UserSearchView(generics.ListAPIView):
             profile__is_public=True,
             user_skills__skill__name__icontains=skill_query,
             user_skills__skill_type='offered'
-        ).distinct()
+        ).distinct().order_by('id')
+        
+        if origin is None and overlaps is None:
+            return self.with_skills(skill_users)
+        # Distance and availability ordering happen in memory, then a page is fetched
+        exclude = self.excluded_user()
+        user_ids = [user_id for user_id in skill_users.values_list('id', flat=True) if user_id != exclude]
+        if origin is not None:
+            user_ids = users_near(origin, self.radius_km(), user_ids)
+        return self.paged(self.by_availability(user_ids))
+    
+    def get_origin(self):
+        """
+        Coordinates of the ``near`` param: a "lat,lon" pair, a place name, or
+        ``me`` for the requesting user's own profile location.
+        """
+        if hasattr(self, '_origin'):
+            return self._origin
+        near = self.request.query_params.get('near', '').strip()
+        if not near:
+            origin = None
+        elif near == 'me':
+            profile = getattr(self.request.user, 'profile', None)
+            origin = None
+            if profile is not None and profile.latitude is not None and profile.longitude is not None:
+                origin = (profile.latitude, profile.longitude)
+            if origin is None:
+                raise ValidationError({'near': 'Set a recognisable location on your profile to search near you.'})
+        else:
+            origin = geocode(near)
+            if origin is None:
+                raise ValidationError({'near': f"Unknown location '{near}'."})
+        self._origin = origin
+        return origin
+    
+    def get_overlaps(self):
+        """
+        ``{user_id: minutes}`` shared with the searcher's weekly availability
+        when the search ranks by it (``sort=availability``) or filters on it
+        (``min_overlap``, minutes per week), otherwise None.
+        """
+        if hasattr(self, '_overlaps'):
+            return self._overlaps
+        params = self.request.query_params
+        slots = overlaps = None
+        if params.get('sort') == 'availability' or 'min_overlap' in params:
+            slots = availability_index.slots(self.request.user.id)
+            if not slots:
+                param = 'sort' if params.get('sort') == 'availability' else 'min_overlap'
+                raise ValidationError({param: 'Add availability slots to your profile to search by availability.'})
+            overlaps = availability_index.overlaps(slots)
+        self._slots, self._overlaps = slots, overlaps
+        return overlaps
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['origin'] = self.get_origin()
+        self.get_overlaps()
+        context['slots'] = self._slots
+        return context
+    
+    def get_cache_key(self, request):
+        key = super().get_cache_key(request)
+        if self.is_relative():
+            key = f'{key}:{request.user.pk}'
+        return key
+    
+    def is_relative(self):
+        """
+        Whether results depend on who is searching: ``near`` and availability
+        searches, which also leave the searcher out on every path.
+        """
+        params = self.request.query_params
+        return bool(params.get('near', '').strip()) or params.get('sort') == 'availability' or 'min_overlap' in params
+    
+    def excluded_user(self):
+        return self.request.user.id if self.is_relative() else None
+    
+    def radius_km(self):
+        return _int_param(self.request.query_params, 'radius_km', DEFAULT_NEAR_RADIUS_KM, 1, MAX_NEAR_RADIUS_KM)
+    
+    def page_bounds(self):
+        params = self.request.query_params
+        limit = _int_param(params, 'limit', DEFAULT_SEARCH_LIMIT, 1, MAX_SEARCH_LIMIT)
+        offset = _int_param(params, 'offset', 0, 0, 10 ** 9)
+        return offset, offset + limit
+    
+    def by_availability(self, user_ids):
+        """Apply ``min_overlap`` and ``sort=availability`` to the given users, when the search uses them."""
+        overlaps = self.get_overlaps()
+        if overlaps is None:
+            return user_ids
+        params = self.request.query_params
+        min_overlap = _int_param(params, 'min_overlap', 0, 0, MINUTES_PER_WEEK)
+        return by_overlap(user_ids, overlaps, min_overlap, rank=params.get('sort') == 'availability')
+    
+    def search_near(self, origin):
+        """Other public users within ``radius_km`` of ``near``, nearest first, paged by ``limit`` and ``offset``."""
+        _, end = self.page_bounds()
+        # Availability may reorder the circle, so it needs every user in it
+        limit = None if self.get_overlaps() is not None else end
+        user_ids = users_near(origin, self.radius_km(), exclude=self.excluded_user(), limit=limit)
+        return self.paged(self.by_availability(user_ids))
+    
+    def search_available(self):
+        """
+        Other public users whose weekly availability overlaps the searcher's,
+        most shared time first, paged by ``limit`` and ``offset``.
+        """
+        user_ids = users_available(self.get_overlaps(), exclude=self.excluded_user())
+        return self.paged(self.by_availability(user_ids))
+    
+    def paged(self, user_ids):
+        start, end = self.page_bounds()
+        return self.ordered(user_ids[start:end])
+    
+    def ordered(self, user_ids):
+        page = list(user_ids)
+        if not page:
+            return User.objects.none()
+        rank = Case(*[When(id=user_id, then=position) for position, user_id in enumerate(page)])
+        return self.with_skills(User.objects.filter(id__in=page).order_by(rank))
+    
+    def with_skills(self, queryset):
+        # Skills are ordered by id so serialized and projected output agree
+        return queryset.select_related('profile', 'rating').prefetch_related(
+            Prefetch('user_skills', queryset=UserSkill.objects.select_related('skill').order_by('id'))
+        ) 
+    
+    def search_skills(self, skills, origin=None):
+        """
+        Multi-skill search served by the in-memory posting lists.
+        
+        Query params: ``skills`` (comma separated names), ``match`` (``all`` or
+        ``any``), ``min_level`` (1-5), ``type`` (``offered`` or ``wanted``),
+        ``limit`` and ``offset``. With ``near`` (and optionally ``radius_km``,
+        1-500, default 50) matches are restricted to that circle and ordered
+        by distance instead of rank. ``sort=availability`` and ``min_overlap``
+        then rank and filter by time shared with the searcher's weekly slots.
+        Searches using any of these leave the searcher out.
+        """
+        params = self.request.query_params
+        names = list(dict.fromkeys(name.strip().lower() for name in skills.split(',') if name.strip()))
+        match_all = params.get('match', 'all') != 'any'
+        skill_type = params.get('type', 'offered')
+        if skill_type not in ('offered', 'wanted'):
+            skill_type = 'offered'
+        min_level = _int_param(params, 'min_level', 1, 1, 5)
+        _, end = self.page_bounds()
+        
+        skill_ids = dict(Skill.objects.filter(name__in=names).values_list('name', 'id'))
+        if not skill_ids or (match_all and len(skill_ids) < len(names)):
+            return User.objects.none()
         
-        return skill_users 
\ No newline at end of file
+        ranked = search_engine.search(
+            skill_ids.values(), skill_type=skill_type,
+            match_all=match_all, min_level=min_level, public_only=True
+        )
+        exclude = self.excluded_user()
+        if exclude is not None:
+            ranked = [user_id for user_id in ranked if user_id != exclude]
+        if origin is not None:
+            # Availability may reorder the circle, so it needs every match in it
+            limit = None if self.get_overlaps() is not None else end
+            ranked = users_near(origin, self.radius_km(), ranked, limit=limit)
+        return self.paged(self.by_availability(ranked))
@@ -1,8 +1,14 @@
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import LimitOffsetPagination
 from django.shortcuts import get_object_or_404
-from api.models import SwapRequest, Feedback
+from django.db import transaction
+from django.db.models import Count, Max
+from api.models import SwapRequest, Feedback, SwapCounter
+from api.cache import CachedListMixin
+from api.conditional import ConditionalGetMixin
+from api.projection import ProjectedListMixin
 from api.serializers.swap_serializers import (
     SwapRequestSerializer, SwapRequestCreateSerializer, 
     SwapRequestUpdateSerializer, FeedbackSerializer
@@ -12,8 +18,19 @@ class IsRequesterOrRecipient(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.requester == request.user or obj.recipient == request.user
 
-class SwapRequestListCreateView(generics.ListCreateAPIView):
+class SwapRequestListCreateView(ConditionalGetMixin, ProjectedListMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    # Pages only when ?limit= is given, so existing clients get the full list
+    pagination_class = LimitOffsetPagination
+    query_budget = {'GET': 4, 'POST': 16}
+    # Deleting a UserSkill nulls the swap's link and renaming a skill saves
+    # only the skill; neither moves the swap's updated_at
+    related_validators = {
+        'requester_skills': Count('requester_skill'),
+        'recipient_skills': Count('recipient_skill'),
+        'requester_skill_renamed': Max('requester_skill__skill__updated_at'),
+        'recipient_skill_renamed': Max('recipient_skill__skill__updated_at'),
+    }
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -25,39 +42,39 @@ class SwapRequestListCreateView(generics.ListCreateAPIView):
         status_filter = self.request.query_params.get('status')
         role_filter = self.request.query_params.get('role', 'all')
         
-        if role_filter == 'sent':
-            queryset = SwapRequest.objects.filter(requester=user)
-        elif role_filter == 'received':
-            queryset = SwapRequest.objects.filter(recipient=user)
-        else:  # 'all'
-            queryset = SwapRequest.objects.filter(
-                requester=user
-            ) | SwapRequest.objects.filter(
-                recipient=user
-            )
-        
+        queryset = SwapRequest.objects.involving(user, role_filter)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
             
-        return queryset.order_by('-created_at')
+        return queryset.with_names().order_by('-created_at', '-id')
+    
+    def perform_create(self, serializer):
+        # The swap and its inbox counters commit together
+        with transaction.atomic():
+            serializer.save()
 
 class SwapRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = SwapRequestSerializer
     permission_classes = [IsAuthenticated, IsRequesterOrRecipient]
+    query_budget = {'GET': 2, 'PUT': 9, 'PATCH': 9, 'DELETE': 9}
     
     def get_queryset(self):
         user = self.request.user
-        return SwapRequest.objects.filter(
-            requester=user
-        ) | SwapRequest.objects.filter(
-            recipient=user
-        )
+        return SwapRequest.objects.involving(user).with_names()
     
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return SwapRequestUpdateSerializer
         return SwapRequestSerializer
     
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+    
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         if instance.status != 'pending':
@@ -75,14 +92,40 @@ class SwapRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class SwapCountsView(generics.GenericAPIView):
+    """Swap request counts by direction and status, read from one SwapCounter row."""
+    permission_classes = [IsAuthenticated]
+    query_budget = 2
+    
+    def get(self, request, *args, **kwargs):
+        counter = SwapCounter.objects.filter(user_id=request.user.id).values().first() or {}
+        data = {
+            direction: {
+                status_name: counter.get(f'{direction}_{status_name}', 0)
+                for status_name, _ in SwapRequest.STATUS_CHOICES
+            }
+            for direction in ('sent', 'received')
+        }
+        return Response(data)
+
 class FeedbackCreateView(generics.CreateAPIView):
     serializer_class = FeedbackSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 12
+    
+    def perform_create(self, serializer):
+        # The feedback row and its UserRating update commit together
+        with transaction.atomic():
+            serializer.save()
 
-class FeedbackListView(generics.ListAPIView):
+class FeedbackListView(CachedListMixin, generics.ListAPIView):
     serializer_class = FeedbackSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 2
+    read_replica = True
+    cache_tags = ('feedback', 'user')
+    cache_per_user = True
     
     def get_queryset(self):
         user = self.request.user
-        return Feedback.objects.filter(to_user=user) 
\ No newline at end of file
+        return Feedback.objects.filter(to_user=user).select_related('from_user', 'to_user').order_by('-created_at') 
\ No newline at end of file
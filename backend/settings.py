@@ -61,6 +61,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.replicas.ReplicaMiddleware',  # Read replica routing
+    'api.query_budget.QueryBudgetMiddleware',  # Per-view SQL query budgets
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -85,18 +87,75 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Seconds to keep connections open between requests, checked before reuse
+# so a dropped connection is replaced, not reported. The app is served over
+# ASGI, where each request runs its database work in a fresh thread and
+# never reuses a persistent connection, so the default closes them after
+# each request; use DB_POOL_MAX_SIZE instead. Only a WSGI server benefits
+# from setting this.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '0'))
+
 # Default database configuration (SQLite for development)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
 # Use PostgreSQL in production if DATABASE_URL is set
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL:
-    DATABASES['default'] = dj_database_url.parse(DATABASE_URL)
+    DATABASES['default'] = dj_database_url.parse(
+        DATABASE_URL, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True
+    )
+
+# Read replicas, as a comma separated list of URLs. They are used by views
+# that set `read_replica = True`. To try this against one PostgreSQL server,
+# point a replica URL at the same database with
+# ?options=-c%20default_transaction_read_only%3Don
+DATABASE_REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+for _i, _url in enumerate(DATABASE_REPLICA_URLS, 1):
+    DATABASES[f'replica_{_i}'] = dj_database_url.parse(
+        _url.strip(), conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True
+    )
+
+# Local stand-in: SQLITE_READ_REPLICAS=2 opens the SQLite database twice more
+# in read-only mode, so a write routed to a replica fails loudly
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    for _i in range(1, int(os.environ.get('SQLITE_READ_REPLICAS', '0')) + 1):
+        DATABASES[f'replica_{_i}'] = {
+            **DATABASES['default'],
+            'NAME': f"file:{DATABASES['default']['NAME']}?mode=ro",
+        }
+
+# Connection pool per worker process instead of persistent connections.
+# Needs PostgreSQL with psycopg 3 (and psycopg-pool) in place of psycopg2.
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '0'))
+for _db in DATABASES.values():
+    if DB_POOL_MAX_SIZE and _db['ENGINE'] == 'django.db.backends.postgresql':
+        from psycopg_pool import ConnectionPool
+        _db['CONN_MAX_AGE'] = 0
+        _db.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': 1,
+            'max_size': DB_POOL_MAX_SIZE,
+            'check': ConnectionPool.check_connection,
+        }
+
+# Tests read replicas through the primary's connection
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+for _alias in REPLICA_DATABASES:
+    DATABASES[_alias]['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+# Seconds a user's reads stay on the primary after they write. The pin lives
+# in the shared cache so every worker sees it.
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_CACHE_ALIAS = 'shared'
+# Seconds to skip a replica after it fails to connect
+REPLICA_RETRY_SECONDS = 30
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,6 +199,13 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Profile photo thumbnails (square, in pixels). They are written to
+# media/profile_photos/thumbs/ under content-hashed names, so the web server
+# can serve that directory with "Cache-Control: immutable".
+PROFILE_PHOTO_SIZES = (64, 128, 256)
+PROFILE_PHOTO_SEARCH_SIZE = 128
+PROFILE_PHOTO_ASYNC = True
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -148,13 +214,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Token buckets for views that set `throttle_scope`: '10/min' allows a
+    # burst of 10, refilled at 10 per minute
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.environ.get('THROTTLE_LOGIN', '10/min'),
+        'register': os.environ.get('THROTTLE_REGISTER', '5/hour'),
+        'search': os.environ.get('THROTTLE_SEARCH', '60/min'),
+    },
+    # Reverse proxies in front of the app. Throttles take the client IP from
+    # X-Forwarded-For only this many hops back; at 0 they use REMOTE_ADDR,
+    # since any client can send the header
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
 }
 
+# SQLite file holding throttle buckets, shared by the workers on one host.
+# Defaults to /dev/shm (or the temp directory).
+THROTTLE_STORE_PATH = os.environ.get('THROTTLE_STORE_PATH')
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -163,5 +251,87 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Cache settings
+# 'default' is an in-process LRU cache. 'shared' holds everything all worker
+# processes must agree on: cached responses and their tag versions, cached
+# auth users, replica pins and, with CACHE_URL, index versions. It is Redis
+# when CACHE_URL is set; give that server a memory limit and
+# `maxmemory-policy allkeys-lru` (as docker-compose.yml does) so orphaned
+# responses are evicted least recently used first. Otherwise it is files
+# under CACHE_DIR, which the workers on one host share. That is for
+# development: it lists the directory on every write and, once full, culls
+# a random third of its entries. Never point the aliases below at a
+# process-local backend: a write handled by one worker would leave the
+# others serving stale data (`manage.py check` warns about it).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'skill-swap',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+if os.environ.get('CACHE_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_URL'],
+    }
+else:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / '.cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+RESPONSE_CACHE_ALIAS = 'shared'
+
+# Query budget settings
+# Each view declares `query_budget`; requests that exceed it or repeat the
+# same query shape (N+1) are logged, or raised when QUERY_BUDGET_RAISE is set.
+# Off unless QUERY_BUDGET_ENABLED=1: recording wraps every query, so it is
+# opted into while profiling rather than riding along with DEBUG.
+QUERY_BUDGET_ENABLED = os.environ.get('QUERY_BUDGET_ENABLED', '') == '1'
+QUERY_BUDGET_RAISE = os.environ.get('QUERY_BUDGET_RAISE', '') == '1'
+QUERY_BUDGET_REPEAT_THRESHOLD = 3
+
+# Seconds a token's user stays cached between requests, as the few columns
+# authentication reads (no password hash or personal details). Users are
+# not cached when AUTH_USER_CACHE_ALIAS is process-local, since a ban saved
+# by one worker could not evict the copies held by the others.
+AUTH_USER_CACHE_ALIAS = 'shared'
+AUTH_USER_CACHE_TTL = 60
+
+# Pub/sub broker for server-sent events. The in-process broker only reaches
+# clients connected to the same worker, so with CACHE_URL set events go
+# through Redis pub/sub instead.
+if os.environ.get('CACHE_URL'):
+    EVENT_BROKER = 'api.services.events.RedisBroker'
+    EVENT_BROKER_URL = os.environ['CACHE_URL']
+else:
+    EVENT_BROKER = 'api.services.events.InProcessBroker'
+# EventSource cannot send headers: clients POST /api/events/ticket/ for a
+# single-use ticket valid this many seconds and pass it as ?ticket=
+EVENT_TICKET_SECONDS = 30
+EVENT_TICKET_CACHE_ALIAS = 'shared'
+# Seconds between checks that a user with an open event stream is still active
+EVENT_RECHECK_SECONDS = 30
+
+# In-memory indexes (matching, search, ...) are built per worker process and
+# patched from model signals. Writes also bump a version in
+# INDEX_VERSION_CACHE_ALIAS, which other workers check every
+# INDEX_CHECK_SECONDS and rebuild on. Snapshots older than INDEX_MAX_AGE
+# seconds are rebuilt anyway, to pick up writes that sent no signals.
+# Bumps must be atomic, which the file cache's are not, so without CACHE_URL
+# versions stay in the process: run one worker, or set CACHE_URL.
+INDEX_VERSION_CACHE_ALIAS = 'shared' if os.environ.get('CACHE_URL') else 'default'
+INDEX_CHECK_SECONDS = 1
+INDEX_MAX_AGE = int(os.environ.get('INDEX_MAX_AGE', 300))
+
+# Partner recommendations are precomputed by `manage.py refresh_recommendations`;
+# each run also recomputes users whose recommendations are older than this
+RECOMMENDATION_MAX_AGE = int(os.environ.get('RECOMMENDATION_MAX_AGE', 86400))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # In production, specify the allowed origins
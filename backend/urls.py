@@ -19,6 +19,15 @@ from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.static import serve
+from django.utils.cache import patch_cache_control
+
+
+def serve_immutable(request, path, document_root=None):
+    # Thumbnails have content-hashed names, so they never change under one URL
+    response = serve(request, path, document_root=document_root)
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    return response
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -32,6 +41,11 @@ urlpatterns = [
     path('', include('frontend.urls')),
 ]
 
-# Serve media files during development
+# Serve media files during development (ahead of the SPA catch-all)
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns = [
+        re_path(
+            r'^%s(?P<path>profile_photos/thumbs/.*)$' % settings.MEDIA_URL.lstrip('/'),
+            serve_immutable, {'document_root': settings.MEDIA_ROOT}
+        ),
+    ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) + urlpatterns